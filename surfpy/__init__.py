@@ -1,15 +1,22 @@
 # -*- coding: UTF-8 -*
 
-from .location import Location
+from .location import Location, distance_matrix, nearest_locations
 from .swell import Swell
 from .buoystations import BuoyStations
 from .buoystation import BuoyStation
-from .buoydata import BuoyData, merge_wave_weather_data
+from .buoydata import BuoyData, merge_wave_weather_data, change_units_series, solve_breaking_wave_heights_series
+from .buoyarchive import BuoyArchive
+from .breakingtable import BreakingTransferTable
 from .wavemodel import *
 from .weathermodel import *
 from .sun import Sun
 from .tidestation import TideStation
 from .tidestations import TideStations
 from .tideevent import TideEvent
+from .tideharmonics import TideHarmonics
+from .tidecache import TideDataCache
+from .tidepredictions import TidePredictions
+from .timeindex import TimeIndex
+from .spotregistry import SpotRegistry
 from .serialize import *
 from .weatherapi import WeatherApi
\ No newline at end of file
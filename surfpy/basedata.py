@@ -1,5 +1,9 @@
 class BaseData(object):
 
+    # Data classes are created by the million for large forecasts so they are slot based
+    # rather than carrying a per instance dict. Subclasses must declare their own slots
+    __slots__ = ('unit',)
+
     def __init__(self, unit):
         self.unit = unit
 
@@ -1,38 +1,54 @@
 class BaseStation(object):
 
+    serialized_properties = ('name',)
+
     def __init__(self, station_id, location):
         self.station_id = station_id
         self.location = location
-        self.name = ''
-        self._parse_name()
-    
+        self._name = ''
+        self._name_parsed = False
+
+    @property
+    def name(self):
+        # The display name is only worked out the first time it is used, catalogs hold
+        # thousands of stations and most of them are never shown
+        if not self._name_parsed:
+            self._name = self._parse_name()
+            self._name_parsed = True
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+        self._name_parsed = True
+
     def _parse_name(self):
         if self.location.name == '':
-            return
+            return ''
 
-        self.name = ''
+        name = ''
 
         if '-' in self.location.name:
             components = self.location.name.split('-')
             for comp in components:
                 if not comp.strip().isdigit():
-                    self.name += ' ' + comp
+                    name += ' ' + comp
         else:
-            self.name = self.location.name
+            name = self.location.name
 
-        if '(' in self.name:
-            self.name = self.name.split('(')[0]
+        if '(' in name:
+            name = name.split('(')[0]
 
-        if 'NM' in self.name:
-            components = self.name.split(' ')
-            self.name = ''
+        if 'NM' in name:
+            components = name.split(' ')
+            name = ''
             for comp in components:
                 if 'NM' in comp:
                     break
                 elif comp.strip().isdigit():
                     break
-                if len(self.name) > 0:
-                    self.name += ' '
-                self.name += comp
+                if len(name) > 0:
+                    name += ' '
+                name += comp
 
-        self.name = self.name.strip().title()
\ No newline at end of file
+        return name.strip().title()
@@ -1,25 +1,96 @@
+import bisect
+import datetime
+import re
+import numpy as np
+from .location import Location, nearest_locations
+from .stationcatalog import StationCatalog, LazyStations
 try:
     import requests
 except:
     pass
 
+def _name_tokens(name):
+    return re.findall(r'[a-z0-9]+', name.lower())
+
+
 class BaseStations(object):
 
     def __init__(self):
         self.fetch_date = None
         self.stations = []
 
+        # Lookup indexes over self.stations holding list positions. They are rebuilt whenever the list is
+        # replaced or changes size behind our back, add_station keeps them current incrementally
+        self._indexed_stations = None
+        self._indexed_count = 0
+        self._id_index = {}
+        self._name_index = {}
+        self._token_index = {}
+        self._sorted_tokens = []
+
+    def index_stations(self):
+        self._indexed_stations = self.stations
+        self._indexed_count = 0
+        self._id_index = {}
+        self._name_index = {}
+        self._token_index = {}
+        for station_id, name in zip(self.station_ids(), self.station_names()):
+            self._index_station(station_id, name)
+        self._sorted_tokens = sorted(self._token_index)
+
+    def _index_station(self, station_id, name):
+        position = self._indexed_count
+        self._indexed_count += 1
+
+        # The first station wins to match the order of a linear search
+        self._id_index.setdefault(station_id, position)
+        self._name_index.setdefault(name, position)
+        for token in set(_name_tokens(name)):
+            self._token_index.setdefault(token, []).append(position)
+
+    def _check_indexes(self):
+        if self._indexed_stations is not self.stations or self._indexed_count != len(self.stations):
+            self.index_stations()
+
+    def station_ids(self):
+        if isinstance(self.stations, LazyStations):
+            return self.stations.catalog.columns['station_id'].tolist()
+        return [x.station_id for x in self.stations]
+
+    def station_names(self):
+        if isinstance(self.stations, LazyStations):
+            return self.stations.catalog.columns['name'].tolist()
+        return [x.location.name for x in self.stations]
+
+    def station_coordinates(self):
+        if isinstance(self.stations, LazyStations):
+            columns = self.stations.catalog.columns
+            return np.column_stack([columns['latitude'], columns['longitude']])
+        return np.array([(x.location.latitude, x.location.longitude) for x in self.stations], dtype=np.float64).reshape(-1, 2)
+
+    def add_station(self, station):
+        if isinstance(self.stations, LazyStations):
+            self.stations = list(self.stations)
+        self._check_indexes()
+        self.stations.append(station)
+        new_tokens = [x for x in set(_name_tokens(station.location.name)) if x not in self._token_index]
+        self._index_station(station.station_id, station.location.name)
+        for token in new_tokens:
+            bisect.insort(self._sorted_tokens, token)
+
     def find_station(self, station_id):
-        for station in self.stations:
-            if station.station_id == station_id:
-                return station
-        return None
-    
+        self._check_indexes()
+        position = self._id_index.get(station_id)
+        if position is None:
+            return None
+        return self.stations[position]
+
     def find_station_name(self, station_name):
-        for station in self.stations:
-            if station.location.name == station_name:
-                return station
-        return None
+        self._check_indexes()
+        position = self._name_index.get(station_name)
+        if position is None:
+            return None
+        return self.stations[position]
 
     def find_closest_station(self, search_location):
         closest = self.find_closest_stations(search_location, 1)
@@ -33,46 +104,107 @@ class BaseStations(object):
         elif count < 1:
             return None
 
-        closest_stations = [None for x in range(0, count)]
-        closest_distances = [float('inf') for x in range(0, count)]
-
-        for station in self.stations:
-            dist = search_location.distance(station.location)
-            max_index = -1
-            max_distance = float('inf')
-            added = False
-            for i in range(0, count):
-                added = False
-                if closest_stations[i] is None:
-                    closest_stations[i] = station
-                    closest_distances[i] = dist
-                    added = True
-                    break
-                if dist < closest_distances[i]:
-                    if max_distance > closest_distances[i]:
-                        max_index = i
-
-            if max_index >= 0 and not added:
-                closest_stations[max_index] = station
-                closest_distances[max_index] = dist
-
-        closest_stations = [x for _, x in sorted(zip(closest_distances, closest_stations), key=lambda pair: pair[0])]
-        return closest_stations
-
-    def search_station_name(self, expr):
-        return [x for x in self.stations if expr in x.location.name]
+        indexes, _ = nearest_locations([search_location], self.station_coordinates(), count)
+        return [self.stations[x] for x in indexes[0].tolist()]
+
+    def find_closest_stations_batch(self, search_locations, count):
+        # Closest stations for many locations at once, nearest first for each location
+        if len(self.stations) < 1 or count < 1:
+            return [[] for _ in search_locations]
+
+        indexes, _ = nearest_locations(search_locations, self.station_coordinates(), count)
+        return [[self.stations[x] for x in row] for row in indexes.tolist()]
+
+    def search_station_name(self, expr, prefix=False):
+        # Case insensitive search of the station names. By default expr can appear anywhere in the name,
+        # with prefix every word of expr has to start a word of the name instead
+        self._check_indexes()
+        names = self.station_names()
+        words = _name_tokens(expr)
+        if len(words) < 1:
+            return [self.stations[i] for i, x in enumerate(names) if expr.lower() in x.lower()]
+
+        positions = None
+        for word in words:
+            if prefix:
+                start = bisect.bisect_left(self._sorted_tokens, word)
+                end = bisect.bisect_left(self._sorted_tokens, word + '\uffff')
+                tokens = self._sorted_tokens[start:end]
+            else:
+                tokens = [x for x in self._sorted_tokens if word in x]
+
+            word_positions = set()
+            for token in tokens:
+                word_positions.update(self._token_index[token])
+            positions = word_positions if positions is None else positions & word_positions
+
+        positions = sorted(positions)
+        if not prefix:
+            positions = [x for x in positions if expr.lower() in names[x].lower()]
+        return [self.stations[x] for x in positions]
+
+    def catalog_columns(self):
+        # The station attributes stored in a StationCatalog, subclasses add their own
+        return {
+            'station_id': [x.station_id for x in self.stations],
+            'name': [x.location.name for x in self.stations],
+            'latitude': np.array([x.location.latitude for x in self.stations], dtype=np.float64),
+            'longitude': np.array([x.location.longitude for x in self.stations], dtype=np.float64),
+            'altitude': np.array([x.location.altitude for x in self.stations], dtype=np.float64),
+        }
+
+    @staticmethod
+    def catalog_location(columns, index):
+        return Location(float(columns['latitude'][index]), float(columns['longitude'][index]), name=str(columns['name'][index]),
+            altitude=float(columns['altitude'][index]))
+
+    @staticmethod
+    def station_from_catalog(columns, index):
+        return None
+
+    def use_catalog(self, catalog):
+        self.stations = LazyStations(catalog, self.station_from_catalog)
+        self.fetch_date = catalog.fetch_date
+        self.index_stations()
 
     def parse_stations(self, raw_data):
         return False
-    
-    def _fetch_stations(self, url, payload=None):
+
+    def _fetch_stations(self, url, payload=None, cache_path=None, ttl=datetime.timedelta(days=1)):
+        # With a cache_path the parsed stations are kept in a StationCatalog file. A catalog younger than
+        # ttl is used without any request, older ones are revalidated with a conditional request
+        catalog = None
+        headers = {}
+        if cache_path is not None:
+            catalog = StationCatalog.load(cache_path)
+            if catalog is not None:
+                if not catalog.is_expired(ttl):
+                    self.use_catalog(catalog)
+                    return True
+                headers = catalog.request_headers()
+
         if payload is None:
-            response = requests.get(url)
+            response = requests.get(url, headers=headers)
         else:
-            response = requests.post(url, data=payload)
+            response = requests.post(url, data=payload, headers=headers)
+
+        if catalog is not None and response.status_code == 304:
+            catalog.fetch_date = datetime.datetime.now()
+            catalog.save(cache_path)
+            self.use_catalog(catalog)
+            return True
+
         if not len(response.text):
             return False
-        return self.parse_stations(response.text)
-    
+        if isinstance(self.stations, LazyStations):
+            self.stations = []
+        if not self.parse_stations(response.text):
+            return False
+
+        self.fetch_date = datetime.datetime.now()
+        if cache_path is not None:
+            StationCatalog.from_columns(self.catalog_columns(), self.fetch_date, response).save(cache_path)
+        return True
+
     def fetch_stations(self):
-        return False
\ No newline at end of file
+        return False
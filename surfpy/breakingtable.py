@@ -0,0 +1,68 @@
+import math
+import numpy as np
+
+from . import tools
+
+
+class BreakingTransferTable(object):
+
+    def __init__(self, depth, angle, slope, periods, celerity_ratios):
+        # With the depth fixed for a spot, the only part of the breaking estimate that needs the
+        # dispersion solver is the ratio of the celerity at the spot to the deep water celerity, which
+        # is a smooth function of period alone. The table holds it over a period grid and the height
+        # and direction terms are applied exactly
+        self.depth = depth
+        self.angle = angle
+        self.slope = slope
+        self.periods = np.asarray(periods, dtype=np.float64)
+        self.celerity_ratios = np.asarray(celerity_ratios, dtype=np.float64)
+
+    @staticmethod
+    def from_location(location, periods=None):
+        # The default grid covers 1 to 30 seconds in 0.05 second steps
+        if periods is None:
+            periods = np.arange(1.0, 30.025, 0.05)
+        periods = np.asarray(periods, dtype=np.float64)
+        wavelength = tools.ldis(periods, location.depth)
+        deep_wavelength = (9.81 * np.power(periods, 2)) / (2 * math.pi)
+        return BreakingTransferTable(location.depth, location.angle, location.slope, periods, wavelength / deep_wavelength)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as table:
+            return BreakingTransferTable(float(table['depth']), float(table['angle']), float(table['slope']), table['periods'], table['celerity_ratios'])
+
+    def save(self, path):
+        np.savez(path, depth=self.depth, angle=self.angle, slope=self.slope, periods=self.periods, celerity_ratios=self.celerity_ratios)
+
+    def matches(self, location):
+        return self.depth == location.depth and self.angle == location.angle and self.slope == location.slope
+
+    def breaking_wave_heights(self, wave_height, period, direction):
+        # Same inputs and results as tools.breaking_wave_heights for this spot, with the dispersion
+        # solve replaced by interpolating the table. Periods outside of the table are solved directly
+        gravity = 9.81
+        wave_height, period, direction = np.broadcast_arrays(np.asarray(wave_height, dtype=np.float64),
+            np.asarray(period, dtype=np.float64), np.asarray(direction, dtype=np.float64))
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            valid = ~(np.isnan(wave_height) | np.isnan(period) | np.isnan(direction))
+            incident_angle = np.abs(direction - self.angle) % 360
+            breaking = valid & (wave_height < 1000) & (incident_angle < 90)
+
+            incident_angle_rad = np.radians(incident_angle)
+            celerity_ratio = np.interp(period, self.periods, self.celerity_ratios)
+            deep_wavelength = (gravity * np.power(period, 2)) / (2 * math.pi)
+            theta = np.arcsin(celerity_ratio * np.sin(incident_angle_rad))
+            refraction_coeff = np.sqrt(np.cos(incident_angle_rad) / np.cos(theta))
+            deep_refracted_wave_height = refraction_coeff * wave_height
+            w = 0.56 * np.power(deep_refracted_wave_height / deep_wavelength, -0.2)
+            breaking_wave_height = np.where(breaking, w * deep_refracted_wave_height, 0.0)
+
+            outside = breaking & ((period < self.periods[0]) | (period > self.periods[-1]))
+
+        maximum_break_height = np.where(valid, 0.8 * breaking_wave_height, np.nan)
+        if outside.any():
+            _, maximum_break_height[outside] = tools.breaking_wave_heights(wave_height[outside], period[outside], direction[outside], self.angle, self.depth, self.slope)
+
+        return maximum_break_height / 1.4, maximum_break_height
@@ -0,0 +1,164 @@
+import gzip
+import io
+import itertools
+import json
+import os
+import numpy as np
+
+from .timeindex import TimeIndex
+from .buoyqc import mask_sentinels
+from .ndbccolumns import meteorological_columns, time_columns, parse_header
+
+
+def open_archive_file(source):
+    # Accepts a path or a binary file object, gzip compressed files are decompressed as they are read
+    if isinstance(source, str):
+        if source.endswith('.gz'):
+            return gzip.open(source, 'rt')
+        return open(source, 'r')
+
+    if not hasattr(source, 'peek'):
+        source = io.BufferedReader(source)
+    magic = source.peek(2)[:2]
+    if magic == b'\x1f\x8b' or getattr(source, 'name', '').endswith('.gz'):
+        source = gzip.GzipFile(fileobj=source)
+    return io.TextIOWrapper(source, encoding='utf-8', errors='replace')
+
+
+def parse_archive_chunks(lines, chunk_size=50000):
+    # Parses NDBC yearly (or realtime) text data in chunks, yielding the data column names, the
+    # timestamps in seconds since the epoch and a float array of the remaining columns
+    lines = iter(lines)
+    header = None
+    for line in lines:
+        if len(line.strip()) > 0:
+            header = parse_header(line)
+            break
+    if header is None:
+        return
+
+    time_column_count = len([x for x in header if x in time_columns])
+    names = header[time_column_count:]
+
+    while True:
+        rows = [x.split() for x in itertools.islice(lines, chunk_size)]
+        if len(rows) < 1:
+            return
+
+        # Drop the units header line and anything truncated
+        rows = [x for x in rows if len(x) == len(header) and not x[0].startswith('#')]
+        if len(rows) < 1:
+            continue
+
+        table = np.array(rows)
+        table = np.where(table == 'MM', 'nan', table)
+        times = table[:, :time_column_count].astype(np.int64)
+        values = table[:, time_column_count:].astype(np.float64)
+
+        years = times[:, 0]
+        years = np.where(years < 100, years + 1900, years)
+        minutes = times[:, 4] if time_column_count > 4 else np.zeros(len(times), dtype=np.int64)
+        dates = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (times[:, 1] - 1).astype('timedelta64[M]')
+        dates = dates.astype('datetime64[D]') + (times[:, 2] - 1).astype('timedelta64[D]')
+        dates = dates.astype('datetime64[s]') + times[:, 3].astype('timedelta64[h]') + minutes.astype('timedelta64[m]')
+
+        yield names, dates.astype(np.int64), values
+
+
+class BuoyArchive(object):
+
+    def __init__(self, path):
+        # A directory holding one float32 file per column next to an int64 time file, read
+        # back as memory maps so years of data never have to be loaded at once
+        self.path = path
+        self.count = 0
+        self.columns = {}
+        self.frequency = []
+        os.makedirs(self.path, exist_ok=True)
+
+        if os.path.exists(self._metadata_path):
+            with open(self._metadata_path, 'r') as metadata_file:
+                metadata = json.load(metadata_file)
+            self.count = metadata['count']
+            self.columns = metadata['columns']
+            self.frequency = metadata.get('frequency', [])
+
+    @property
+    def _metadata_path(self):
+        return os.path.join(self.path, 'archive.json')
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + '.f32')
+
+    def _save_metadata(self):
+        with open(self._metadata_path, 'w') as metadata_file:
+            json.dump({'count': self.count, 'columns': self.columns, 'frequency': self.frequency}, metadata_file)
+
+    @property
+    def times(self):
+        if self.count < 1:
+            return np.array([], dtype=np.int64)
+        return np.memmap(os.path.join(self.path, 'time.i8'), dtype=np.int64, mode='r', shape=(self.count,))
+
+    def column(self, name):
+        width = self.columns[name]
+        shape = (self.count,) if width == 1 else (self.count, width)
+        if self.count < 1:
+            return np.zeros(shape, dtype=np.float32)
+        return np.memmap(self._column_path(name), dtype=np.float32, mode='r', shape=shape)
+
+    def time_index(self):
+        return TimeIndex(self.times)
+
+    def append(self, timestamps, columns):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        for name, values in columns.items():
+            values = np.asarray(values, dtype=np.float32)
+            width = 1 if values.ndim == 1 else values.shape[1]
+            if name not in self.columns:
+                # Columns first seen in a later year are back filled with NaN so every column lines up
+                self.columns[name] = width
+                np.full((self.count, width), np.nan, dtype=np.float32).tofile(self._column_path(name))
+            with open(self._column_path(name), 'ab') as column_file:
+                values.tofile(column_file)
+
+        for name, width in self.columns.items():
+            if name not in columns:
+                with open(self._column_path(name), 'ab') as column_file:
+                    np.full((len(timestamps), width), np.nan, dtype=np.float32).tofile(column_file)
+
+        with open(os.path.join(self.path, 'time.i8'), 'ab') as time_file:
+            timestamps.tofile(time_file)
+
+        self.count += len(timestamps)
+        self._save_metadata()
+
+    def ingest_meteorological(self, source, chunk_size=50000):
+        # Standard meteorological data, either the yearly stdmet files or realtime2 .txt files. Values
+        # are kept in the units NDBC publishes them in, metric except for the tide which is in feet.
+        # Missing data sentinels are stored as NaN
+        count = 0
+        with open_archive_file(source) as archive_file:
+            for names, timestamps, values in parse_archive_chunks(archive_file, chunk_size):
+                columns = {meteorological_columns[name]: values[:, i] for i, name in enumerate(names) if name in meteorological_columns}
+                self.append(timestamps, mask_sentinels(columns))
+                count += len(timestamps)
+        return count
+
+    def ingest_spectral_density(self, source, chunk_size=10000):
+        # Spectral wave density data from the yearly swden files. The frequencies come from the
+        # header and must match the ones already in the archive
+        count = 0
+        with open_archive_file(source) as archive_file:
+            for names, timestamps, values in parse_archive_chunks(archive_file, chunk_size):
+                frequency = [float(x) for x in names]
+                if len(self.frequency) < 1:
+                    self.frequency = frequency
+                elif not np.allclose(self.frequency, frequency):
+                    print('Spectral density frequencies do not match the archive')
+                    return count
+
+                values[values >= 999.0] = np.nan
+                self.append(timestamps, {'spectral_density': values})
+                count += len(timestamps)
+        return count
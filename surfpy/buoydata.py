@@ -1,15 +1,38 @@
 from math import isnan
 from typing import List
 from . import units
+from . import tools
 from .swell import Swell
 from .buoyspectra import BuoySpectra
 from .basedata import BaseData
+from .timeindex import TimeIndex, to_timestamps
 from operator import itemgetter
 import datetime
+import numpy as np
+
+
+# Every BuoyData field that carries a unit along with the measurement it is
+measured_fields = [
+    ('minimum_breaking_height', units.Measurement.length),
+    ('maximum_breaking_height', units.Measurement.length),
+    ('wind_speed', units.Measurement.speed),
+    ('wind_gust', units.Measurement.speed),
+    ('air_temperature', units.Measurement.temperature),
+    ('water_temperature', units.Measurement.temperature),
+    ('dewpoint_temperature', units.Measurement.temperature),
+    ('pressure', units.Measurement.pressure),
+    ('pressure_tendency', units.Measurement.pressure),
+    ('water_level', units.Measurement.length),
+]
 
 
 class BuoyData(BaseData):
 
+    __slots__ = ('date', 'expiration_date', 'wind_direction', 'wind_compass_direction', 'wind_speed', 'wind_gust',
+        'wave_summary', 'swell_components', 'steepness', 'average_period', 'wave_spectra', 'minimum_breaking_height',
+        'maximum_breaking_height', 'pressure', 'air_temperature', 'water_temperature', 'dewpoint_temperature',
+        'pressure_tendency', 'water_level', 'short_forecast')
+
     def __init__(self, unit, date=None, expiration_date=None, wind_direction=float('nan'), wind_compass_direction='', 
         wind_speed=float('nan'), wind_gust=float('nan'), wave_summary=None, swell_components=None, steepness='', average_period=float('nan'),
         wave_spectra=None, minimum_breaking_height=float('nan'), maximum_breaking_height=float('nan'), pressure=float('nan'),
@@ -50,23 +73,17 @@ class BuoyData(BaseData):
 
     def change_units(self, new_units):
         old_unit = self.unit
-        super(BuoyData, self).change_units(new_units)
-
         if self.wave_summary is not None:
             self.wave_summary.change_units(new_units)
         for swell in self.swell_components:
             swell.change_units(new_units)
 
-        self.minimum_breaking_height = units.convert(self.minimum_breaking_height, units.Measurement.length, old_unit, self.unit)
-        self.maximum_breaking_height = units.convert(self.maximum_breaking_height, units.Measurement.length, old_unit, self.unit)
-        self.wind_speed = units.convert(self.wind_speed, units.Measurement.speed, old_unit, self.unit)
-        self.wind_gust = units.convert(self.wind_gust, units.Measurement.speed, old_unit, self.unit)
-        self.air_temperature = units.convert(self.air_temperature, units.Measurement.temperature, old_unit, self.unit)
-        self.water_temperature = units.convert(self.water_temperature, units.Measurement.temperature, old_unit, self.unit)
-        self.dewpoint_temperature = units.convert(self.dewpoint_temperature, units.Measurement.temperature, old_unit, self.unit)
-        self.pressure = units.convert(self.pressure, units.Measurement.pressure, old_unit, self.unit)
-        self.pressure_tendency = units.convert(self.pressure_tendency, units.Measurement.pressure, old_unit, self.unit)
-        self.water_level = units.convert(self.water_level, units.Measurement.length, old_unit, self.unit)
+        if old_unit == new_units:
+            return
+        super(BuoyData, self).change_units(new_units)
+
+        for field, measure in measured_fields:
+            setattr(self, field, units.convert(getattr(self, field), measure, old_unit, self.unit))
 
     def find_expiration_date(self):
         time_now = datetime.datetime.now()
@@ -95,21 +112,7 @@ class BuoyData(BaseData):
                 self.wave_summary.period = swell.period
 
     def solve_breaking_wave_heights(self, location):
-        old_unit = self.unit
-        if self.unit != units.Units.metric:
-            self.change_units(units.Units.metric)
-
-        all_heights = [x.breaking_wave_estimate(location.angle, location.depth, location.slope) for x in self.swell_components]
-        if len(all_heights) < 1:
-            self.minimum_breaking_height = float('nan')
-            self.maximum_breaking_height = float('nan')
-        else:
-            all_heights, self.swell_components = zip(*sorted(zip(all_heights, self.swell_components), reverse=True, key=lambda pair: pair[0][1]))
-            self.minimum_breaking_height = all_heights[0][0]
-            self.maximum_breaking_height = all_heights[0][1]
-
-        if old_unit != self.unit:
-            self.change_units(old_unit)
+        solve_breaking_wave_heights_series([self], location)
 
     def copy_wind_data(self, other):
         if other.unit != self.unit:
@@ -120,30 +123,153 @@ class BuoyData(BaseData):
         self.wind_compass_direction = other.wind_compass_direction
 
 
-def merge_wave_weather_data(wave_data: List[BuoyData], weather_data: List[BuoyData]) -> List[BuoyData]:
-    last_weather_index = 0
-    
-    for wave in wave_data:
-        wave.change_units(units.Units.metric)
-        if wave.date > weather_data[-1].date:
-            return wave_data
-
-        for i in range(last_weather_index, len(weather_data)):
-            weather = weather_data[i]
-            if weather.date != wave.date:
-                continue
-
-            weather.change_units(units.Units.metric)
-            if weather.air_temperature is not None and not isnan(weather.air_temperature):
-                wave.air_temperature = weather.air_temperature
-            wave.short_forecast = weather.short_forecast
-            if weather.wind_speed is not None and not isnan(weather.wind_speed):
-                wave.wind_speed = weather.wind_speed
-            if weather.wind_direction is not None and not isnan(weather.wind_direction):
-                wave.wind_direction = weather.wind_direction
-            if weather.wind_compass_direction is not None:
-                wave.wind_compass_direction = weather.wind_compass_direction
-            last_weather_index = i
-            break
-        
-    return wave_data
\ No newline at end of file
+def change_units_series(buoy_data: List[BuoyData], new_units) -> List[BuoyData]:
+    # Converts a whole series at once, gathering each field into an array so every field only
+    # costs one array conversion no matter how long the series is
+    data_to_convert = [x for x in buoy_data if x.unit != new_units]
+    for old_unit in set([x.unit for x in data_to_convert]):
+        unit_data = [x for x in data_to_convert if x.unit == old_unit]
+        for field, measure in measured_fields:
+            values = np.array([getattr(x, field) for x in unit_data], dtype=np.float64)
+            for data, value in zip(unit_data, units.convert(values, measure, old_unit, new_units).tolist()):
+                setattr(data, field, value)
+        for data in unit_data:
+            data.unit = new_units
+
+    # The wave summary can be shared with the swell components so each swell is only converted once
+    swells = {}
+    for data in buoy_data:
+        if data.wave_summary is not None:
+            swells[id(data.wave_summary)] = data.wave_summary
+        for swell in data.swell_components:
+            swells[id(swell)] = swell
+    swells = [x for x in swells.values() if x.unit != new_units]
+    for old_unit in set([x.unit for x in swells]):
+        unit_swells = [x for x in swells if x.unit == old_unit]
+        values = np.array([x.wave_height for x in unit_swells], dtype=np.float64)
+        for swell, value in zip(unit_swells, units.convert(values, units.Measurement.length, old_unit, new_units).tolist()):
+            swell.wave_height = value
+            swell.unit = new_units
+
+    return buoy_data
+
+
+def solve_breaking_wave_heights_series(buoy_data: List[BuoyData], location, transfer_table=None) -> List[BuoyData]:
+    # Solves the breaking wave heights for a whole forecast at once by packing the swell components into
+    # (time x component) arrays. The swell components of every point are sorted by breaking height and
+    # the heights of the dominant one are stored in the data points own units. A BreakingTransferTable
+    # built for the location skips the dispersion solve, a table built for any other spot is ignored
+    if len(buoy_data) < 1:
+        return buoy_data
+
+    # Lengths only ever scale between units so a per unit factor is all that is needed
+    to_metric = {}
+    from_metric = {}
+    for unit in set([x.unit for x in buoy_data] + [y.unit for x in buoy_data for y in x.swell_components]):
+        to_metric[unit] = units.conversion_factors(units.Measurement.length, unit, units.Units.metric)[0]
+        from_metric[unit] = units.conversion_factors(units.Measurement.length, units.Units.metric, unit)[0]
+
+    component_count = max([len(x.swell_components) for x in buoy_data])
+    missing = (float('nan'), float('nan'), float('nan'))
+    components = np.array([[(y.wave_height * to_metric[y.unit], y.period, y.direction) for y in x.swell_components] +
+        [missing] * (component_count - len(x.swell_components)) for x in buoy_data], dtype=np.float64).reshape(len(buoy_data), component_count, 3)
+
+    if transfer_table is not None and transfer_table.matches(location):
+        minimum, maximum = transfer_table.breaking_wave_heights(components[:, :, 0], components[:, :, 1], components[:, :, 2])
+    else:
+        minimum, maximum = tools.breaking_wave_heights(components[:, :, 0], components[:, :, 1], components[:, :, 2], location.angle, location.depth, location.slope)
+    order = np.argsort(-np.where(np.isnan(maximum), -np.inf, maximum), axis=1, kind='stable')
+
+    if component_count > 0:
+        scale = np.array([from_metric[x.unit] for x in buoy_data])
+        dominant_minimum = (np.take_along_axis(minimum, order[:, :1], axis=1)[:, 0] * scale).tolist()
+        dominant_maximum = (np.take_along_axis(maximum, order[:, :1], axis=1)[:, 0] * scale).tolist()
+    order = order.tolist()
+
+    for i, data in enumerate(buoy_data):
+        if len(data.swell_components) < 1:
+            data.minimum_breaking_height = float('nan')
+            data.maximum_breaking_height = float('nan')
+            continue
+
+        swell_components = data.swell_components
+        data.swell_components = [swell_components[x] for x in order[i] if x < len(swell_components)]
+        data.minimum_breaking_height = dominant_minimum[i]
+        data.maximum_breaking_height = dominant_maximum[i]
+
+    return buoy_data
+
+
+def merge_wave_weather_data(wave_data: List[BuoyData], weather_data: List[BuoyData], tolerance=0, interpolate=False) -> List[BuoyData]:
+    # As-of join of the weather onto the wave timeline. Each wave point takes the nearest weather point no more
+    # than tolerance (seconds or a timedelta) away. With interpolate, the wind and air temperature are instead
+    # interpolated between the weather points on either side, as long as both are within the tolerance
+    if len(wave_data) < 1 or len(weather_data) < 1:
+        return wave_data
+
+    if isinstance(tolerance, datetime.timedelta):
+        tolerance = tolerance.total_seconds()
+
+    change_units_series(wave_data, units.Units.metric)
+    change_units_series(weather_data, units.Units.metric)
+
+    weather_index = TimeIndex.from_data(weather_data)
+    weather_data = [weather_data[i] for i in weather_index.order]
+    weather_times = weather_index.timestamps
+    wave_times = to_timestamps([x.date for x in wave_data])
+
+    def weather_values(field):
+        return np.array([np.nan if getattr(x, field) is None else getattr(x, field) for x in weather_data], dtype=np.float64)
+
+    air_temperature = weather_values('air_temperature')
+    wind_speed = weather_values('wind_speed')
+    wind_direction = weather_values('wind_direction')
+    wind_direction[wind_direction < 0] = np.nan
+
+    # Positions in the sorted weather series rather than the callers order
+    nearest = weather_index.nearest_indexes(wave_times, tolerance)
+    nearest = np.where(nearest >= 0, np.argsort(weather_index.order)[np.maximum(nearest, 0)], -1)
+
+    matched_air_temperature = np.where(nearest >= 0, air_temperature[nearest], np.nan)
+    matched_wind_speed = np.where(nearest >= 0, wind_speed[nearest], np.nan)
+    matched_wind_direction = np.where(nearest >= 0, wind_direction[nearest], np.nan)
+    interpolated = np.zeros(len(wave_times), dtype=bool)
+
+    if interpolate and len(weather_times) > 1:
+        upper = np.clip(np.searchsorted(weather_times, wave_times), 1, len(weather_times) - 1)
+        lower = upper - 1
+        span = weather_times[upper] - weather_times[lower]
+        weight = np.clip((wave_times - weather_times[lower]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+        interpolated = (wave_times >= weather_times[0]) & (wave_times <= weather_times[-1]) & \
+            (wave_times - weather_times[lower] <= tolerance) & (weather_times[upper] - wave_times <= tolerance)
+
+        # Wind direction is interpolated the short way around the compass
+        direction_change = (wind_direction[upper] - wind_direction[lower] + 180.0) % 360.0 - 180.0
+        interpolated_direction = (wind_direction[lower] + weight * direction_change) % 360.0
+        interpolated_speed = wind_speed[lower] + weight * (wind_speed[upper] - wind_speed[lower])
+        interpolated_temperature = air_temperature[lower] + weight * (air_temperature[upper] - air_temperature[lower])
+
+        matched_air_temperature = np.where(interpolated, interpolated_temperature, matched_air_temperature)
+        matched_wind_speed = np.where(interpolated, interpolated_speed, matched_wind_speed)
+        matched_wind_direction = np.where(interpolated, interpolated_direction, matched_wind_direction)
+        nearest = np.where(interpolated & (nearest < 0), np.where(weight < 0.5, lower, upper), nearest)
+
+    matched_compass_direction = units.degree_to_direction(matched_wind_direction)
+
+    for i in np.flatnonzero(nearest >= 0).tolist():
+        wave = wave_data[i]
+        weather = weather_data[nearest[i]]
+
+        if not isnan(matched_air_temperature[i]):
+            wave.air_temperature = float(matched_air_temperature[i])
+        wave.short_forecast = weather.short_forecast
+        if not isnan(matched_wind_speed[i]):
+            wave.wind_speed = float(matched_wind_speed[i])
+        if not isnan(matched_wind_direction[i]):
+            wave.wind_direction = float(matched_wind_direction[i])
+        if interpolated[i] and not isnan(matched_wind_direction[i]):
+            wave.wind_compass_direction = str(matched_compass_direction[i])
+        elif weather.wind_compass_direction is not None:
+            wave.wind_compass_direction = weather.wind_compass_direction
+
+    return wave_data
@@ -0,0 +1,135 @@
+import numpy as np
+
+
+class QualityFlag:
+    good = 0
+    missing = 1
+    out_of_range = 2
+    spike = 4
+    step = 8
+    stuck = 16
+
+
+class FieldLimits(object):
+
+    def __init__(self, sentinels=None, minimum=-np.inf, maximum=np.inf, spike=np.inf, step=np.inf, stuck_count=0, circular=False):
+        # Spike and step thresholds are the largest believable change between neighbouring samples,
+        # stuck_count is the number of identical samples in a row before a sensor is considered stuck
+        self.sentinels = sentinels
+        if self.sentinels is None:
+            self.sentinels = []
+        self.minimum = minimum
+        self.maximum = maximum
+        self.spike = spike
+        self.step = step
+        self.stuck_count = stuck_count
+        self.circular = circular
+
+
+# Limits for the metric values NDBC publishes, keyed by the BuoyData style field names
+field_limits = {
+    'wind_direction': FieldLimits([999.0], 0.0, 360.0, circular=True),
+    'wind_speed': FieldLimits([99.0], 0.0, 60.0, spike=10.0, step=15.0, stuck_count=12),
+    'wind_gust': FieldLimits([99.0], 0.0, 80.0, spike=15.0, step=20.0, stuck_count=12),
+    'wave_height': FieldLimits([99.0], 0.0, 25.0, spike=3.0, step=5.0, stuck_count=12),
+    'dominant_period': FieldLimits([99.0], 1.0, 30.0),
+    'average_period': FieldLimits([99.0], 1.0, 25.0, spike=6.0, stuck_count=24),
+    'mean_wave_direction': FieldLimits([999.0], 0.0, 360.0, circular=True),
+    'pressure': FieldLimits([9999.0], 850.0, 1090.0, spike=5.0, step=8.0, stuck_count=24),
+    'pressure_tendency': FieldLimits([99.0], -20.0, 20.0),
+    'air_temperature': FieldLimits([999.0], -60.0, 50.0, spike=5.0, step=8.0, stuck_count=24),
+    'water_temperature': FieldLimits([999.0], -3.0, 40.0, spike=3.0, step=5.0, stuck_count=48),
+    'dewpoint_temperature': FieldLimits([999.0], -60.0, 40.0, spike=5.0, step=8.0),
+    'visibility': FieldLimits([99.0], 0.0, 50.0),
+    'water_level': FieldLimits([99.0], -30.0, 30.0),
+}
+
+
+def mask_sentinels(columns, limits=field_limits):
+    # Replaces the missing data sentinels with NaN, columns without limits are passed through
+    masked = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if name in limits and len(limits[name].sentinels) > 0:
+            values = np.where(np.isin(values, limits[name].sentinels), np.nan, values)
+        masked[name] = values
+    return masked
+
+
+def _differences(values, circular):
+    differences = np.diff(values)
+    if circular:
+        differences = (differences + 180.0) % 360.0 - 180.0
+    return differences
+
+
+def _stuck_mask(values, stuck_count):
+    # Flags every sample in a run of at least stuck_count identical values
+    if stuck_count < 2 or len(values) < stuck_count:
+        return np.zeros(len(values), dtype=bool)
+
+    changed = np.concatenate([[True], values[1:] != values[:-1]])
+    run_ids = np.cumsum(changed) - 1
+    run_lengths = np.bincount(run_ids)
+    return (run_lengths[run_ids] >= stuck_count) & ~np.isnan(values)
+
+
+def field_quality_flags(timestamps, values, limits, max_gap=10800):
+    # Flags for one field of a series that is already sorted by time. Spikes and steps are only
+    # checked between samples no more than max_gap seconds apart
+    values = np.asarray(values, dtype=np.float64)
+    flags = np.zeros(len(values), dtype=np.uint8)
+
+    missing = np.isnan(values) | np.isin(values, limits.sentinels)
+    flags[missing] |= QualityFlag.missing
+    values = np.where(missing, np.nan, values)
+
+    out_of_range = (values < limits.minimum) | (values > limits.maximum)
+    flags[out_of_range] |= QualityFlag.out_of_range
+    values = np.where(out_of_range, np.nan, values)
+
+    if len(values) < 2:
+        return flags
+
+    contiguous = np.diff(timestamps) <= max_gap
+    differences = _differences(values, limits.circular)
+    with np.errstate(invalid='ignore'):
+        jumps = np.abs(differences)
+
+        if np.isfinite(limits.step):
+            steps = (jumps > limits.step) & contiguous
+            flags[1:][steps] |= QualityFlag.step
+
+        if np.isfinite(limits.spike) and len(values) > 2:
+            # A spike jumps away from its neighbours and straight back again
+            rise = differences[:-1]
+            fall = differences[1:]
+            spikes = (jumps[:-1] > limits.spike) & (jumps[1:] > limits.spike) & (np.sign(rise) != np.sign(fall))
+            spikes &= contiguous[:-1] & contiguous[1:]
+            flags[1:-1][spikes] |= QualityFlag.spike
+
+    flags[_stuck_mask(values, limits.stuck_count)] |= QualityFlag.stuck
+    return flags
+
+
+def quality_control(timestamps, columns, limits=field_limits, max_gap=10800):
+    # Runs every check over the columns of a parsed buoy series. Returns the columns with every
+    # flagged sample replaced by NaN and the per field quality flags, both in the original order
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    order = np.argsort(timestamps, kind='stable')
+    sorted_timestamps = timestamps[order]
+
+    cleaned = {}
+    flags = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if name not in limits or values.ndim != 1:
+            cleaned[name] = values
+            continue
+
+        field_flags = np.empty(len(values), dtype=np.uint8)
+        field_flags[order] = field_quality_flags(sorted_timestamps, values[order], limits[name], max_gap)
+        flags[name] = field_flags
+        cleaned[name] = np.where(field_flags == QualityFlag.good, values, np.nan)
+
+    return cleaned, flags
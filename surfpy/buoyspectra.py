@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from . import tools
 from .units import Units, degree_to_direction
 from .swell import Swell
@@ -75,7 +76,28 @@ class BuoySpectra(object):
             return []
 
         min_indexes, min_values, max_indexes, max_values = tools.peakdetect(self.energy, delta=0.05)
+        return self._partition_swell_components(min_indexes, max_indexes, max_values)
+
+    @staticmethod
+    def swell_components_batch(spectra):
+        # Partitions a whole spectral history at once, peak detection runs over every spectra in a
+        # single batch. Returns the swell components of each spectra in the same order
+        energies = [x.energy for x in spectra]
+        width = max([len(x) for x in energies] + [0])
+        padded = np.full((len(energies), width), np.nan)
+        for i, energy in enumerate(energies):
+            padded[i, :len(energy)] = energy
+
+        peaks = tools.peakdetect_batch(padded, delta=0.05)
+        components = []
+        for spectra_item, (min_indexes, min_values, max_indexes, max_values) in zip(spectra, peaks):
+            if len(spectra_item.frequency) < 1 or len(spectra_item.energy) < 1:
+                components.append([])
+                continue
+            components.append(spectra_item._partition_swell_components(min_indexes, max_indexes, max_values))
+        return components
 
+    def _partition_swell_components(self, min_indexes, max_indexes, max_values):
         components = []
         prev_index = 0
         for i in range(0, len(max_values)):
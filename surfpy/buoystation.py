@@ -4,15 +4,24 @@ from .buoydata import BuoyData
 from .buoyspectra import BuoySpectra
 from .swell import Swell
 from .location import Location
-from datetime import datetime
-from .tools import parse_float, parse_int, steepness
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+from .tools import parse_float, parse_int, steepness, split_lines, read_lines, retry_session
+from .timeindex import TimeIndex
+from .responsecache import ResponseCache, data_expiration_date
+from .ndbccolumns import parse_header, meteorological_fields, realtime_meteorological_header, time_columns
 from . import units
+import copy
+import heapq
 import re
 try:
     import requests
 except:
     pass
 import math
+import numpy as np
 import pytz
 
 
@@ -27,6 +36,10 @@ class BuoyStation(BaseStation):
         tao = 'tao'
         other = 'other'
 
+    # Shared across every station so parsed observations are reused until they expire. Bounded so
+    # processes polling many stations keep only the most recently used results
+    response_cache = ResponseCache(maxsize=256)
+
     def __init__(self, station_id, location, owner='', program='', active=False, currents=False, water_quality=False, dart=False, buoy_type=BuoyType.none, name=''):
         super(BuoyStation, self).__init__(station_id, location)
 
@@ -59,6 +72,12 @@ class BuoyStation(BaseStation):
     def directional_wave_reading_url(self):
         return f'https://www.ndbc.noaa.gov/data/realtime2/{self.station_id}.swdir'
 
+    def historical_meteorological_url(self, year):
+        return f'https://www.ndbc.noaa.gov/data/historical/stdmet/{self.station_id.lower()}h{year}.txt.gz'
+
+    def historical_spectral_density_url(self, year):
+        return f'https://www.ndbc.noaa.gov/data/historical/swden/{self.station_id.lower()}w{year}.txt.gz'
+
     def wave_forecast_bulletin_url(self, model: NOAAModel):
         model_run_time = model.latest_model_time()
         model_run_str = str(model_run_time.hour).rjust(2, '0')
@@ -67,15 +86,13 @@ class BuoyStation(BaseStation):
 
     @staticmethod
     def parse_latest_reading_data(raw_data):
-        raw_data = raw_data.split('\n')
+        raw_data = split_lines(raw_data)
         if len(raw_data) < 6:
             print('Invalid latest station data')
             return None
 
         data = BuoyData(units.Units.english)
         data.date = pytz.utc.localize(datetime.strptime(raw_data[4], '%H%M %Z %m/%d/%y'))
-        print(data.date)
-        print(raw_data[4])
 
         swell_period_read = False
         swell_direction_read = False
@@ -148,60 +165,78 @@ class BuoyStation(BaseStation):
 
     @staticmethod
     def parse_meteorological_reading_data(raw_data, count_limit):
-        raw_data = raw_data.split('\n')
+        raw_data = split_lines(raw_data)
         if len(raw_data) < 2:
             print('Failed to parse meteorological data')
             return None
 
         header_lines = 2
-        data_lines = len(raw_data) - header_lines
-        if data_lines > count_limit and count_limit > 0:
-            data_lines = count_limit
+
+        # Columns are found by name through the same mapping the archive ingest uses
+        header = parse_header(raw_data[0]) if raw_data[0].startswith('#') else []
+        fields = meteorological_fields(header)
+        if len(fields) < 1:
+            header = realtime_meteorological_header
+            fields = meteorological_fields(header)
+        time_column_count = len([x for x in header if x in time_columns])
+
+        def value(line, field):
+            if field not in fields:
+                return float('nan')
+            return parse_float(line[fields[field]])
 
         all_data = []
-        for i in range(header_lines, header_lines + data_lines):
+        for i in range(header_lines, len(raw_data)):
+            if count_limit > 0 and len(all_data) >= count_limit:
+                break
+
             raw_data_line = raw_data[i].split()
+            if len(raw_data_line) < len(header):
+                continue
+
             data = BuoyData(units.Units.metric)
             wave_summary = Swell(units.Units.metric)
-            data.date = pytz.utc.localize(datetime(*[int(x) for x in raw_data_line[0:5]]))
-            data.wind_direction = parse_float(raw_data_line[5])
+            data.date = pytz.utc.localize(datetime(*[int(x) for x in raw_data_line[0:time_column_count]]))
+            data.wind_direction = value(raw_data_line, 'wind_direction')
             data.wind_compass_direction = units.degree_to_direction(data.wind_direction)
-            data.wind_speed = parse_float(raw_data_line[6])
-            data.wind_gust = parse_float(raw_data_line[7])
-            wave_summary.wave_height = parse_float(raw_data_line[8])
-            wave_summary.period = parse_float(raw_data_line[9])
-            data.average_period = parse_float(raw_data_line[10])
-            wave_summary.direction = parse_float(raw_data_line[11])
+            data.wind_speed = value(raw_data_line, 'wind_speed')
+            data.wind_gust = value(raw_data_line, 'wind_gust')
+            wave_summary.wave_height = value(raw_data_line, 'wave_height')
+            wave_summary.period = value(raw_data_line, 'dominant_period')
+            data.average_period = value(raw_data_line, 'average_period')
+            wave_summary.direction = value(raw_data_line, 'mean_wave_direction')
             wave_summary.compass_direction = units.degree_to_direction(wave_summary.direction)
-            data.pressure = parse_float(raw_data_line[12])
-            data.air_temperature = parse_float(raw_data_line[13])
-            data.water_temperature = parse_float(raw_data_line[14])
-            data.dewpoint_temperature = parse_float(raw_data_line[15])
-            data.pressure_tendency = parse_float(raw_data_line[17])
-            data.water_level = units.convert(parse_float(raw_data_line[18]), units.Measurement.length, units.Units.english, units.Units.metric)
+            data.pressure = value(raw_data_line, 'pressure')
+            data.air_temperature = value(raw_data_line, 'air_temperature')
+            data.water_temperature = value(raw_data_line, 'water_temperature')
+            data.dewpoint_temperature = value(raw_data_line, 'dewpoint_temperature')
+            data.pressure_tendency = value(raw_data_line, 'pressure_tendency')
+            data.water_level = units.convert(value(raw_data_line, 'water_level'), units.Measurement.length, units.Units.english, units.Units.metric)
+            if not math.isnan(wave_summary.wave_height):
+                data.wave_summary = wave_summary
             data.find_expiration_date()
             all_data.append(data)
 
-        if not math.isnan(wave_summary.wave_height):
-            data.wave_summary = wave_summary
-
         return all_data
 
     @staticmethod
     def parse_detailed_wave_reading_data(raw_data, count_limit):
-        raw_data = raw_data.split('\n')
+        raw_data = split_lines(raw_data)
         if len(raw_data) < 2:
             print('Failed to parse detailed wave data')
             return None
 
         header_lines = 2
-        data_lines = len(raw_data) - header_lines
-        if data_lines > count_limit and count_limit > 0:
-            data_lines = count_limit
 
         all_data = []
-        for i in range(header_lines, header_lines + data_lines):
+        for i in range(header_lines, len(raw_data)):
+            if count_limit > 0 and len(all_data) >= count_limit:
+                break
+
             raw_data_line = raw_data[i].split()
+            if len(raw_data_line) < 15:
+                continue
+
             data = BuoyData(units.Units.metric)
             data.wave_summary = Swell(units.Units.metric)
             swell_component = Swell(units.Units.metric)
@@ -232,8 +267,8 @@ class BuoyStation(BaseStation):
 
     @staticmethod
     def parse_wave_spectra_reading_data(energy_data, directional_data, count_limit, latest_report_date=None):
-        energy_data = energy_data.split('\n')
-        directional_data = directional_data.split('\n')
+        energy_data = split_lines(energy_data)
+        directional_data = split_lines(directional_data)
         if len(energy_data) != len(directional_data):
             print('Failed to parse wave spectra data')
             return None
@@ -242,14 +277,16 @@ class BuoyStation(BaseStation):
             return None
 
         header_lines = 1
-        data_lines = len(energy_data) - header_lines
-        if data_lines > count_limit and count_limit > 0:
-            data_lines = count_limit
 
         all_data = []
-        for i in range(header_lines, header_lines + data_lines):
+        for i in range(header_lines, len(energy_data)):
+            if count_limit > 0 and len(all_data) >= count_limit:
+                break
+
             raw_energy = energy_data[i].strip().replace(')', '').replace('(', '').split()
             raw_directional = directional_data[i].strip().replace(')', '').replace('(', '').split()
+            if len(raw_energy) < 6 or len(raw_directional) < 7:
+                continue
 
             spectra = BuoySpectra()
             data = BuoyData(units.Units.metric)
@@ -267,7 +304,6 @@ class BuoyStation(BaseStation):
 
             data.wave_spectra = spectra
             data.wave_summary = spectra.wave_summary
-            data.swell_components = spectra.swell_components
             data.steepness = steepness(data.wave_summary.wave_height, data.wave_summary.period)
             data.average_period = spectra.average_period
 
@@ -275,6 +311,11 @@ class BuoyStation(BaseStation):
 
             all_data.append(data)
 
+        # Partition the whole history in one batch
+        spectra_components = BuoySpectra.swell_components_batch([x.wave_spectra for x in all_data])
+        for data, components in zip(all_data, spectra_components):
+            data.swell_components = components
+
         return all_data
 
     @staticmethod
@@ -297,7 +338,6 @@ class BuoyStation(BaseStation):
         for i in range(HEADER_LINES, data_lines + HEADER_LINES):
             columns = raw_lines[i].split('|')
             if len(columns) < 8:
-                print('asjhdkajhsd')
                 continue
             
             # First column is date and time, second is the index, all the other are wave components
@@ -349,38 +389,180 @@ class BuoyStation(BaseStation):
             
         return buoy_data
 
-    def fetch_latest_reading(self):
-        print(self.latest_reading_url)
-        response = requests.get(self.latest_reading_url)
-        if len(response.text) < 1:
-            return None
-        return self.parse_latest_reading_data(response.text)
+    @staticmethod
+    def _line_limit(header_lines, data_count):
+        # Only stream as many lines as the parser will consume, zero reads the whole file
+        if data_count is None or data_count < 1:
+            return 0
+        return header_lines + data_count
 
-    def fetch_meteorological_reading(self, data_count=20):
-        response = requests.get(self.meteorological_reading_url)
-        if len(response.text) < 1:
+    @staticmethod
+    def _get_responses(urls, headers, session=None):
+        # Products made of several files are requested concurrently
+        get = session.get if session is not None else requests.get
+        if len(urls) < 2:
+            return [get(url, headers=header, stream=True) for url, header in zip(urls, headers)]
+
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            return list(executor.map(lambda request: get(request[0], headers=request[1], stream=True), zip(urls, headers)))
+
+    def _cached_fetch(self, urls, line_limit, parse, session=None):
+        # Parsed results are held until NDBC is expected to publish the next observation. Once
+        # expired the request is revalidated so unchanged files skip both the transfer and the parse
+        cache_key = (tuple(urls), line_limit)
+        entry = self.response_cache.get(cache_key)
+        if entry is not None and not entry.is_expired():
+            return entry.copy_data()
+
+        headers = [entry.request_headers(url) if entry is not None else {} for url in urls]
+        responses = self._get_responses(urls, headers, session)
+
+        if entry is not None:
+            if all([x.status_code == 304 for x in responses]):
+                for response in responses:
+                    response.close()
+                for data in (entry.data if isinstance(entry.data, list) else [entry.data]):
+                    data.find_expiration_date()
+                entry.expiration_date = data_expiration_date(entry.data)
+                return entry.copy_data()
+
+            # Only part of the product changed so the rest has to be downloaded again in full
+            for i in range(0, len(responses)):
+                if responses[i].status_code == 304:
+                    responses[i].close()
+                    responses[i] = self._get_responses([urls[i]], [{}], session)[0]
+
+        raw_lines = [read_lines(x, line_limit) for x in responses]
+        if any([len(x) < 1 for x in raw_lines]):
             return None
-        return self.parse_meteorological_reading_data(response.text, data_count)
 
-    def fetch_detailed_wave_reading(self, data_count=20):
-        response = requests.get(self.detailed_wave_reading_url)
-        if len(response.text) < 1:
-            return None
-        return self.parse_detailed_wave_reading_data(response.text, data_count)
+        data = parse(raw_lines, responses)
+        expiration_date = data_expiration_date(data)
+        if expiration_date is None:
+            return data
 
-    def fetch_wave_spectra_reading(self, data_count=20):
-        energy_response = requests.get(self.wave_energy_reading_url)
-        directional_response = requests.get(self.directional_wave_reading_url)
-        if len(energy_response.text) < 1 or len(directional_response.text) < 1:
-            return None
+        self.response_cache.put(cache_key, data, expiration_date, urls, responses)
+        return copy.deepcopy(data)
+
+    def fetch_latest_reading(self, session=None):
+        return self._cached_fetch([self.latest_reading_url], 0,
+            lambda lines, responses: self.parse_latest_reading_data(lines[0]), session)
+
+    def fetch_meteorological_reading(self, data_count=20, session=None):
+        return self._cached_fetch([self.meteorological_reading_url], self._line_limit(2, data_count),
+            lambda lines, responses: self.parse_meteorological_reading_data(lines[0], data_count), session)
+
+    def fetch_detailed_wave_reading(self, data_count=20, session=None):
+        return self._cached_fetch([self.detailed_wave_reading_url], self._line_limit(2, data_count),
+            lambda lines, responses: self.parse_detailed_wave_reading_data(lines[0], data_count), session)
+
+    def fetch_wave_spectra_reading(self, data_count=20, session=None):
+        def parse(lines, responses):
+            # The spectra date is often update multiple times per hour but the time reported in the data is
+            # only the most recent hour number which is not accurate enough for us unless it is in the past. 
+            # FORMAT Mon, 29 Jun 2020 14:50:20 GMT
+            raw_modification_date = responses[0].headers['Last-Modified']
+            modification_date = datetime.strptime(raw_modification_date, '%a, %d %b %Y %H:%M:%S %Z')
+            return self.parse_wave_spectra_reading_data(lines[0], lines[1], data_count, modification_date)
+
+        urls = [self.wave_energy_reading_url, self.directional_wave_reading_url]
+        return self._cached_fetch(urls, self._line_limit(1, data_count), parse, session)
+
+    def fetch_all(self, data_count=20, session=None):
+        # Requests the meteorological, detailed wave and both spectra files at the same time over one
+        # pooled session and joins them into a single time series, newest first
+        if session is None:
+            session = retry_session(retries=2)
 
-        # The spectra date is often update multiple times per hour but the time reported in the data is
-        # only the most recent hour number which is not accurate enough for us unless it is in the past. 
-        # FORMAT Mon, 29 Jun 2020 14:50:20 GMT
-        raw_modification_date = energy_response.headers['Last-Modified']
-        modification_date = datetime.strptime(raw_modification_date, '%a, %d %b %Y %H:%M:%S %Z')
-        
-        return self.parse_wave_spectra_reading_data(energy_response.text, directional_response.text, data_count, modification_date)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            meteorological = executor.submit(self.fetch_meteorological_reading, data_count, session)
+            detailed_wave = executor.submit(self.fetch_detailed_wave_reading, data_count, session)
+            spectra = executor.submit(self.fetch_wave_spectra_reading, data_count, session)
+
+            return self.merge_readings(meteorological.result(), detailed_wave.result(), spectra.result())
+
+    @staticmethod
+    def merge_readings(meteorological_data, detailed_wave_data, spectra_data, tolerance=1800):
+        # Outer joins the meteorological and detailed wave readings on their timestamps with a single sorted
+        # merge, then joins each spectra reading to the nearest row no more than tolerance (seconds or a
+        # timedelta) away, since the newest spectra are dated from the file modification time rather than a
+        # report time. Spectra without a row that close get a row of their own. Meteorological readings supply
+        # the weather and wave summary, detailed wave readings the swell components and the spectra readings
+        # the raw wave spectra. The input readings are left unchanged
+        if isinstance(tolerance, timedelta):
+            tolerance = tolerance.total_seconds()
+
+        meteorological_data = sorted(meteorological_data or [], key=lambda x: x.date, reverse=True)
+        detailed_wave_data = sorted(detailed_wave_data or [], key=lambda x: x.date, reverse=True)
+        spectra_data = list(spectra_data or [])
+
+        tagged = [
+            [(x.date, 0, x) for x in meteorological_data],
+            [(x.date, 1, x) for x in detailed_wave_data],
+        ]
+        rows = [(date, [(product, data) for _, product, data in group])
+                for date, group in groupby(heapq.merge(*tagged, key=itemgetter(0), reverse=True), key=itemgetter(0))]
+
+        matched = {}
+        if len(rows) > 0 and len(spectra_data) > 0:
+            row_index = TimeIndex.from_dates([x[0] for x in rows])
+            spectra_dates = [x.date for x in spectra_data]
+            nearest = row_index.nearest_indexes(spectra_dates, tolerance)
+            distances = np.abs(row_index.offsets(spectra_dates, nearest))
+            # A row takes at most one spectra reading, the closest one
+            for i in np.argsort(distances, kind='stable').tolist():
+                if nearest[i] >= 0 and int(nearest[i]) not in matched:
+                    matched[int(nearest[i])] = i
+
+        for row, i in matched.items():
+            rows[row][1].append((2, spectra_data[i]))
+        matched_spectra = set(matched.values())
+        rows.extend((x.date, [(2, x)]) for i, x in enumerate(spectra_data) if i not in matched_spectra)
+        rows.sort(key=itemgetter(0), reverse=True)
+
+        merged = []
+        for date, group in rows:
+            reading = BuoyData(units.Units.metric, date=date)
+            for product, data in group:
+                # Merged rows share no objects with the inputs, so changing a row never changes them
+                data = copy.deepcopy(data)
+                if data.unit != units.Units.metric:
+                    data.change_units(units.Units.metric)
+                if reading.expiration_date is None:
+                    reading.expiration_date = data.expiration_date
+
+                if product == 0:
+                    reading.wind_direction = data.wind_direction
+                    reading.wind_compass_direction = data.wind_compass_direction
+                    reading.wind_speed = data.wind_speed
+                    reading.wind_gust = data.wind_gust
+                    reading.pressure = data.pressure
+                    reading.pressure_tendency = data.pressure_tendency
+                    reading.air_temperature = data.air_temperature
+                    reading.water_temperature = data.water_temperature
+                    reading.dewpoint_temperature = data.dewpoint_temperature
+                    reading.water_level = data.water_level
+                    if reading.wave_summary is None:
+                        reading.wave_summary = data.wave_summary
+                    if math.isnan(reading.average_period):
+                        reading.average_period = data.average_period
+                elif product == 1:
+                    reading.wave_summary = data.wave_summary
+                    reading.swell_components = data.swell_components
+                    reading.steepness = data.steepness
+                    reading.average_period = data.average_period
+                else:
+                    reading.wave_spectra = data.wave_spectra
+                    if reading.wave_summary is None:
+                        reading.wave_summary = data.wave_summary
+                    if len(reading.swell_components) < 1:
+                        reading.swell_components = data.swell_components
+                        reading.steepness = data.steepness
+                        reading.average_period = data.average_period
+
+            merged.append(reading)
+
+        return merged
 
     def fetch_wave_forecast_bulletin(self, model):
         url = self.wave_forecast_bulletin_url(model)
@@ -390,18 +572,30 @@ class BuoyStation(BaseStation):
             return None
         return self.parse_wave_forecast_bulletin(response.text, None)
 
+    def _fetch_archive(self, url, ingest):
+        response = requests.get(url, stream=True)
+        if response.status_code != 200:
+            response.close()
+            return 0
+        try:
+            return ingest(response.raw)
+        finally:
+            response.close()
+
+    def fetch_historical_meteorological_data(self, year, archive):
+        # Streams a year of standard meteorological data into the given BuoyArchive
+        return self._fetch_archive(self.historical_meteorological_url(year), archive.ingest_meteorological)
+
+    def fetch_historical_spectral_density_data(self, year, archive):
+        # Streams a year of spectral wave density data into the given BuoyArchive
+        return self._fetch_archive(self.historical_spectral_density_url(year), archive.ingest_spectral_density)
+
     @staticmethod
-    def data_index_for_date(data, datetime):
+    def data_index_for_date(data, date):
+        # Returns the index of the reading closest to date and the signed number of seconds
+        # from that reading to date. Build a TimeIndex directly when matching many dates
         if len(data) < 1:
             return None
 
-        min_duration = (datetime - data[0].date).seconds
-        min_index = 0
-
-        for i in range(1, len(data)):
-            duration = (datetime - data[i].date).seconds
-            if abs(duration) < min_duration:
-                min_duration = duration
-                min_index = i
-
-        return min_index, min_duration
+        index = TimeIndex.from_data(data).nearest(date)
+        return index, (date - data[index].date).total_seconds()
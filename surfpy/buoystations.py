@@ -1,7 +1,20 @@
 from .basestations import BaseStations
 from .buoystation import BuoyStation
-from .location import Location
+from .buoydata import BuoyData
+from .swell import Swell
+from .location import Location, nearest_locations
+from .buoyqc import mask_sentinels
+from .ndbccolumns import meteorological_columns, latest_observation_columns
+from .stationcatalog import LazyStations
+from .tools import parse_float
+from . import units
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 import xml.etree.ElementTree as ET
+import tarfile
+import io
+import numpy as np
+import pytz
 try:
     import requests
 except:
@@ -11,6 +24,7 @@ except:
 class BuoyStations(BaseStations):
 
     active_buoys_url="https://www.ndbc.noaa.gov/activestations.xml"
+    latest_readings_url="https://www.ndbc.noaa.gov/data/latest_obs/latest_obs.txt"
 
     def __init__(self, stations=None, fetch_date=None):
         super(BuoyStations, self).__init__()
@@ -23,22 +37,10 @@ class BuoyStations(BaseStations):
         if len(self.stations) < 1:
             return None
 
-        closest_buoy = None
-        closest_distance = float('inf')
-
-        for station in self.stations:
-            if active and not station.active:
-                continue
-            if buoy_type != BuoyStation.BuoyType.none:
-                if station.buoy_type != buoy_type:
-                    continue
-
-            dist = location.distance(station.location)
-            if dist < closest_distance:
-                closest_buoy = station
-                closest_distance = dist
-
-        return closest_buoy
+        closest_buoys = self.find_closest_buoys(location, 1, active, buoy_type)
+        if len(closest_buoys) < 1:
+            return None
+        return closest_buoys[0]
 
     def find_closest_buoys(self, location, count, active=False, buoy_type=BuoyStation.BuoyType.none):
         if len(self.stations) < 1:
@@ -46,63 +48,243 @@ class BuoyStations(BaseStations):
         elif count < 1:
             return None
 
-        closest_buoys = [None for x in range(0, count)]
-        closest_distances = [float('inf') for x in range(0, count)]
+        positions = np.flatnonzero(self.station_mask(active, buoy_type))
+        indexes, _ = nearest_locations([location], self.station_coordinates()[positions], count)
+        return [self.stations[x] for x in positions[indexes[0]].tolist()]
 
-        for station in self.stations:
-            if active and not station.active:
-                continue
-            if buoy_type != BuoyStation.BuoyType.none:
-                if station.buoy_type != buoy_type:
+    def station_mask(self, active=False, buoy_type=BuoyStation.BuoyType.none):
+        # Boolean mask over self.stations of the buoys matching the filters
+        if isinstance(self.stations, LazyStations):
+            columns = self.stations.catalog.columns
+            active_stations, buoy_types = columns['active'], columns['buoy_type']
+        else:
+            active_stations = np.array([x.active for x in self.stations], dtype=bool)
+            buoy_types = np.array([x.buoy_type for x in self.stations])
+
+        matching = np.ones(len(self.stations), dtype=bool)
+        if active:
+            matching &= active_stations
+        if buoy_type != BuoyStation.BuoyType.none:
+            matching &= buoy_types == buoy_type
+        return matching
+
+    @staticmethod
+    def wave_forecast_bulletins_url(model):
+        model_run_time = model.latest_model_time()
+        model_run_str = str(model_run_time.hour).rjust(2, '0')
+        date_str = model_run_time.strftime('%Y%m%d')
+        return f'https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod/gfs.{date_str}/{model_run_str}/wave/station/gfswave.t{model_run_str}z.bull_tar'
+
+    def fetch_stations(self, cache_path=None, ttl=timedelta(days=1)):
+        return self._fetch_stations(self.active_buoys_url, cache_path=cache_path, ttl=ttl)
+
+    def catalog_columns(self):
+        columns = super(BuoyStations, self).catalog_columns()
+        columns['owner'] = [x.owner for x in self.stations]
+        columns['program'] = [x.program for x in self.stations]
+        columns['buoy_type'] = [x.buoy_type for x in self.stations]
+        for name in ['active', 'currents', 'water_quality', 'dart']:
+            columns[name] = np.array([getattr(x, name) for x in self.stations], dtype=bool)
+        return columns
+
+    @staticmethod
+    def station_from_catalog(columns, index):
+        return BuoyStation(str(columns['station_id'][index]), BaseStations.catalog_location(columns, index), owner=str(columns['owner'][index]),
+            program=str(columns['program'][index]), active=bool(columns['active'][index]), currents=bool(columns['currents'][index]),
+            water_quality=bool(columns['water_quality'][index]), dart=bool(columns['dart'][index]), buoy_type=str(columns['buoy_type'][index]))
+
+    def parse_stations(self, rawData, active=False, buoy_type=BuoyStation.BuoyType.none, owner=None, program=None, bbox=None):
+        # Streams the activestations.xml from a string, bytes or a file object. Stations are filtered on their
+        # raw attributes before any objects are built, bbox is (south latitude, west longitude, north latitude,
+        # east longitude) and may cross the antimeridian
+        if isinstance(rawData, str):
+            rawData = io.BytesIO(rawData.encode('utf-8'))
+        elif isinstance(rawData, bytes):
+            rawData = io.BytesIO(rawData)
+
+        stations = None
+        try:
+            for event, element in ET.iterparse(rawData, events=('start', 'end')):
+                if stations is None:
+                    if element.tag != 'stations':
+                        return False
+                    stations = element
+                    continue
+                if event != 'end' or element.tag != 'station':
+                    continue
+
+                # clear() empties the attribute dict itself with the pure Python ElementTree
+                attribs = dict(element.attrib)
+                element.clear()
+                stations.clear()
+
+                if active and 'y' not in attribs.get('met', ''):
                     continue
+                if buoy_type != BuoyStation.BuoyType.none and attribs['type'] != buoy_type:
+                    continue
+                if owner is not None and attribs['owner'] != owner:
+                    continue
+                if program is not None and attribs['pgm'] != program:
+                    continue
+
+                latitude = float(attribs['lat'])
+                longitude = float(attribs['lon'])
+                if bbox is not None:
+                    south, west, north, east = bbox
+                    if latitude < south or latitude > north:
+                        continue
+                    if west <= east and (longitude < west or longitude > east):
+                        continue
+                    if west > east and (longitude < west and longitude > east):
+                        continue
+
+                loc = Location(latitude, longitude, name=attribs['name'])
+                if 'elev' in attribs:
+                    loc.altitude = float(attribs['elev'])
+                buoy = BuoyStation(attribs['id'], loc)
+                buoy.owner = attribs['owner']
+                buoy.program = attribs['pgm']
+                buoy.buoy_type = attribs['type']
+                if 'met' in attribs:
+                    buoy.active = 'y' in attribs['met']
+                if 'currents' in attribs:
+                    buoy.currents = 'y' in attribs['currents']
+                if 'waterquality' in attribs:
+                    buoy.water_quality = 'y' in attribs['waterquality']
+                if 'dart' in attribs:
+                    buoy.dart = 'y' in attribs['dart']
+                self.stations.append(buoy)
+        except ET.ParseError:
+            return False
 
-            dist = location.distance(station.location)
-            max_index = -1
-            max_distance = float('inf')
-            added = False
-            for i in range(0, count):
-                added = False
-                if closest_buoys[i] is None:
-                    closest_buoys[i] = station
-                    closest_distances[i] = dist
-                    added = True
-                    break
-                if dist < closest_distances[i]:
-                    if max_distance > closest_distances[i]:
-                        max_index = i
-
-            if max_index >= 0 and not added:
-                closest_buoys[max_index] = station
-                closest_distances[max_index] = dist
-
-        closest_buoys = [x for _, x in sorted(zip(closest_distances, closest_buoys), key=lambda pair: pair[0])]
-        return closest_buoys
-
-    def fetch_stations(self):
-        return self._fetch_stations(self.active_buoys_url)
-
-    def parse_stations(self, rawData):
-        stations = ET.fromstring(rawData)
-        if stations.tag != 'stations':
+        if stations is None:
             return False
 
-        for station in stations:
-            attribs = station.attrib
-            station_id = attribs['id']
-            loc = Location(float(attribs['lat']), float(attribs['lon']), name=attribs['name'])
-            if 'elev' in attribs:
-                loc.altitude = float(attribs['elev'])
-            buoy = BuoyStation(station_id, loc)
-            buoy.owner = attribs['owner']
-            buoy.program = attribs['pgm']
-            buoy.buoy_type = attribs['type']
-            if 'met' in attribs:
-                buoy.active = 'y' in attribs['met']
-            if 'currents' in attribs:
-                buoy.currents = 'y' in attribs['currents']
-            if 'waterquality' in attribs:
-                buoy.water_quality = 'y' in attribs['waterquality']
-            if 'dart' in attribs:
-                buoy.dart = 'y' in attribs['dart']
-            self.stations.append(buoy)
+        self.index_stations()
         return True
+
+    def fetch_latest_readings(self):
+        response = requests.get(self.latest_readings_url)
+        if len(response.text) < 1:
+            return None
+        return self.parse_latest_readings(response.text)
+
+    @staticmethod
+    def parse_latest_readings(raw_data):
+        # Parses the combined latest observation table for every station in the network. The
+        # numeric columns are converted in one pass and the readings are keyed by station id
+        # STN LAT LON YYYY MM DD hh mm WDIR WSPD GST WVHT DPD APD MWD PRES PTDY ATMP WTMP DEWP VIS TIDE
+        column_count = 22
+        rows = [x.split() for x in raw_data.split('\n') if len(x) > 0 and not x.startswith('#')]
+        rows = [x for x in rows if len(x) == column_count]
+        if len(rows) < 1:
+            print('Failed to parse latest readings')
+            return None
+
+        # A row with a malformed date is skipped, a malformed value reads as missing
+        table = np.array(rows)
+        table = table[np.char.isdigit(table[:, 3:8]).all(axis=1)]
+        if len(table) < 1:
+            print('Failed to parse latest readings')
+            return None
+
+        station_ids = table[:, 0]
+        dates = table[:, 3:8].astype(int)
+        values = table[:, 8:]
+        values = np.where(values == 'MM', 'nan', values)
+        try:
+            values = values.astype(float)
+        except ValueError:
+            values = np.vectorize(parse_float, otypes=[float])(values)
+        names = [meteorological_columns[x] for x in latest_observation_columns]
+        columns = mask_sentinels({name: values[:, i] for i, name in enumerate(names)})
+        wind_direction, wind_speed, wind_gust, wave_height, dominant_period, average_period, mean_wave_direction, \
+            pressure, pressure_tendency, air_temperature, water_temperature, dewpoint_temperature, _, water_level = [columns[x] for x in names]
+        water_level = units.convert(water_level, units.Measurement.length, units.Units.english, units.Units.metric)
+        wind_compass_direction = units.degree_to_direction(wind_direction)
+        wave_compass_direction = units.degree_to_direction(mean_wave_direction)
+
+        expiration_reference = BuoyData(units.Units.metric)
+        expiration_reference.find_expiration_date()
+
+        readings = {}
+        for i in range(0, len(station_ids)):
+            try:
+                date = datetime(*dates[i])
+            except ValueError:
+                continue
+
+            data = BuoyData(units.Units.metric)
+            data.date = pytz.utc.localize(date)
+            data.expiration_date = expiration_reference.expiration_date
+            data.wind_direction = float(wind_direction[i])
+            data.wind_compass_direction = str(wind_compass_direction[i])
+            data.wind_speed = float(wind_speed[i])
+            data.wind_gust = float(wind_gust[i])
+            data.average_period = float(average_period[i])
+            data.pressure = float(pressure[i])
+            data.pressure_tendency = float(pressure_tendency[i])
+            data.air_temperature = float(air_temperature[i])
+            data.water_temperature = float(water_temperature[i])
+            data.dewpoint_temperature = float(dewpoint_temperature[i])
+            data.water_level = float(water_level[i])
+            if not np.isnan(wave_height[i]):
+                data.wave_summary = Swell(units.Units.metric, float(wave_height[i]), float(dominant_period[i]))
+                data.wave_summary.direction = float(mean_wave_direction[i])
+                data.wave_summary.compass_direction = str(wave_compass_direction[i]) if not np.isnan(mean_wave_direction[i]) else ''
+            readings[str(station_ids[i])] = data
+
+        return readings
+
+    def fetch_wave_forecast_bulletins(self, model, station_ids=None, workers=0):
+        url = self.wave_forecast_bulletins_url(model)
+        response = requests.get(url, stream=True)
+        if response.status_code != 200:
+            response.close()
+            return None
+
+        response.raw.decode_content = True
+        try:
+            return self.parse_wave_forecast_bulletins(response.raw, station_ids, workers)
+        finally:
+            response.close()
+
+    @staticmethod
+    def parse_wave_forecast_bulletins(bulletin_archive, station_ids=None, workers=0):
+        # Reads every gfswave.<station>.bull member of a cycle's bulletin archive as it streams in,
+        # optionally parsing them across a pool of worker processes. Returns forecasts keyed by station id
+        if station_ids is not None:
+            station_ids = set(station_ids)
+
+        bulletin_station_ids = []
+        raw_bulletins = []
+        with tarfile.open(fileobj=bulletin_archive, mode='r|*') as archive:
+            for member in archive:
+                name = member.name.split('/')[-1]
+                components = name.split('.')
+                if not member.isfile() or len(components) != 3 or components[2] != 'bull':
+                    continue
+                station_id = components[1]
+                if station_ids is not None and station_id not in station_ids:
+                    continue
+
+                bulletin_station_ids.append(station_id)
+                raw_bulletins.append(archive.extractfile(member).read().decode('utf-8', errors='replace'))
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_size = max(1, len(raw_bulletins) // (workers * 4))
+                forecasts = list(executor.map(_parse_wave_forecast_bulletin, raw_bulletins, chunksize=chunk_size))
+        else:
+            forecasts = [_parse_wave_forecast_bulletin(x) for x in raw_bulletins]
+
+        return {station_id: forecast for station_id, forecast in zip(bulletin_station_ids, forecasts) if forecast is not None}
+
+
+def _parse_wave_forecast_bulletin(raw_bulletin_data):
+    # Module level so it can be sent to worker processes, one malformed bulletin should not fail the cycle
+    try:
+        return BuoyStation.parse_wave_forecast_bulletin(raw_bulletin_data, None)
+    except Exception as e:
+        print('Failed to parse wave forecast bulletin: ' + str(e))
+        return None
@@ -1,9 +1,12 @@
 import math
+import numpy as np
 from . import units
 
 
 class Location(object):
 
+    __slots__ = ('latitude', 'longitude', 'altitude', 'name', 'depth', 'angle', 'slope')
+
     def __init__(self, latitude=0.0, longitude=0.0, name='', altitude=0, depth=0.0, angle=0.0, slope=0.0):
         self.latitude = latitude
         self.longitude = longitude
@@ -50,4 +53,62 @@ class Location(object):
         a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
         c = 2 * math.asin(math.sqrt(a)) 
         r = units.earths_radius(unit)
-        return c * r
\ No newline at end of file
+        return c * r
+
+    def distances(self, other_locations, unit=units.Units.metric):
+        # Distance to each of a list of locations or an array of (latitude, longitude) pairs
+        return distance_matrix([self], other_locations, unit)[0]
+
+
+def location_vectors(locations):
+    # Unit vectors on the sphere from a list of Locations or an array of (latitude, longitude) pairs
+    if isinstance(locations, Location):
+        locations = [locations]
+    if len(locations) > 0 and isinstance(locations[0], Location):
+        coordinates = np.array([(x.latitude, x.longitude) for x in locations], dtype=np.float64)
+    else:
+        coordinates = np.asarray(locations, dtype=np.float64)
+    coordinates = np.radians(coordinates.reshape(-1, 2))
+    latitude = coordinates[:, 0]
+    longitude = coordinates[:, 1]
+    return np.column_stack([np.cos(latitude) * np.cos(longitude), np.cos(latitude) * np.sin(longitude), np.sin(latitude)])
+
+
+def _great_circle_distance(dot, unit):
+    # The same great circle distance as the haversine formula, from the dot product of the unit vectors
+    # through the chord length. Agrees with Location.distance to well under a meter
+    chord = np.sqrt(np.maximum(2.0 - 2.0 * dot, 0.0))
+    return 2 * np.arcsin(np.minimum(chord / 2, 1.0)) * units.earths_radius(unit)
+
+
+def distance_matrix(origins, destinations, unit=units.Units.metric):
+    # Distances between every origin and every destination as an (origins x destinations) array
+    return _great_circle_distance(np.dot(location_vectors(origins), location_vectors(destinations).T), unit)
+
+
+def nearest_locations(origins, destinations, count=1, unit=units.Units.metric, chunk_size=4096):
+    # Indexes of and distances to the count closest destinations of each origin, nearest first. Origins are
+    # handled chunk_size at a time so the full matrix never has to be held in memory. The closest
+    # destinations have the largest dot products so distances are only computed for those
+    origin_vectors = location_vectors(origins)
+    destination_vectors = location_vectors(destinations)
+    count = min(count, len(destination_vectors))
+
+    indexes = np.zeros((len(origin_vectors), count), dtype=np.int64)
+    distances = np.zeros((len(origin_vectors), count))
+    if count < 1:
+        return indexes, distances
+
+    for start in range(0, len(origin_vectors), chunk_size):
+        end = start + chunk_size
+        dots = np.dot(origin_vectors[start:end], destination_vectors.T)
+        if count < len(destination_vectors):
+            closest = np.argpartition(-dots, count - 1, axis=1)[:, :count]
+        else:
+            closest = np.tile(np.arange(len(destination_vectors)), (len(dots), 1))
+        closest_dots = np.take_along_axis(dots, closest, axis=1)
+        order = np.argsort(-closest_dots, axis=1, kind='stable')
+        indexes[start:end] = np.take_along_axis(closest, order, axis=1)
+        distances[start:end] = _great_circle_distance(np.take_along_axis(closest_dots, order, axis=1), unit)
+
+    return indexes, distances
@@ -0,0 +1,45 @@
+# NDBC column names mapped to the BuoyData style field names. Shared by the realtime parsers in
+# BuoyStation and BuoyStations and the yearly archive ingest in BuoyArchive so every format reads
+# the same measurements into the same fields
+meteorological_columns = {
+    'WDIR': 'wind_direction',
+    'WSPD': 'wind_speed',
+    'GST': 'wind_gust',
+    'WVHT': 'wave_height',
+    'DPD': 'dominant_period',
+    'APD': 'average_period',
+    'MWD': 'mean_wave_direction',
+    'PRES': 'pressure',
+    'ATMP': 'air_temperature',
+    'WTMP': 'water_temperature',
+    'DEWP': 'dewpoint_temperature',
+    'VIS': 'visibility',
+    'PTDY': 'pressure_tendency',
+    'TIDE': 'water_level',
+}
+
+# The older historical files use a few different names for the same measurements
+column_aliases = {
+    'WD': 'WDIR',
+    'SPD': 'WSPD',
+    'BAR': 'PRES',
+}
+
+time_columns = ['YY', 'YYYY', 'MM', 'DD', 'hh', 'mm']
+
+# Header of the realtime2 .txt standard meteorological files, used when a file comes without one
+realtime_meteorological_header = ['YY', 'MM', 'DD', 'hh', 'mm', 'WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES', 'ATMP',
+    'WTMP', 'DEWP', 'VIS', 'PTDY', 'TIDE']
+
+# Data columns of latest_obs.txt after the station, position and time columns
+latest_observation_columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES', 'PTDY', 'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
+
+
+def parse_header(line):
+    # Column names of a '#' header line with the aliases resolved
+    return [column_aliases.get(x, x) for x in line.strip().lstrip('#').split()]
+
+
+def meteorological_fields(header):
+    # Field name -> column position for the measurement columns of a header
+    return {meteorological_columns[name]: i for i, name in enumerate(header) if name in meteorological_columns}
@@ -0,0 +1,88 @@
+import copy
+import datetime
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache(object):
+
+    class Entry(object):
+
+        def __init__(self, data, expiration_date, validators=None):
+            self.data = data
+            self.expiration_date = expiration_date
+
+            # Maps url -> (Last-Modified, ETag) so expired entries can be revalidated
+            self.validators = validators
+            if self.validators is None:
+                self.validators = {}
+
+        def is_expired(self, now=None):
+            if self.expiration_date is None:
+                return True
+            if now is None:
+                now = datetime.datetime.now()
+            return now >= self.expiration_date
+
+        def request_headers(self, url):
+            headers = {}
+            last_modified, etag = self.validators.get(url, (None, None))
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+            if etag:
+                headers['If-None-Match'] = etag
+            return headers
+
+        def copy_data(self):
+            # Callers are free to change units or otherwise mutate the results so never
+            # hand out the cached objects themselves
+            return copy.deepcopy(self.data)
+
+    def __init__(self, maxsize=256):
+        # Least recently used entries are evicted once more than maxsize are held, None never evicts
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, data, expiration_date, urls=None, responses=None):
+        validators = {}
+        if urls is not None and responses is not None:
+            for url, response in zip(urls, responses):
+                validators[url] = (response.headers.get('Last-Modified'), response.headers.get('ETag'))
+
+        entry = ResponseCache.Entry(data, expiration_date, validators)
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while self.maxsize is not None and len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return entry
+
+    def remove(self, key):
+        with self._lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.entries = OrderedDict()
+
+
+def data_expiration_date(data):
+    # Parsed buoy results carry the time NDBC is expected to publish the next observation
+    if data is None:
+        return None
+    if isinstance(data, list):
+        if len(data) < 1:
+            return None
+        data = data[0]
+    return getattr(data, 'expiration_date', None)
@@ -3,6 +3,26 @@ import json
 import pytz
 
 
+def object_fields(val):
+	# Slot based data classes have no __dict__, so collect the slots from every class in the
+	# hierarchy, base classes first
+	fields = {}
+	for cls in reversed(type(val).__mro__):
+		slots = cls.__dict__.get('__slots__', ())
+		if isinstance(slots, str):
+			slots = (slots,)
+		for name in slots:
+			if hasattr(val, name):
+				fields[name] = getattr(val, name)
+	if hasattr(val, '__dict__'):
+		fields.update((name, value) for name, value in val.__dict__.items() if not name.startswith('_'))
+	# Computed attributes a class wants written out like plain ones
+	for cls in type(val).__mro__:
+		for name in cls.__dict__.get('serialized_properties', ()):
+			fields[name] = getattr(val, name)
+	return fields
+
+
 def serialize_hook(val):
 	if isinstance(val, datetime.datetime):
 		return val.timestamp()
@@ -13,7 +33,7 @@ def serialize_hook(val):
 			}
 			if hasattr(val, '__module__'):
 				out['modulename__'] = val.__module__
-			out.update(val.__dict__)
+			out.update(object_fields(val))
 			return out
 		except Exception:
 			return None
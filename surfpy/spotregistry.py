@@ -0,0 +1,211 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .location import Location, nearest_locations
+from .breakingtable import BreakingTransferTable
+from .buoystation import BuoyStation
+from .wavemodel import all_gfs_wave_models
+from .weatherapi import WeatherApi
+
+
+class SpotRegistry(object):
+
+    class Entry(object):
+
+        def __init__(self, name, latitude, longitude, depth=0.0, angle=0.0, slope=0.0, wave_model=None, wave_model_index=None,
+                     buoy_id=None, buoy_distance=None, tide_station_id=None, tide_station_distance=None, weather_gridpoint=None, breaking_table=None):
+            # Everything needed to serve a spot, resolved once. wave_model is the subset of the highest
+            # resolution wave model covering the spot and wave_model_index its (latitude, longitude) grid index.
+            # breaking_table is the path of the spot's saved BreakingTransferTable
+            self.name = name
+            self.latitude = latitude
+            self.longitude = longitude
+            self.depth = depth
+            self.angle = angle
+            self.slope = slope
+            self.wave_model = wave_model
+            self.wave_model_index = wave_model_index
+            self.buoy_id = buoy_id
+            self.buoy_distance = buoy_distance
+            self.tide_station_id = tide_station_id
+            self.tide_station_distance = tide_station_distance
+            self.weather_gridpoint = weather_gridpoint
+            self.breaking_table = breaking_table
+
+        @property
+        def location(self):
+            return Location(self.latitude, self.longitude, name=self.name, depth=self.depth, angle=self.angle, slope=self.slope)
+
+        @property
+        def weather_metadata(self):
+            # In the shape of the weather.gov points response used by WeatherApi.fetch_hourly_forecast_from_metadata
+            if self.weather_gridpoint is None:
+                return None
+            return {'gridId': self.weather_gridpoint[0], 'gridX': self.weather_gridpoint[1], 'gridY': self.weather_gridpoint[2]}
+
+    def __init__(self):
+        self.entries = {}
+
+        # Breaking transfer tables read from the entries' paths by spot name
+        self.tables = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    @staticmethod
+    def load(path):
+        registry = SpotRegistry()
+        if not os.path.exists(path):
+            return registry
+        with open(path, 'r') as registry_file:
+            raw_entries = json.load(registry_file)['spots']
+        for raw_entry in raw_entries:
+            if raw_entry.get('wave_model_index') is not None:
+                raw_entry['wave_model_index'] = tuple(raw_entry['wave_model_index'])
+            if raw_entry.get('weather_gridpoint') is not None:
+                raw_entry['weather_gridpoint'] = tuple(raw_entry['weather_gridpoint'])
+            entry = SpotRegistry.Entry(**raw_entry)
+            registry.entries[entry.name] = entry
+        return registry
+
+    def save(self, path):
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as registry_file:
+            json.dump({'spots': [x.__dict__ for x in self.entries.values()]}, registry_file)
+        os.replace(temporary_path, path)
+
+    def register(self, spots, wave_models=None, buoy_stations=None, tide_stations=None, weather=False, table_directory=None, workers=8):
+        # Resolves every data source for a list of named Locations at once and adds them to the registry,
+        # replacing any earlier entries with the same names. Buoys are limited to active moored buoys. With
+        # a table_directory each spot's breaking transfer table is built and saved there as <name>.npz
+        if wave_models is None:
+            wave_models = all_gfs_wave_models()
+
+        entries = [SpotRegistry.Entry(x.name, x.latitude, x.longitude, x.depth, x.angle, x.slope) for x in spots]
+        if len(entries) < 1:
+            return entries
+
+        coordinates = np.array([(x.latitude, x.longitude) for x in spots], dtype=np.float64)
+        self._resolve_wave_models(entries, coordinates, wave_models)
+
+        if buoy_stations is not None:
+            positions = np.flatnonzero(buoy_stations.station_mask(True, BuoyStation.BuoyType.buoy))
+            station_ids = buoy_stations.station_ids()
+            indexes, distances = nearest_locations(coordinates, buoy_stations.station_coordinates()[positions], 1)
+            if indexes.shape[1] > 0:
+                for entry, index, distance in zip(entries, positions[indexes[:, 0]].tolist(), distances[:, 0].tolist()):
+                    entry.buoy_id = str(station_ids[index])
+                    entry.buoy_distance = distance
+
+        if tide_stations is not None:
+            station_ids = tide_stations.station_ids()
+            indexes, distances = nearest_locations(coordinates, tide_stations.station_coordinates(), 1)
+            if indexes.shape[1] > 0:
+                for entry, index, distance in zip(entries, indexes[:, 0].tolist(), distances[:, 0].tolist()):
+                    entry.tide_station_id = str(station_ids[index])
+                    entry.tide_station_distance = distance
+
+        if weather:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                gridpoints = list(executor.map(_weather_gridpoint, spots))
+            for entry, gridpoint in zip(entries, gridpoints):
+                entry.weather_gridpoint = gridpoint
+
+        if table_directory is not None:
+            for spot, entry in zip(spots, entries):
+                entry.breaking_table = os.path.join(table_directory, entry.name + '.npz')
+                table = BreakingTransferTable.from_location(spot)
+                table.save(entry.breaking_table)
+                self.tables[entry.name] = table
+
+        for entry in entries:
+            self.entries[entry.name] = entry
+            if entry.breaking_table is None:
+                self.tables.pop(entry.name, None)
+        return entries
+
+    @staticmethod
+    def _resolve_wave_models(entries, coordinates, wave_models):
+        # The same bounds check as NOAAModel.contains_location and index as NOAAModel.location_index, for every
+        # spot and model at once. Ties in resolution go to the regional model over the global one
+        latitude = coordinates[:, 0]
+        absolute_longitude = np.where(coordinates[:, 1] < 0, coordinates[:, 1] + 360.0, coordinates[:, 1])
+
+        best_model = np.full(len(entries), -1, dtype=np.int64)
+        for i in sorted(range(0, len(wave_models)), key=lambda x: model_preference(wave_models[x]), reverse=True):
+            model = wave_models[i]
+            contained = (latitude > model.bottom_left.latitude) & (latitude < model.top_right.latitude)
+            contained &= (absolute_longitude > model.bottom_left.absolute_longitude) & (absolute_longitude < model.top_right.absolute_longitude)
+            best_model[contained] = i
+
+        for i, model in enumerate(wave_models):
+            covered = np.flatnonzero(best_model == i)
+            if len(covered) < 1:
+                continue
+            lat_indexes = ((model.top_right.latitude - latitude[covered]) / model.location_resolution).astype(np.int64)
+            lon_indexes = ((absolute_longitude[covered] - model.bottom_left.absolute_longitude) / model.location_resolution).astype(np.int64)
+            for spot, lat_index, lon_index in zip(covered.tolist(), lat_indexes.tolist(), lon_indexes.tolist()):
+                entries[spot].wave_model = model.subset
+                entries[spot].wave_model_index = (lat_index, lon_index)
+
+    def wave_model(self, name, wave_models=None):
+        # The registered wave model for a spot, None when no model covers it
+        entry = self.entries.get(name)
+        if entry is None or entry.wave_model is None:
+            return None
+        if wave_models is None:
+            wave_models = all_gfs_wave_models()
+        for model in wave_models:
+            if model.subset == entry.wave_model:
+                return model
+        return None
+
+    def breaking_table(self, name):
+        # The saved breaking transfer table for a spot, None when it has none. A table that is missing
+        # or was built for another depth, angle or slope than the entry's is rebuilt and saved again
+        entry = self.entries.get(name)
+        if entry is None or entry.breaking_table is None:
+            return None
+        table = self.tables.get(name)
+        if table is None and os.path.exists(entry.breaking_table):
+            table = BreakingTransferTable.load(entry.breaking_table)
+        if table is None or not table.matches(entry.location):
+            table = BreakingTransferTable.from_location(entry.location)
+            table.save(entry.breaking_table)
+        self.tables[name] = table
+        return table
+
+    def buoy_station(self, name, buoy_stations):
+        entry = self.entries.get(name)
+        if entry is None or entry.buoy_id is None:
+            return None
+        return buoy_stations.find_station(entry.buoy_id)
+
+    def tide_station(self, name, tide_stations):
+        entry = self.entries.get(name)
+        if entry is None or entry.tide_station_id is None:
+            return None
+        return tide_stations.find_station(entry.tide_station_id)
+
+
+def model_preference(model):
+    # Sort key for models covering the same spot, the best one sorts first
+    area = abs(model.top_right.latitude - model.bottom_left.latitude) * abs(model.top_right.absolute_longitude - model.bottom_left.absolute_longitude)
+    return (model.location_resolution, area)
+
+
+def _weather_gridpoint(location):
+    # weather.gov only covers the US, anywhere else has no gridpoint
+    try:
+        meta = WeatherApi.points(location)
+        return (meta['gridId'], meta['gridX'], meta['gridY'])
+    except Exception:
+        return None
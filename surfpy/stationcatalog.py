@@ -0,0 +1,96 @@
+import datetime
+import json
+import os
+import numpy as np
+
+
+class StationCatalog(object):
+
+    def __init__(self, columns, fetch_date=None, validators=None):
+        # Parsed stations stored column by column, one array per station attribute. Saved as a single
+        # .npz file along with the fetch date and the response validators used to revalidate it
+        self.columns = columns
+        self.fetch_date = fetch_date
+        self.validators = validators
+        if self.validators is None:
+            self.validators = {}
+
+    def __len__(self):
+        if len(self.columns) < 1:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    @staticmethod
+    def from_columns(columns, fetch_date=None, response=None):
+        validators = {}
+        if response is not None:
+            validators = {'Last-Modified': response.headers.get('Last-Modified'), 'ETag': response.headers.get('ETag')}
+        return StationCatalog({name: np.asarray(values) for name, values in columns.items()}, fetch_date, validators)
+
+    @staticmethod
+    def load(path):
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as catalog_file:
+            metadata = json.loads(str(catalog_file['metadata__']))
+            columns = {name: catalog_file[name] for name in catalog_file.files if name != 'metadata__'}
+
+        fetch_date = None
+        if metadata.get('fetch_date') is not None:
+            fetch_date = datetime.datetime.fromisoformat(metadata['fetch_date'])
+        return StationCatalog(columns, fetch_date, metadata.get('validators'))
+
+    def save(self, path):
+        metadata = {
+            'fetch_date': self.fetch_date.isoformat() if self.fetch_date is not None else None,
+            'validators': self.validators,
+        }
+        # Write next to the destination first so readers never see a partial file
+        temporary_path = path + '.tmp.npz'
+        np.savez(temporary_path, metadata__=np.array(json.dumps(metadata)), **self.columns)
+        os.replace(temporary_path, path)
+
+    def is_expired(self, ttl, now=None):
+        if self.fetch_date is None:
+            return True
+        if now is None:
+            now = datetime.datetime.now()
+        return now >= self.fetch_date + ttl
+
+    def request_headers(self):
+        headers = {}
+        if self.validators.get('Last-Modified'):
+            headers['If-Modified-Since'] = self.validators['Last-Modified']
+        if self.validators.get('ETag'):
+            headers['If-None-Match'] = self.validators['ETag']
+        return headers
+
+
+class LazyStations(object):
+
+    def __init__(self, catalog, create_station):
+        # A read only list of stations that only builds a station object the first time it is
+        # accessed. Lookups that can be answered from the catalog columns never build any
+        self.catalog = catalog
+        self.create_station = create_station
+        self._stations = [None] * len(catalog)
+
+    def __len__(self):
+        return len(self._stations)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        station = self._stations[index]
+        if station is None:
+            station = self.create_station(self.catalog.columns, index % len(self))
+            self._stations[index] = station
+        return station
+
+    def __iter__(self):
+        for i in range(0, len(self)):
+            yield self[i]
+
+    @property
+    def built_count(self):
+        return len([x for x in self._stations if x is not None])
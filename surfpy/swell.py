@@ -6,6 +6,8 @@ from .basedata import BaseData
 
 class Swell(BaseData):
 
+    __slots__ = ('wave_height', 'period', 'direction', 'compass_direction', 'max_energy', 'frequency_index')
+
     def __init__(self, unit, wave_height=float('nan'), period=float('nan'), direction=float('nan'), compass_direction=None, max_energy = 0, frequency_index = 0):
         super(Swell, self).__init__(unit)
 
@@ -34,6 +36,8 @@ class Swell(BaseData):
 
     def change_units(self, new_units):
         old_units = self.unit
+        if old_units == new_units:
+            return
         super(Swell, self).change_units(new_units)
 
         self.wave_height = units.convert(self.wave_height, units.Measurement.length, old_units, self.unit)
@@ -0,0 +1,18 @@
+#YY  MM DD hh mm WVHT  SwH  SwP  WWH  WWP SwD WWD  STEEPNESS  APD MWD
+#yr  mo dy hr mn    m    m  sec    m  sec  -  degT     -      sec degT
+2021 04 28 18 50  1.2  1.0  8.0  0.6  4.2 SSE SW      AVERAGE  5.4 170
+2021 04 28 18 20  1.2  1.0  9.0  0.6  4.2   S SW      AVERAGE  5.4 173
+2021 04 28 17 50  1.2  1.0  10.0  0.6  4.2  SE SW      AVERAGE  5.4 176
+2021 04 28 17 20  1.2  1.0  8.0  0.6  4.2 ESE SW      AVERAGE  5.4 179
+2021 04 28 16 50  1.2  1.0  9.0  0.6  4.2 SSE SW      AVERAGE  5.4 182
+2021 04 28 16 20  1.2  1.0  10.0  0.6  4.2   S SW      AVERAGE  5.4 170
+2021 04 28 15 50  1.2  1.0  8.0  0.6  4.2  SE SW      AVERAGE  5.4 173
+2021 04 28 15 20  1.2  1.0  9.0  0.6  4.2 ESE SW      AVERAGE  5.4 176
+2021 04 28 14 50  1.2  1.0  10.0  0.6  4.2 SSE SW      AVERAGE  5.4 179
+2021 04 28 14 20  1.2  1.0  8.0  0.6  4.2   S SW      AVERAGE  5.4 182
+2021 04 28 13 50  1.2  1.0  9.0  0.6  4.2  SE SW      AVERAGE  5.4 170
+2021 04 28 13 20  1.2  1.0  10.0  0.6  4.2 ESE SW      AVERAGE  5.4 173
+2021 04 28 12 50  1.2  1.0  8.0  0.6  4.2 SSE SW      AVERAGE  5.4 176
+2021 04 28 12 20  1.2  1.0  9.0  0.6  4.2   S SW      AVERAGE  5.4 179
+2021 04 28 11 50  1.2  1.0  10.0  0.6  4.2  SE SW      AVERAGE  5.4 182
+2021 04 28 11 20  1.2  1.0  8.0  0.6  4.2 ESE SW      AVERAGE  5.4 170
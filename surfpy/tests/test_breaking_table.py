@@ -0,0 +1,40 @@
+from unittest import TestCase
+import os
+import tempfile
+import numpy as np
+
+import surfpy
+from surfpy import tools
+
+
+class TestBreakingTransferTable(TestCase):
+
+    def test_breaking_wave_heights(self):
+        spot = surfpy.Location(41.35, -71.4, depth=6.0, angle=145.0, slope=0.02)
+        table = surfpy.BreakingTransferTable.from_location(spot)
+
+        rng = np.random.RandomState(7)
+        wave_height = rng.uniform(0.2, 6.0, (129, 4))
+        period = rng.uniform(4.0, 20.0, (129, 4))
+        direction = rng.uniform(0.0, 360.0, (129, 4))
+        wave_height[0, 0] = np.nan
+        period[1, 0] = 40.0
+
+        _, expected = tools.breaking_wave_heights(wave_height, period, direction, spot.angle, spot.depth, spot.slope)
+        minimum, maximum = table.breaking_wave_heights(wave_height, period, direction)
+        self.assertTrue(np.array_equal(np.isnan(maximum), np.isnan(expected)))
+        self.assertTrue(np.array_equal(maximum > 0, expected > 0))
+        self.assertTrue(np.nanmax(np.abs(maximum - expected) / np.maximum(expected, 0.001)) < 0.001)
+        self.assertTrue(maximum[1, 0] == expected[1, 0])
+        self.assertTrue(np.allclose(minimum * 1.4, maximum, equal_nan=True))
+
+    def test_save_load(self):
+        spot = surfpy.Location(41.35, -71.4, depth=30.0, angle=145.0, slope=0.02)
+        table = surfpy.BreakingTransferTable.from_location(spot)
+        with tempfile.TemporaryDirectory() as table_path:
+            table.save(os.path.join(table_path, 'spot.npz'))
+            loaded = surfpy.BreakingTransferTable.load(os.path.join(table_path, 'spot.npz'))
+
+        self.assertTrue(loaded.matches(spot))
+        self.assertFalse(loaded.matches(surfpy.Location(41.35, -71.4, depth=10.0, angle=145.0, slope=0.02)))
+        self.assertTrue(np.array_equal(loaded.celerity_ratios, table.celerity_ratios))
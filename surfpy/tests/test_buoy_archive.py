@@ -0,0 +1,43 @@
+from unittest import TestCase
+import os
+import tempfile
+import numpy as np
+
+import surfpy
+
+
+class TestBuoyArchive(TestCase):
+
+    METEOROLOGICAL_ARCHIVE_FILE = os.path.join(os.path.dirname(__file__), 'data', '44097h2020.txt.gz')
+    SPECTRAL_DENSITY_ARCHIVE_FILE = os.path.join(os.path.dirname(__file__), 'data', '44097w2020.txt.gz')
+    METEOROLOGICAL_READING_FILE = os.path.join(os.path.dirname(__file__), 'data', '44097.txt')
+
+    def test_ingest_meteorological(self):
+        with tempfile.TemporaryDirectory() as archive_path:
+            archive = surfpy.BuoyArchive(archive_path)
+            with open(TestBuoyArchive.METEOROLOGICAL_ARCHIVE_FILE, 'rb') as archive_file:
+                self.assertTrue(archive.ingest_meteorological(archive_file, chunk_size=100) == 240)
+
+            # Realtime files share the layout, but carry a pressure tendency column
+            self.assertTrue(archive.ingest_meteorological(TestBuoyArchive.METEOROLOGICAL_READING_FILE) == 48)
+
+            reloaded = surfpy.BuoyArchive(archive_path)
+            self.assertTrue(reloaded.count == 288)
+            self.assertTrue(reloaded.times[0] == np.datetime64('2020-01-01T00:00', 's').astype(np.int64))
+            self.assertTrue(reloaded.times[1] - reloaded.times[0] == 1800)
+            self.assertTrue(reloaded.column('wave_height').dtype == np.float32)
+            self.assertTrue(abs(reloaded.column('wave_height')[1] - 1.22) < 0.001)
+            self.assertTrue(np.isnan(reloaded.column('pressure_tendency')[0]))
+            self.assertTrue(np.isnan(reloaded.column('wave_height')[0]))
+            self.assertTrue(np.isnan(reloaded.column('dewpoint_temperature')).sum() == 240)
+            self.assertTrue(np.isnan(reloaded.column('wave_height')[241]))
+
+    def test_ingest_spectral_density(self):
+        with tempfile.TemporaryDirectory() as archive_path:
+            archive = surfpy.BuoyArchive(archive_path)
+            self.assertTrue(archive.ingest_spectral_density(TestBuoyArchive.SPECTRAL_DENSITY_ARCHIVE_FILE, chunk_size=10) == 48)
+
+            density = archive.column('spectral_density')
+            self.assertTrue(density.shape == (48, len(archive.frequency)))
+            self.assertTrue(abs(archive.frequency[0] - 0.02) < 0.00001)
+            self.assertTrue(archive.time_index().nearest(np.datetime64('2020-01-01T05:30')) == 5)
@@ -1,7 +1,11 @@
 from unittest import TestCase
 import os
+import numpy
+import datetime
+import pytz
 
 import surfpy
+from surfpy.buoyspectra import BuoySpectra
 
 class TestBuoyData(TestCase):
 
@@ -16,3 +20,217 @@ class TestBuoyData(TestCase):
         wave_forecast_data = block_island_station.parse_wave_forecast_bulletin(raw_wave_bulletin_data, 61)
         self.assertTrue(wave_forecast_data != None)
         self.assertTrue(len(wave_forecast_data) == 61, msg=f'Data count: {len(wave_forecast_data)}') 
+
+    METEOROLOGICAL_READING_FILE = os.path.join(os.path.dirname(__file__), 'data', '44097.txt')
+
+    def test_parse_meteorological_reading_count_limit(self):
+        with open(TestBuoyData.METEOROLOGICAL_READING_FILE, 'r') as meteorological_file:
+            raw_meteorological_data = meteorological_file.read()
+
+        all_data = surfpy.BuoyStation.parse_meteorological_reading_data(raw_meteorological_data, 0)
+        self.assertTrue(len(all_data) == 48, msg=f'Data count: {len(all_data)}')
+
+        limited_data = surfpy.BuoyStation.parse_meteorological_reading_data(raw_meteorological_data.split('\n')[:7], 5)
+        self.assertTrue(len(limited_data) == 5, msg=f'Data count: {len(limited_data)}')
+        self.assertTrue(limited_data[0].date == all_data[0].date)
+        self.assertTrue(limited_data[0].wave_summary is not None)
+        self.assertTrue(limited_data[1].wave_summary is None)
+
+    def test_read_lines_stops_at_limit(self):
+        class StreamedResponse(object):
+            def __init__(self, lines):
+                self.lines = lines
+                self.read_count = 0
+                self.closed = False
+
+            def iter_lines(self):
+                for line in self.lines:
+                    self.read_count += 1
+                    yield line.encode('utf-8')
+
+            def close(self):
+                self.closed = True
+
+        with open(TestBuoyData.METEOROLOGICAL_READING_FILE, 'r') as meteorological_file:
+            response = StreamedResponse(meteorological_file.read().split('\n'))
+
+        lines = surfpy.tools.read_lines(response, 12)
+        self.assertTrue(len(lines) == 12)
+        self.assertTrue(response.read_count == 12)
+        self.assertTrue(response.closed)
+
+    DETAILED_WAVE_READING_FILE = os.path.join(os.path.dirname(__file__), 'data', '44097.spec')
+
+    def test_merge_readings(self):
+        with open(TestBuoyData.METEOROLOGICAL_READING_FILE, 'r') as meteorological_file:
+            meteorological_data = surfpy.BuoyStation.parse_meteorological_reading_data(meteorological_file.read(), 12)
+        with open(TestBuoyData.DETAILED_WAVE_READING_FILE, 'r') as detailed_wave_file:
+            detailed_wave_data = surfpy.BuoyStation.parse_detailed_wave_reading_data(detailed_wave_file.read(), 4)
+
+        merged = surfpy.BuoyStation.merge_readings(meteorological_data, detailed_wave_data, None)
+        dates = [x.date for x in merged]
+        self.assertTrue(dates == sorted(set(dates), reverse=True))
+        self.assertTrue(len(merged) == 12, msg=f'Data count: {len(merged)}')
+
+        latest = merged[0]
+        self.assertTrue(latest.date == meteorological_data[0].date == detailed_wave_data[0].date)
+        self.assertTrue(abs(latest.wind_speed - meteorological_data[0].wind_speed) < 0.0001)
+        self.assertTrue(len(latest.swell_components) == 2)
+        self.assertTrue(len(merged[1].swell_components) == 0)
+
+    def test_meteorological_columns_by_name(self):
+        # Columns are located from the header, so a file without the visibility column still parses
+        with open(TestBuoyData.METEOROLOGICAL_READING_FILE, 'r') as meteorological_file:
+            raw_lines = meteorological_file.read().split('\n')
+        expected = surfpy.BuoyStation.parse_meteorological_reading_data(raw_lines, 0)
+
+        without_visibility = [' '.join(x.split()[:16] + x.split()[17:]) for x in raw_lines if len(x.strip()) > 0]
+        parsed = surfpy.BuoyStation.parse_meteorological_reading_data(without_visibility, 0)
+        self.assertTrue(len(parsed) == len(expected))
+        for data, expected_data in zip(parsed, expected):
+            self.assertTrue(data.date == expected_data.date)
+            numpy.testing.assert_equal([data.pressure, data.water_temperature, data.dewpoint_temperature, data.pressure_tendency, data.water_level],
+                [expected_data.pressure, expected_data.water_temperature, expected_data.dewpoint_temperature, expected_data.pressure_tendency, expected_data.water_level])
+
+    def test_merge_readings_spectra(self):
+        with open(TestBuoyData.METEOROLOGICAL_READING_FILE, 'r') as meteorological_file:
+            meteorological_data = surfpy.BuoyStation.parse_meteorological_reading_data(meteorological_file.read(), 12)
+        surfpy.change_units_series(meteorological_data, surfpy.units.Units.english)
+        english_wind_speed = meteorological_data[0].wind_speed
+
+        # The newest spectra are dated from the file modification time, between two reports
+        latest_spectra = surfpy.BuoyData(surfpy.units.Units.metric, date=meteorological_data[0].date + datetime.timedelta(minutes=7))
+        latest_spectra.wave_spectra = BuoySpectra()
+        old_spectra = surfpy.BuoyData(surfpy.units.Units.metric, date=meteorological_data[-1].date - datetime.timedelta(days=2))
+        old_spectra.wave_spectra = BuoySpectra()
+
+        merged = surfpy.BuoyStation.merge_readings(meteorological_data, None, [old_spectra, latest_spectra])
+        self.assertTrue(len(merged) == len(meteorological_data) + 1)
+        self.assertTrue(merged[0].date == meteorological_data[0].date)
+        self.assertTrue(merged[0].wave_spectra is not None and merged[0].wave_spectra is not latest_spectra.wave_spectra)
+        self.assertTrue(merged[-1].date == old_spectra.date and merged[-1].wave_spectra is not None)
+        self.assertTrue(all(x.wave_spectra is None for x in merged[1:-1]))
+
+        # Readings are converted to metric without touching the callers objects
+        self.assertTrue(merged[0].unit == surfpy.units.Units.metric)
+        self.assertTrue(abs(merged[0].wind_speed - english_wind_speed / 2.237) < 0.0001)
+        self.assertTrue(meteorological_data[0].unit == surfpy.units.Units.english)
+        self.assertTrue(meteorological_data[0].wind_speed == english_wind_speed)
+
+    def test_merge_readings_copies(self):
+        with open(TestBuoyData.METEOROLOGICAL_READING_FILE, 'r') as meteorological_file:
+            meteorological_data = surfpy.BuoyStation.parse_meteorological_reading_data(meteorological_file.read(), 12)
+        with open(TestBuoyData.DETAILED_WAVE_READING_FILE, 'r') as detailed_wave_file:
+            detailed_wave_data = surfpy.BuoyStation.parse_detailed_wave_reading_data(detailed_wave_file.read(), 4)
+        wave_height = detailed_wave_data[0].wave_summary.wave_height
+        swell_height = detailed_wave_data[0].swell_components[0].wave_height
+
+        merged = surfpy.BuoyStation.merge_readings(meteorological_data, detailed_wave_data, None)
+        surfpy.change_units_series(merged, surfpy.units.Units.english)
+        merged[0].swell_components.append(surfpy.Swell(surfpy.units.Units.english))
+
+        self.assertTrue(merged[0].wave_summary.unit == surfpy.units.Units.english)
+        self.assertTrue(detailed_wave_data[0].wave_summary.unit == surfpy.units.Units.metric)
+        self.assertTrue(detailed_wave_data[0].wave_summary.wave_height == wave_height)
+        self.assertTrue(detailed_wave_data[0].swell_components[0].wave_height == swell_height)
+        self.assertTrue(len(detailed_wave_data[0].swell_components) == 2)
+        self.assertTrue(all(x.unit == surfpy.units.Units.metric for x in meteorological_data))
+
+    def test_change_units_series(self):
+        with open(TestBuoyData.METEOROLOGICAL_READING_FILE, 'r') as meteorological_file:
+            raw_meteorological_data = meteorological_file.read()
+
+        series = surfpy.BuoyStation.parse_meteorological_reading_data(raw_meteorological_data, 0)
+        expected = surfpy.BuoyStation.parse_meteorological_reading_data(raw_meteorological_data, 0)
+        for data in expected:
+            data.change_units(surfpy.units.Units.english)
+
+        surfpy.change_units_series(series, surfpy.units.Units.english)
+        for data, expected_data in zip(series, expected):
+            self.assertTrue(data.unit == surfpy.units.Units.english)
+            self.assertTrue(abs(data.wind_speed - expected_data.wind_speed) < 0.000001)
+            self.assertTrue(abs(data.air_temperature - expected_data.air_temperature) < 0.000001)
+            self.assertTrue(abs(data.pressure - expected_data.pressure) < 0.000001)
+            if data.wave_summary is not None:
+                self.assertTrue(data.wave_summary.unit == surfpy.units.Units.english)
+                self.assertTrue(abs(data.wave_summary.wave_height - expected_data.wave_summary.wave_height) < 0.000001)
+
+        temperatures = surfpy.units.convert(numpy.array([0.0, 100.0, float('nan')]), surfpy.units.Measurement.temperature, surfpy.units.Units.metric, surfpy.units.Units.english)
+        self.assertTrue(abs(temperatures[0] - 32.0) < 0.000001 and abs(temperatures[1] - 212.0) < 0.000001)
+        self.assertTrue(temperatures[2] != temperatures[2])
+
+    def test_merge_wave_weather_data(self):
+        start = pytz.utc.localize(datetime.datetime(2021, 4, 28, 0, 0))
+        wave_data = [surfpy.BuoyData(surfpy.units.Units.metric, date=start + datetime.timedelta(hours=3 * i)) for i in range(0, 4)]
+        weather_data = []
+        for i in range(0, 12):
+            weather = surfpy.BuoyData(surfpy.units.Units.metric, date=start + datetime.timedelta(hours=i, minutes=30))
+            weather.wind_speed = float(i)
+            weather.wind_direction = (350.0 + 10.0 * i) % 360.0
+            weather.short_forecast = f'Forecast {i}'
+            weather_data.append(weather)
+
+        # Nothing lines up exactly so the old exact match behaviour leaves the waves untouched
+        surfpy.merge_wave_weather_data(wave_data, weather_data)
+        self.assertTrue(all([x.wind_speed != x.wind_speed for x in wave_data]))
+
+        surfpy.merge_wave_weather_data(wave_data, weather_data, tolerance=datetime.timedelta(minutes=20))
+        self.assertTrue(all([x.wind_speed != x.wind_speed for x in wave_data]))
+
+        surfpy.merge_wave_weather_data(wave_data, weather_data, tolerance=datetime.timedelta(minutes=30))
+        self.assertTrue(abs(wave_data[0].wind_speed - 0.0) < 0.000001)
+        self.assertTrue(abs(wave_data[1].wind_speed - 2.0) < 0.000001)
+        self.assertTrue(wave_data[1].short_forecast == 'Forecast 2')
+
+        surfpy.merge_wave_weather_data(wave_data, weather_data, tolerance=3600, interpolate=True)
+        self.assertTrue(abs(wave_data[1].wind_speed - 2.5) < 0.000001)
+        self.assertTrue(abs(wave_data[1].wind_direction - 15.0) < 0.000001)
+        self.assertTrue(wave_data[1].wind_compass_direction == 'NNE')
+
+    def test_solve_breaking_wave_heights_series(self):
+        block_island_station = surfpy.BuoyStation('44097', location=surfpy.Location(latitude=40.98, longitude=-71.12))
+        with open(TestBuoyData.WAVE_FORECAST_BULLETIN_FILE, 'r') as wave_forecast_bulletin_file:
+            wave_forecast_data = block_island_station.parse_wave_forecast_bulletin(wave_forecast_bulletin_file.read(), None)
+
+        spot = surfpy.Location(41.35, -71.4, depth=30.0, angle=145.0, slope=0.02)
+        surfpy.change_units_series(wave_forecast_data, surfpy.units.Units.english)
+        surfpy.solve_breaking_wave_heights_series(wave_forecast_data, spot)
+
+        for data in wave_forecast_data:
+            self.assertTrue(data.unit == surfpy.units.Units.english)
+            expected = []
+            for swell in data.swell_components:
+                metric_swell = surfpy.Swell(swell.unit, swell.wave_height, swell.period, swell.direction)
+                expected.append(metric_swell.breaking_wave_estimate(spot.angle, spot.depth, spot.slope))
+
+            # Components come back sorted by breaking height with the dominant one first
+            maximums = [x[1] for x in expected]
+            self.assertTrue(maximums == sorted(maximums, reverse=True))
+            expected_maximum = surfpy.units.convert(maximums[0], surfpy.units.Measurement.length, surfpy.units.Units.metric, surfpy.units.Units.english)
+            self.assertTrue(abs(data.maximum_breaking_height - expected_maximum) < 0.0001)
+            self.assertTrue(abs(data.maximum_breaking_height - 1.4 * data.minimum_breaking_height) < 0.0001)
+
+        expected_maximums = [x.maximum_breaking_height for x in wave_forecast_data]
+        surfpy.solve_breaking_wave_heights_series(wave_forecast_data, spot, surfpy.BreakingTransferTable.from_location(spot))
+        self.assertTrue(all([abs(x.maximum_breaking_height - y) < 0.001 for x, y in zip(wave_forecast_data, expected_maximums)]))
+
+        # A table for another spot is not used
+        other_spot = surfpy.Location(41.35, -71.4, depth=5.0, angle=270.0, slope=0.05)
+        surfpy.solve_breaking_wave_heights_series(wave_forecast_data, spot, surfpy.BreakingTransferTable.from_location(other_spot))
+        self.assertTrue(all([abs(x.maximum_breaking_height - y) < 0.001 for x, y in zip(wave_forecast_data, expected_maximums)]))
+
+    def test_swell_components_batch(self):
+        frequency = list(numpy.linspace(0.03, 0.4, 38))
+        spectra = []
+        for shift in range(0, 6):
+            energy = [3.0 * numpy.exp(-((f - 0.07 - shift * 0.005) / 0.01) ** 2) + numpy.exp(-((f - 0.2) / 0.03) ** 2) for f in frequency]
+            spectra.append(BuoySpectra(frequency, energy[:len(energy) - shift], [180.0 + shift] * len(frequency)))
+        spectra.append(BuoySpectra())
+
+        batch = BuoySpectra.swell_components_batch(spectra)
+        self.assertTrue(len(batch) == len(spectra))
+        self.assertTrue(len(batch[-1]) == 0)
+        for item, components in zip(spectra, batch):
+            expected = item.swell_components
+            self.assertTrue([(x.wave_height, x.period, x.direction) for x in components] == [(x.wave_height, x.period, x.direction) for x in expected])
+        self.assertTrue(len(batch[0]) == 2)
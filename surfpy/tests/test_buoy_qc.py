@@ -0,0 +1,40 @@
+from unittest import TestCase
+import numpy as np
+
+from surfpy import buoyqc
+from surfpy.buoyqc import QualityFlag
+
+
+class TestBuoyQC(TestCase):
+
+    def test_quality_control(self):
+        timestamps = np.arange(0, 40) * 3600.0
+        wave_height = 1.0 + 0.1 * np.sin(np.arange(0, 40) / 3.0)
+        wave_height[3] = 99.0
+        wave_height[10] = 6.0
+        wave_height[20] = -1.0
+        wave_height[25:40] = 2.0
+
+        # Series are accepted in any order, NDBC realtime files are newest first
+        cleaned, flags = buoyqc.quality_control(timestamps[::-1], {'wave_height': wave_height[::-1]})
+        cleaned = cleaned['wave_height'][::-1]
+        flags = flags['wave_height'][::-1]
+
+        self.assertTrue(flags[3] == QualityFlag.missing)
+        self.assertTrue(flags[10] & QualityFlag.spike)
+        self.assertTrue(flags[20] == QualityFlag.out_of_range)
+        self.assertTrue(flags[30] == QualityFlag.stuck)
+        self.assertTrue(flags[5] == QualityFlag.good)
+        self.assertTrue(np.isnan(cleaned[[3, 10, 20, 30]]).all())
+        self.assertTrue(cleaned[5] == wave_height[5])
+
+    def test_circular_step(self):
+        timestamps = np.arange(0, 4) * 3600.0
+        limits = {'wind_direction': buoyqc.FieldLimits([999.0], 0.0, 360.0, step=45.0, circular=True)}
+        _, flags = buoyqc.quality_control(timestamps, {'wind_direction': np.array([350.0, 10.0, 999.0, 200.0])}, limits)
+        self.assertTrue(list(flags['wind_direction']) == [QualityFlag.good, QualityFlag.good, QualityFlag.missing, QualityFlag.good])
+
+    def test_mask_sentinels(self):
+        masked = buoyqc.mask_sentinels({'pressure': np.array([1012.0, 9999.0]), 'spectral_density': np.array([1.0, 999.0])})
+        self.assertTrue(np.isnan(masked['pressure'][1]))
+        self.assertTrue(masked['spectral_density'][1] == 999.0)
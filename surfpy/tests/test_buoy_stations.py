@@ -1,7 +1,15 @@
 from unittest import TestCase
+import io
+import tarfile
+import tempfile
+import datetime
+import importlib
 import os
+import sys
+from unittest import mock
 
 import surfpy
+from surfpy.stationcatalog import StationCatalog
 
 class TestBuoyStations(TestCase):
 
@@ -18,8 +26,176 @@ class TestBuoyStations(TestCase):
 		self.assertTrue(len(parsed_stations.stations) == 1423, msg='Expected 1423 stations but found {0}'.format(len(parsed_stations.stations)))
 		self.assertTrue(parsed_stations.find_station('44097') is not None, msg='Buoy 44097 was not found')
 
+	def test_parse_stations_filtered(self):
+		all_stations = surfpy.BuoyStations(stations=[])
+		with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'r') as activestations_file:
+			all_stations.parse_stations(activestations_file.read())
+
+		filtered_stations = surfpy.BuoyStations(stations=[])
+		with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'rb') as activestations_file:
+			self.assertTrue(filtered_stations.parse_stations(activestations_file, active=True, buoy_type=surfpy.BuoyStation.BuoyType.buoy, bbox=(35.0, -80.0, 45.0, -60.0)))
+
+		expected = [x.station_id for x in all_stations.stations if x.active and x.buoy_type == surfpy.BuoyStation.BuoyType.buoy and
+			35.0 <= x.location.latitude <= 45.0 and -80.0 <= x.location.longitude <= -60.0]
+		self.assertTrue(len(expected) > 0)
+		self.assertTrue([x.station_id for x in filtered_stations.stations] == expected)
+
+		# Display names are only parsed when they are first used
+		block_island = filtered_stations.find_station('44097')
+		self.assertFalse(block_island._name_parsed)
+		self.assertTrue(block_island.name == 'Block Island, Ri')
+		self.assertFalse(surfpy.BuoyStations(stations=[]).parse_stations('<station id="1"/>'))
+
+	def test_parse_stations_pure_python_elementtree(self):
+		# Without the C accelerator clear() also empties the attribute dict of the element
+		with mock.patch.dict(sys.modules, {'_elementtree': None}):
+			sys.modules.pop('xml.etree.ElementTree', None)
+			python_element_tree = importlib.import_module('xml.etree.ElementTree')
+		element = python_element_tree.Element('station', id='44097')
+		attributes = element.attrib
+		element.clear()
+		self.assertTrue(len(attributes) == 0)
+
+		expected = surfpy.BuoyStations(stations=[])
+		with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'rb') as activestations_file:
+			expected.parse_stations(activestations_file)
+
+		stations = surfpy.BuoyStations(stations=[])
+		with mock.patch('surfpy.buoystations.ET', python_element_tree):
+			with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'rb') as activestations_file:
+				self.assertTrue(stations.parse_stations(activestations_file, active=True))
+
+		self.assertTrue(len(stations.stations) > 0)
+		self.assertTrue([x.station_id for x in stations.stations] == [x.station_id for x in expected.stations if x.active])
+		self.assertTrue(stations.find_station('44097').location.latitude == expected.find_station('44097').location.latitude)
+
+	def test_serialize_streamed_station(self):
+		stations = surfpy.BuoyStations(stations=[])
+		with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'rb') as activestations_file:
+			stations.parse_stations(activestations_file)
+
+		# The name is resolved when serializing even if it was never read
+		station = stations.find_station('44097')
+		serialized = surfpy.serialize_to_dict(station)
+		self.assertTrue(serialized['name'] == 'Block Island, Ri')
+		self.assertFalse('_name' in serialized)
+		self.assertTrue(surfpy.deserialize(surfpy.serialize(station)).name == 'Block Island, Ri')
+
+	def test_station_indexes(self):
+		parsed_stations = surfpy.BuoyStations(stations=[])
+		with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'r') as activestations_file:
+			parsed_stations.parse_stations(activestations_file.read())
+
+		block_island = parsed_stations.find_station('44097')
+		self.assertTrue(parsed_stations.find_station_name(block_island.location.name) is block_island)
+		self.assertTrue(parsed_stations.search_station_name('BLOCK ISLAND, ri') == [block_island])
+		for expr in ['Point', 'nm s', 'island, ny']:
+			expected = [x for x in parsed_stations.stations if expr.lower() in x.location.name.lower()]
+			self.assertTrue(parsed_stations.search_station_name(expr) == expected)
+		self.assertTrue(all(['montauk' in x.location.name.lower() for x in parsed_stations.search_station_name('montau poi', prefix=True)]))
+
+		added = surfpy.BuoyStation('zz001', surfpy.Location(0.0, 0.0, name='Zzyzx Test Buoy'))
+		parsed_stations.add_station(added)
+		self.assertTrue(parsed_stations.find_station('zz001') is added)
+		self.assertTrue(parsed_stations.search_station_name('zzy', prefix=True) == [added])
+
+		replaced = surfpy.BuoyStations(stations=[added])
+		self.assertTrue(replaced.find_station('44097') is None)
+		self.assertTrue(replaced.find_station('zz001') is added)
+
+	def test_station_catalog(self):
+		parsed_stations = surfpy.BuoyStations(stations=[])
+		with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'r') as activestations_file:
+			parsed_stations.parse_stations(activestations_file.read())
+
+		with tempfile.TemporaryDirectory() as catalog_path:
+			catalog_file = os.path.join(catalog_path, 'buoys.npz')
+			StationCatalog.from_columns(parsed_stations.catalog_columns(), datetime.datetime.now()).save(catalog_file)
+
+			# A fresh catalog is used without making any request
+			cached_stations = surfpy.BuoyStations()
+			self.assertTrue(cached_stations.fetch_stations(cache_path=catalog_file))
+
+		self.assertTrue(len(cached_stations.stations) == 1423)
+		self.assertTrue(cached_stations.stations.built_count == 0)
+
+		block_island = cached_stations.find_station('44097')
+		expected = parsed_stations.find_station('44097')
+		self.assertTrue(cached_stations.stations.built_count == 1)
+		self.assertTrue(block_island.location.name == expected.location.name and block_island.location.latitude == expected.location.latitude)
+		self.assertTrue(block_island.active == expected.active and block_island.buoy_type == expected.buoy_type and block_island.owner == expected.owner)
+
+		search_location = surfpy.Location(41.1, -71.4)
+		closest = cached_stations.find_closest_buoys(search_location, 3, active=True, buoy_type=surfpy.BuoyStation.BuoyType.buoy)
+		expected = parsed_stations.find_closest_buoys(search_location, 3, active=True, buoy_type=surfpy.BuoyStation.BuoyType.buoy)
+		self.assertTrue([x.station_id for x in closest] == [x.station_id for x in expected])
+		self.assertTrue(cached_stations.stations.built_count <= 4)
+
+	def test_find_closest_buoys(self):
+		parsed_stations = surfpy.BuoyStations(stations=[])
+		with open(TestBuoyStations.ACTIVE_STATIONS_XML_FILE, 'r') as activestations_file:
+			parsed_stations.parse_stations(activestations_file.read())
+
+		block_island = surfpy.Location(41.1, -71.4)
+		closest = parsed_stations.find_closest_buoys(block_island, 5, active=True)
+		expected = sorted([x for x in parsed_stations.stations if x.active], key=lambda x: block_island.distance(x.location))[:5]
+		self.assertTrue([x.station_id for x in closest] == [x.station_id for x in expected])
+		self.assertTrue(parsed_stations.find_closest_buoy(block_island, active=True) is closest[0])
+
+		batch = parsed_stations.find_closest_stations_batch([block_island, surfpy.Location(21.3, -157.9)], 3)
+		self.assertTrue(len(batch) == 2 and len(batch[1]) == 3)
+		self.assertTrue(batch[0][0] is parsed_stations.find_closest_station(block_island))
+
 	def test_fetch_stations(self):
 		fetched_stations = surfpy.BuoyStations(stations=[])
 		self.assertTrue(fetched_stations.fetch_stations())
 		self.assertTrue(len(fetched_stations.stations) > 0)
 		self.assertTrue(fetched_stations.find_station('44097') is not None)
+
+	LATEST_READINGS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'latest_obs.txt')
+
+	def test_parse_latest_readings(self):
+		with open(TestBuoyStations.LATEST_READINGS_FILE, 'r') as latest_readings_file:
+			raw_latest_data = latest_readings_file.read()
+
+		readings = surfpy.BuoyStations.parse_latest_readings(raw_latest_data)
+		self.assertTrue(len(readings) == 7, msg='Expected 7 readings but found {0}'.format(len(readings)))
+
+		block_island = readings['44097']
+		self.assertTrue(block_island.date.hour == 18 and block_island.date.minute == 56)
+		self.assertTrue(abs(block_island.wave_summary.wave_height - 1.2) < 0.0001)
+		self.assertTrue(block_island.wave_summary.compass_direction == 'S')
+		self.assertTrue(block_island.wind_speed != block_island.wind_speed)
+
+		self.assertTrue(readings['13002'].wave_summary is None)
+		self.assertTrue(abs(readings['8452660'].water_level - 2.3 / 3.28) < 0.0001)
+
+		# A malformed value only loses that value, a malformed date loses the station
+		self.assertTrue(readings['41004'].wind_gust != readings['41004'].wind_gust)
+		self.assertTrue(abs(readings['41004'].wind_speed - 6.0) < 0.0001)
+		self.assertTrue(abs(readings['41002'].wind_gust - 9.0) < 0.0001)
+		self.assertFalse('41008' in readings)
+
+	WAVE_FORECAST_BULLETIN_FILE = os.path.join(os.path.dirname(__file__), 'data', 'gfswave-44097.bull')
+
+	def test_parse_wave_forecast_bulletins(self):
+		with open(TestBuoyStations.WAVE_FORECAST_BULLETIN_FILE, 'rb') as wave_forecast_bulletin_file:
+			raw_wave_bulletin_data = wave_forecast_bulletin_file.read()
+
+		archive_data = io.BytesIO()
+		with tarfile.open(fileobj=archive_data, mode='w') as archive:
+			for name in ['gfswave.44097.bull', 'gfswave.44013.bull', 'gfswave.44097.cbull']:
+				member = tarfile.TarInfo(name)
+				member.size = len(raw_wave_bulletin_data)
+				archive.addfile(member, io.BytesIO(raw_wave_bulletin_data))
+		archive_data.seek(0)
+
+		forecasts = surfpy.BuoyStations.parse_wave_forecast_bulletins(archive_data)
+		self.assertTrue(sorted(forecasts.keys()) == ['44013', '44097'])
+		self.assertTrue(len(forecasts['44097']) == len(forecasts['44013']))
+		self.assertTrue(len(forecasts['44097']) > 61)
+
+		archive_data.seek(0)
+		filtered = surfpy.BuoyStations.parse_wave_forecast_bulletins(archive_data, station_ids=['44013'], workers=2)
+		self.assertTrue(list(filtered.keys()) == ['44013'])
+		self.assertTrue(len(filtered['44013']) == len(forecasts['44013']))
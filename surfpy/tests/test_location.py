@@ -0,0 +1,36 @@
+from unittest import TestCase
+import numpy as np
+
+import surfpy
+
+
+class TestLocation(TestCase):
+
+    def test_distance_matrix(self):
+        rng = np.random.RandomState(3)
+        origins = [surfpy.Location(x, y) for x, y in zip(rng.uniform(-80, 80, 20), rng.uniform(-180, 180, 20))]
+        destinations = np.column_stack([rng.uniform(-80, 80, 30), rng.uniform(0, 360, 30)])
+
+        for unit in [surfpy.units.Units.metric, surfpy.units.Units.english]:
+            distances = surfpy.distance_matrix(origins, destinations, unit)
+            self.assertTrue(distances.shape == (20, 30))
+            for i, origin in enumerate(origins):
+                for j, destination in enumerate(destinations):
+                    expected = origin.distance(surfpy.Location(destination[0], destination[1]), unit)
+                    self.assertTrue(abs(distances[i, j] - expected) < 0.001)
+
+        self.assertTrue(np.allclose(origins[0].distances(destinations), surfpy.distance_matrix(origins[:1], destinations)[0]))
+
+    def test_nearest_locations(self):
+        rng = np.random.RandomState(5)
+        origins = np.column_stack([rng.uniform(-60, 60, 50), rng.uniform(-180, 180, 50)])
+        destinations = np.column_stack([rng.uniform(-60, 60, 40), rng.uniform(-180, 180, 40)])
+        distances = surfpy.distance_matrix(origins, destinations)
+
+        indexes, nearest = surfpy.nearest_locations(origins, destinations, 4, chunk_size=16)
+        self.assertTrue(indexes.shape == (50, 4))
+        self.assertTrue(np.array_equal(indexes, np.argsort(distances, axis=1)[:, :4]))
+        self.assertTrue(np.allclose(nearest, np.sort(distances, axis=1)[:, :4]))
+
+        indexes, _ = surfpy.nearest_locations(origins, destinations[:2], 4)
+        self.assertTrue(indexes.shape == (50, 2))
@@ -0,0 +1,125 @@
+from unittest import TestCase
+import datetime
+
+import surfpy
+from surfpy.responsecache import ResponseCache, data_expiration_date
+
+
+class TestResponseCache(TestCase):
+
+    def test_entry_expiration_and_validators(self):
+        now = datetime.datetime(2021, 4, 28, 18, 10)
+        reading = surfpy.BuoyData(surfpy.units.Units.metric, expiration_date=now + datetime.timedelta(minutes=40))
+
+        class Response(object):
+            headers = {'Last-Modified': 'Wed, 28 Apr 2021 18:05:12 GMT', 'ETag': '"abc123"'}
+
+        url = 'https://www.ndbc.noaa.gov/data/realtime2/44097.txt'
+        cache = ResponseCache()
+        entry = cache.put((url, 22), [reading], data_expiration_date([reading]), [url], [Response()])
+
+        self.assertTrue(cache.get((url, 22)) is entry)
+        self.assertFalse(entry.is_expired(now))
+        self.assertTrue(entry.is_expired(now + datetime.timedelta(hours=1)))
+
+        headers = entry.request_headers(url)
+        self.assertTrue(headers['If-Modified-Since'] == 'Wed, 28 Apr 2021 18:05:12 GMT')
+        self.assertTrue(headers['If-None-Match'] == '"abc123"')
+
+        cached = entry.copy_data()
+        cached[0].change_units(surfpy.units.Units.english)
+        self.assertTrue(entry.data[0].unit == surfpy.units.Units.metric)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(maxsize=2)
+        cache.put('a', [], None)
+        cache.put('b', [], None)
+        self.assertTrue(cache.get('a') is not None)
+        cache.put('c', [], None)
+        self.assertTrue(len(cache) == 2)
+        self.assertTrue(cache.get('b') is None)
+        self.assertTrue(cache.get('a') is not None and cache.get('c') is not None)
+
+
+class MockResponse(object):
+
+    def __init__(self, status_code, lines, headers):
+        self.status_code = status_code
+        self.lines = lines
+        self.headers = headers
+        self.closed = False
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+
+class MockSession(object):
+
+    def __init__(self):
+        # url -> (status code for conditional requests, lines)
+        self.files = {}
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False):
+        self.requests.append((url, dict(headers or {})))
+        status_code, lines = self.files[url]
+        if not headers:
+            status_code = 200
+        return MockResponse(status_code, lines, {'Last-Modified': 'Wed, 28 Apr 2021 18:05:12 GMT', 'ETag': '"' + url + '"'})
+
+
+class TestCachedFetch(TestCase):
+
+    URLS = ['https://www.ndbc.noaa.gov/data/realtime2/44097.data_spec', 'https://www.ndbc.noaa.gov/data/realtime2/44097.swdir']
+
+    def setUp(self):
+        self.station = surfpy.BuoyStation('44097', surfpy.Location(40.967, -71.126, name='Block Island'))
+        self.station.response_cache = ResponseCache()
+        self.session = MockSession()
+        self.session.files = {url: (200, ['header', url]) for url in self.URLS}
+        self.parse_count = 0
+
+    def parse(self, lines, responses):
+        self.parse_count += 1
+        reading = surfpy.BuoyData(surfpy.units.Units.metric)
+        reading.wave_summary = surfpy.Swell(surfpy.units.Units.metric, wave_height=float(self.parse_count))
+        reading.find_expiration_date()
+        return [reading]
+
+    def expire(self):
+        for entry in self.station.response_cache.entries.values():
+            entry.expiration_date = datetime.datetime(2000, 1, 1)
+
+    def test_cached_until_expired(self):
+        first = self.station._cached_fetch(self.URLS, 0, self.parse, self.session)
+        second = self.station._cached_fetch(self.URLS, 0, self.parse, self.session)
+        self.assertTrue(self.parse_count == 1 and len(self.session.requests) == 2)
+        self.assertTrue(second[0].wave_summary.wave_height == first[0].wave_summary.wave_height)
+        self.assertFalse(second[0] is first[0])
+
+    def test_full_revalidation(self):
+        self.station._cached_fetch(self.URLS, 0, self.parse, self.session)
+        self.expire()
+        self.session.requests = []
+        self.session.files = {url: (304, []) for url in self.URLS}
+
+        data = self.station._cached_fetch(self.URLS, 0, self.parse, self.session)
+        self.assertTrue(self.parse_count == 1)
+        self.assertTrue(data[0].wave_summary.wave_height == 1.0)
+        self.assertTrue(all(x[1]['If-None-Match'] == '"' + x[0] + '"' for x in self.session.requests))
+        self.assertFalse(list(self.station.response_cache.entries.values())[0].is_expired())
+
+    def test_partial_revalidation(self):
+        self.station._cached_fetch(self.URLS, 0, self.parse, self.session)
+        self.expire()
+        self.session.requests = []
+        self.session.files = {self.URLS[0]: (304, ['header', 'unchanged']), self.URLS[1]: (200, ['header', 'changed'])}
+
+        data = self.station._cached_fetch(self.URLS, 0, self.parse, self.session)
+        self.assertTrue(self.parse_count == 2)
+        self.assertTrue(data[0].wave_summary.wave_height == 2.0)
+        # The unchanged file is downloaded again in full to parse the product
+        self.assertTrue(self.session.requests[-1] == (self.URLS[0], {}))
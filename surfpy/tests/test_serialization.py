@@ -13,3 +13,20 @@ class SerializationTest(TestCase):
 		self.assertTrue(abs(original.latitude - cloned.latitude) < 0.000001)
 		self.assertTrue(abs(original.longitude - cloned.longitude) < 0.000001)
 		self.assertTrue(abs(original.altitude - cloned.altitude) < 0.000001)
+
+	def test_serialize_slot_data(self):
+		swell = surfpy.Swell(surfpy.units.Units.metric, wave_height=1.5, period=9.0, direction=135.0)
+		original = surfpy.BuoyData(surfpy.units.Units.metric, wind_speed=4.0, wave_summary=swell, swell_components=[swell])
+		self.assertFalse(hasattr(original, '__dict__'))
+		self.assertFalse(hasattr(swell, '__dict__'))
+
+		cloned = surfpy.deserialize(surfpy.serialize(original))
+		self.assertTrue(isinstance(cloned, surfpy.BuoyData))
+		self.assertTrue(abs(cloned.wind_speed - 4.0) < 0.000001)
+		self.assertTrue(isinstance(cloned.swell_components[0], surfpy.Swell))
+		self.assertTrue(cloned.wave_summary.compass_direction == 'SE')
+
+		event = surfpy.TideEvent(surfpy.units.Units.metric, tidal_event=surfpy.TideEvent.TidalEventType.high_tide, water_level=1.2)
+		cloned_event = surfpy.deserialize(surfpy.serialize(event))
+		self.assertTrue(cloned_event.tidal_event == 'H')
+		self.assertTrue(abs(cloned_event.water_level - 1.2) < 0.000001)
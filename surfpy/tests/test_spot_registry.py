@@ -0,0 +1,81 @@
+from unittest import TestCase
+import os
+import tempfile
+
+import surfpy
+from surfpy.spotregistry import model_preference
+
+
+class TestSpotRegistry(TestCase):
+
+    ACTIVE_STATIONS_XML_FILE = os.path.join(os.path.dirname(__file__), 'data', 'activestations.xml')
+
+    def test_register(self):
+        buoy_stations = surfpy.BuoyStations(stations=[])
+        with open(TestSpotRegistry.ACTIVE_STATIONS_XML_FILE, 'r') as activestations_file:
+            buoy_stations.parse_stations(activestations_file.read())
+        tide_stations = surfpy.TideStations(stations=[
+            surfpy.TideStation('8452660', surfpy.Location(41.505, -71.326, name='Newport')),
+            surfpy.TideStation('9414290', surfpy.Location(37.806, -122.465, name='San Francisco')),
+        ])
+
+        spots = [
+            surfpy.Location(41.35, -71.4, name='Matunuck', depth=30.0, angle=145.0, slope=0.02),
+            surfpy.Location(37.49, -122.5, name='Mavericks', depth=25.0, angle=260.0, slope=0.03),
+            surfpy.Location(-33.89, 151.28, name='Bondi', depth=20.0, angle=100.0, slope=0.02),
+        ]
+        registry = surfpy.SpotRegistry()
+        registry.register(spots, buoy_stations=buoy_stations, tide_stations=tide_stations)
+
+        for spot in spots:
+            entry = registry.get(spot.name)
+            candidates = [x for x in surfpy.all_gfs_wave_models() if x.contains_location(spot)]
+            best = min(candidates, key=model_preference)
+            self.assertTrue(entry.wave_model == best.subset)
+            self.assertTrue(entry.wave_model_index == best.location_index(spot))
+            self.assertTrue(registry.wave_model(spot.name).subset == best.subset)
+
+            expected_buoy = buoy_stations.find_closest_buoy(spot, active=True, buoy_type=surfpy.BuoyStation.BuoyType.buoy)
+            self.assertTrue(registry.buoy_station(spot.name, buoy_stations) is expected_buoy)
+            self.assertTrue(abs(entry.buoy_distance - spot.distance(expected_buoy.location)) < 0.001)
+
+        self.assertTrue(registry.get('Matunuck').wave_model == 'atlocn.0p16')
+        self.assertTrue(registry.get('Mavericks').wave_model == 'wcoast.0p16')
+        self.assertTrue(registry.tide_station('Matunuck', tide_stations).station_id == '8452660')
+        self.assertTrue(registry.tide_station('Mavericks', tide_stations).station_id == '9414290')
+
+        with tempfile.TemporaryDirectory() as registry_path:
+            registry.save(os.path.join(registry_path, 'spots.json'))
+            loaded = surfpy.SpotRegistry.load(os.path.join(registry_path, 'spots.json'))
+
+        self.assertTrue(len(loaded) == 3)
+        self.assertTrue(loaded.get('Bondi').__dict__ == registry.get('Bondi').__dict__)
+        self.assertTrue(loaded.get('Matunuck').location.depth == 30.0)
+
+    def test_breaking_tables(self):
+        spots = [surfpy.Location(41.35, -71.4, name='Matunuck', depth=30.0, angle=145.0, slope=0.02)]
+        with tempfile.TemporaryDirectory() as directory:
+            registry = surfpy.SpotRegistry()
+            registry.register(spots, table_directory=directory)
+            registry.save(os.path.join(directory, 'spots.json'))
+            table_path = registry.get('Matunuck').breaking_table
+            self.assertTrue(os.path.exists(table_path))
+            self.assertTrue(registry.breaking_table('Matunuck').matches(spots[0]))
+
+            # A table saved for the spot is loaded with the registry
+            loaded = surfpy.SpotRegistry.load(os.path.join(directory, 'spots.json'))
+            table = loaded.breaking_table('Matunuck')
+            self.assertTrue(table.matches(spots[0]))
+            self.assertTrue(loaded.breaking_table('Matunuck') is table)
+
+            # A table built for another depth than the registered one is rebuilt and saved again
+            surfpy.BreakingTransferTable.from_location(surfpy.Location(41.35, -71.4, depth=10.0, angle=145.0, slope=0.02)).save(table_path)
+            loaded = surfpy.SpotRegistry.load(os.path.join(directory, 'spots.json'))
+            self.assertTrue(loaded.breaking_table('Matunuck').matches(spots[0]))
+            self.assertTrue(surfpy.BreakingTransferTable.load(table_path).matches(spots[0]))
+
+            # As is the cached table when the entry changes
+            loaded.get('Matunuck').depth = 20.0
+            self.assertTrue(loaded.breaking_table('Matunuck').depth == 20.0)
+
+        self.assertTrue(registry.breaking_table('Bondi') is None)
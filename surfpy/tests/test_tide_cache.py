@@ -0,0 +1,144 @@
+from unittest import TestCase
+import datetime
+import os
+import threading
+import time
+
+import surfpy
+
+
+class RecordingTideStation(surfpy.TideStation):
+
+    def __init__(self, harmonics):
+        super(RecordingTideStation, self).__init__('fixture', surfpy.Location(41.0, -71.0, name='Fixture'))
+        self.harmonics = harmonics
+        self.requests = []
+        self.failing_days = set()
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def fetch_tide_data(self, start_date, end_date, datum=surfpy.TideStation.TideDatum.mean_tide_level,
+                        interval=surfpy.TideStation.DataInterval.high_low, unit=surfpy.units.Units.metric):
+        # Stands in for the API with predictions from the fixture constituents
+        with self._lock:
+            self.requests.append((start_date, end_date))
+        time.sleep(self.delay)
+        if start_date.date() in self.failing_days:
+            return False
+        return self.harmonics.predict(start_date, end_date, datum=datum, interval=interval, unit=unit)
+
+
+class TestTideDataCache(TestCase):
+
+    DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+
+    def setUp(self):
+        with open(os.path.join(self.DATA_DIRECTORY, 'synthetic_harcon.json'), 'r') as constituents_file:
+            raw_constituents = constituents_file.read()
+        with open(os.path.join(self.DATA_DIRECTORY, 'synthetic_datums.json'), 'r') as datums_file:
+            raw_datums = datums_file.read()
+        harmonics = surfpy.TideHarmonics.parse_harmonic_constituents('fixture', raw_constituents, raw_datums)
+        self.station = RecordingTideStation(harmonics)
+
+    def test_fetches_only_gaps(self):
+        cache = surfpy.TideDataCache()
+        interval = surfpy.TideStation.DataInterval.hourly
+
+        cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 3, 6), datetime.datetime(2021, 6, 5, 18), interval=interval)
+        self.assertEqual(self.station.requests, [(datetime.datetime(2021, 6, 3), datetime.datetime(2021, 6, 5, 23, 59))])
+
+        # An overlapping week only fetches the days on either side
+        self.station.requests = []
+        tidal_events, tidal_data = cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 7), interval=interval)
+        self.assertEqual(sorted(self.station.requests), [
+            (datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 2, 23, 59)),
+            (datetime.datetime(2021, 6, 6), datetime.datetime(2021, 6, 7, 23, 59)),
+        ])
+
+        # Stitched in order and matching a single request over the same range
+        _, expected_data = self.station.harmonics.predict(datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 7), interval=interval)
+        self.assertEqual([x.date for x in tidal_data], [x.date for x in expected_data])
+        self.assertEqual([x.water_level for x in tidal_data], [x.water_level for x in expected_data])
+        self.assertTrue(len(tidal_events) > 20)
+        self.assertTrue(all(x.is_tidal_event for x in tidal_events))
+
+        self.station.requests = []
+        cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 2), datetime.datetime(2021, 6, 4), interval=interval)
+        self.assertEqual(self.station.requests, [])
+        self.assertEqual(len(cache.cached_days('fixture', surfpy.TideStation.TideDatum.mean_tide_level, interval, surfpy.units.Units.metric)), 7)
+
+    def test_chunked_fetch(self):
+        cache = surfpy.TideDataCache()
+        tidal_events, tidal_data = cache.fetch_tide_data(self.station, datetime.datetime(2021, 1, 1), datetime.datetime(2021, 3, 31, 23, 59),
+            interval=surfpy.TideStation.DataInterval.default)
+
+        requests = sorted(self.station.requests)
+        self.assertEqual(len(requests), 3)
+        self.assertTrue(all((end - start) < datetime.timedelta(days=31) for start, end in requests))
+        self.assertEqual(len(tidal_data), 90 * 240)
+        dates = [x.date for x in tidal_data]
+        self.assertEqual(dates, sorted(dates))
+
+    def test_keys_and_failures(self):
+        cache = surfpy.TideDataCache()
+        tidal_events, tidal_data = cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 2))
+        self.assertEqual(tidal_events, tidal_data)
+        self.assertTrue(all(x.is_tidal_event for x in tidal_data))
+
+        # A different datum is its own cache entry
+        self.station.requests = []
+        _, mllw_data = cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 2),
+            datum=surfpy.TideStation.TideDatum.mean_lower_low_water)
+        self.assertEqual(len(self.station.requests), 1)
+        self.assertNotEqual(mllw_data[0].water_level, tidal_data[0].water_level)
+
+        # Failed chunks fail the request and are fetched again next time
+        self.station.failing_days.add(datetime.date(2021, 7, 1))
+        self.assertIsNone(cache.fetch_tide_data(self.station, datetime.datetime(2021, 7, 1), datetime.datetime(2021, 7, 2)))
+        self.station.failing_days.clear()
+        self.station.requests = []
+        self.assertIsNotNone(cache.fetch_tide_data(self.station, datetime.datetime(2021, 7, 1), datetime.datetime(2021, 7, 2)))
+        self.assertEqual(len(self.station.requests), 1)
+
+    def test_results_are_copies(self):
+        cache = surfpy.TideDataCache()
+        for interval in [surfpy.TideStation.DataInterval.high_low, surfpy.TideStation.DataInterval.hourly]:
+            tidal_events, tidal_data = cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 2), interval=interval)
+            expected = [x.water_level for x in tidal_data]
+            for data in tidal_data:
+                data.change_units(surfpy.units.Units.english)
+            for event in tidal_events:
+                event.change_units(surfpy.units.Units.english)
+            surfpy.TideStation.interpolate_tidal_events(tidal_data)
+
+            tidal_events, tidal_data = cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 2), interval=interval)
+            self.assertEqual([x.water_level for x in tidal_data], expected)
+            self.assertTrue(all(x.unit == surfpy.units.Units.metric for x in tidal_data + tidal_events))
+            # Events are the marked points of tidal_data, as from TideStation.fetch_tide_data
+            self.assertTrue(all(any(x is y for y in tidal_data) for x in tidal_events))
+            self.assertTrue(len([x for x in tidal_data if x.is_tidal_event]) == len(tidal_events))
+
+        # Marks from one request never leak into another over a different range
+        tidal_events, tidal_data = cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, 1, 3), datetime.datetime(2021, 6, 1, 9),
+            interval=surfpy.TideStation.DataInterval.hourly)
+        self.assertTrue(len([x for x in tidal_data if x.is_tidal_event]) == len(tidal_events))
+
+    def test_concurrent_requests(self):
+        # Requests for days another request is already fetching wait for it instead of fetching them again
+        cache = surfpy.TideDataCache()
+        self.station.delay = 0.2
+        results = []
+
+        def request(start_day):
+            results.append(cache.fetch_tide_data(self.station, datetime.datetime(2021, 6, start_day), datetime.datetime(2021, 6, 10)))
+
+        threads = [threading.Thread(target=request, args=(x,)) for x in (1, 1, 5)]
+        threads[0].start()
+        time.sleep(0.05)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.station.requests), 1)
+        self.assertTrue(all(x is not None for x in results))
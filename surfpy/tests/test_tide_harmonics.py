@@ -0,0 +1,161 @@
+from unittest import TestCase
+import datetime
+import os
+import tempfile
+import numpy as np
+import pytz
+
+import surfpy
+from surfpy import tideharmonics
+
+
+class TestTideHarmonics(TestCase):
+
+    DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+
+    # Constituent speeds in degrees per hour as published by CO-OPS
+    NOAA_SPEEDS = {
+        'M2': 28.9841042, 'S2': 30.0, 'N2': 28.4397295, 'K1': 15.0410686, 'M4': 57.9682084, 'O1': 13.9430356,
+        'M6': 86.9523127, 'MK3': 44.0251729, 'S4': 60.0, 'MN4': 57.4238337, 'NU2': 28.5125831, 'S6': 90.0,
+        'MU2': 27.9682084, '2N2': 27.8953548, 'OO1': 16.1391017, 'LAM2': 29.4556253, 'S1': 15.0, 'M1': 14.4966939,
+        'J1': 15.5854433, 'MM': 0.5443747, 'SSA': 0.0821373, 'SA': 0.0410686, 'MSF': 1.0158958, 'MF': 1.0980331,
+        'RHO': 13.4715145, 'Q1': 13.3986609, 'T2': 29.9589333, 'R2': 30.0410667, '2Q1': 12.8542862, 'P1': 14.9589314,
+        '2SM2': 31.0158958, 'M3': 43.4761563, 'L2': 29.5284789, '2MK3': 42.9271398, 'K2': 30.0821373, 'M8': 115.9364166,
+        'MS4': 58.9841042,
+    }
+
+    def load_harmonics(self):
+        with open(os.path.join(self.DATA_DIRECTORY, 'synthetic_harcon.json'), 'r') as constituents_file:
+            raw_constituents = constituents_file.read()
+        with open(os.path.join(self.DATA_DIRECTORY, 'synthetic_datums.json'), 'r') as datums_file:
+            raw_datums = datums_file.read()
+        return surfpy.TideHarmonics.parse_harmonic_constituents('fixture', raw_constituents, raw_datums)
+
+    def load_fixture(self, name, datum):
+        station = surfpy.TideStation('fixture', surfpy.Location(41.0, -71.0, name='Fixture'))
+        with open(os.path.join(self.DATA_DIRECTORY, name), 'r') as predictions_file:
+            return station.parse_tide_data(predictions_file.read(), datum, surfpy.units.Units.metric)
+
+    def test_constituent_speeds(self):
+        names = list(self.NOAA_SPEEDS)
+        speeds = tideharmonics.constituent_speeds(names)
+        for name, speed in zip(names, speeds):
+            self.assertAlmostEqual(speed, self.NOAA_SPEEDS[name], places=6, msg=name)
+
+    def test_node_factors(self):
+        # Over the 18.6 year nodal cycle the node factors stay within their known ranges
+        timestamps = np.linspace(0, 18.61 * 365.25 * 86400, 500)
+        factors, _ = tideharmonics.nodal_corrections(['M2', 'K1', 'O1', 'S2'], tideharmonics.astronomical_arguments(timestamps))
+        self.assertAlmostEqual(factors[0].min(), 0.963, places=2)
+        self.assertAlmostEqual(factors[0].max(), 1.038, places=2)
+        self.assertAlmostEqual(factors[1].min(), 0.882, places=2)
+        self.assertAlmostEqual(factors[1].max(), 1.113, places=2)
+        self.assertAlmostEqual(factors[2].min(), 0.806, places=2)
+        self.assertAlmostEqual(factors[2].max(), 1.183, places=2)
+        self.assertTrue(np.all(factors[3] == 1.0))
+
+    def test_lunar_standstill(self):
+        # Published dates of the nodal cycle: the ascending node passed the vernal equinox in June 2006
+        # and again in early 2025 (the major lunar standstills), when the diurnal factors are largest and
+        # M2 is smallest, with the minor standstill between them in 2015 when M2 is largest
+        epoch = datetime.datetime(2000, 1, 1, tzinfo=pytz.utc)
+        timestamps = epoch.timestamp() + np.arange(0, 30 * 365) * 86400.0
+        dates = [epoch + datetime.timedelta(days=x) for x in range(0, len(timestamps))]
+        factors, _ = tideharmonics.nodal_corrections(['M2', 'K1', 'O1'], tideharmonics.astronomical_arguments(timestamps))
+
+        def closest(values, date, days, find=np.argmax):
+            # Extreme of values within a year either side of date
+            window = np.abs((timestamps - date.timestamp()) / 86400.0) <= 365
+            index = np.flatnonzero(window)[find(values[window])]
+            self.assertLessEqual(abs((dates[index] - date).days), days, msg=dates[index])
+
+        major_standstills = [datetime.datetime(2006, 6, 20, tzinfo=pytz.utc), datetime.datetime(2025, 1, 20, tzinfo=pytz.utc)]
+        for standstill in major_standstills:
+            closest(factors[1], standstill, 45)
+            closest(factors[2], standstill, 45)
+            closest(factors[0], standstill, 45, find=np.argmin)
+        closest(factors[0], datetime.datetime(2015, 10, 1, tzinfo=pytz.utc), 90)
+
+    def test_solar_constituent(self):
+        # S2 has no nodal correction and its argument is twice the hour angle of the mean sun
+        harmonics = surfpy.TideHarmonics('solar', ['S2'], [1.5], [40.0])
+        start = datetime.datetime(2021, 3, 14, tzinfo=pytz.utc).timestamp()
+        hours = np.arange(0, 48, 0.25)
+        levels = harmonics.water_levels(start + hours * 3600.0)
+        np.testing.assert_allclose(levels, 1.5 * np.cos(np.radians(30.0 * hours - 40.0)), atol=1e-9)
+
+    def test_parse_harmonic_constituents(self):
+        harmonics = self.load_harmonics()
+        self.assertEqual(harmonics.names[0], 'M2')
+        self.assertAlmostEqual(harmonics.amplitudes[0], 0.315)
+        self.assertAlmostEqual(harmonics.phases[0], 231.4)
+        # Constituents with no amplitude are left out
+        self.assertNotIn('MF', harmonics.names)
+        self.assertAlmostEqual(harmonics.datum_offset('MLLW'), 1.626 - 1.223)
+        self.assertEqual(harmonics.datum_offset('MSL'), 0.0)
+        self.assertIsNone(harmonics.datum_offset('NAVD'))
+
+    def test_predict_regression_snapshot(self):
+        # The synthetic constituents and the snapshots were written by this engine, so this only
+        # catches changes in its output. test_lunar_standstill checks it against published dates
+        harmonics = self.load_harmonics()
+        start_date = datetime.datetime(2021, 6, 1)
+        end_date = datetime.datetime(2021, 6, 3)
+
+        expected_events, expected_data = self.load_fixture('tide_snapshot_h.json', 'MLLW')
+        tidal_events, tidal_data = harmonics.predict(start_date, end_date, datum='MLLW', interval='h')
+        self.assertEqual(len(tidal_data), len(expected_data))
+        for predicted, expected in zip(tidal_data, expected_data):
+            self.assertIsInstance(predicted, surfpy.TideEvent)
+            self.assertEqual(predicted.date, expected.date)
+            self.assertAlmostEqual(predicted.water_level, expected.water_level, places=3)
+            self.assertEqual(predicted.water_level_datum, 'MLLW')
+
+        expected_events, _ = self.load_fixture('tide_snapshot_hilo.json', 'MLLW')
+        tidal_events, tidal_data = harmonics.predict(start_date, end_date, datum='MLLW')
+        self.assertEqual(len(tidal_events), len(expected_events))
+        self.assertEqual(len(tidal_data), len(tidal_events))
+        for predicted, expected in zip(tidal_events, expected_events):
+            self.assertEqual(predicted.date, expected.date)
+            self.assertEqual(predicted.tidal_event, expected.tidal_event)
+            self.assertAlmostEqual(predicted.water_level, expected.water_level, places=3)
+
+    def test_predict_events(self):
+        harmonics = self.load_harmonics()
+        tidal_events, tidal_data = harmonics.predict(datetime.datetime(2021, 1, 1), datetime.datetime(2021, 1, 8), datum='MSL', interval='')
+        self.assertEqual(len(tidal_data), 7 * 240 + 1)
+
+        # High and low tides alternate and bound the levels around them
+        event_types = [x.tidal_event for x in tidal_events]
+        self.assertTrue(all(a != b for a, b in zip(event_types, event_types[1:])))
+        levels = np.array([x.water_level for x in tidal_data])
+        times = np.array([x.date.timestamp() for x in tidal_data])
+        for event in tidal_events:
+            nearby = levels[np.abs(times - event.date.timestamp()) <= 1800]
+            if event.tidal_event == surfpy.TideEvent.TidalEventType.high_tide:
+                self.assertGreaterEqual(event.water_level + 0.001, nearby.max())
+            else:
+                self.assertLessEqual(event.water_level - 0.001, nearby.min())
+
+        _, english_data = harmonics.predict(datetime.datetime(2021, 1, 1), datetime.datetime(2021, 1, 8), datum='MSL', interval='', unit=surfpy.units.Units.english)
+        self.assertAlmostEqual(english_data[10].water_level, tidal_data[10].water_level * 3.28, places=2)
+        self.assertEqual(english_data[10].unit, surfpy.units.Units.english)
+
+    def test_harmonics_cache(self):
+        harmonics = self.load_harmonics()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'harmonics.json')
+            harmonics.save(path)
+            loaded = surfpy.TideHarmonics.load(path)
+
+            station = surfpy.TideStation('cached', surfpy.Location(41.0, -71.0, name='Cached'))
+            try:
+                tidal_events, _ = station.predict_tide_data(datetime.datetime(2021, 6, 1), datetime.datetime(2021, 6, 2), cache_path=path)
+            finally:
+                surfpy.TideStation.harmonics_cache.pop('cached', None)
+
+        self.assertEqual(loaded.names, harmonics.names)
+        np.testing.assert_array_equal(loaded.amplitudes, harmonics.amplitudes)
+        self.assertEqual(loaded.datums, harmonics.datums)
+        self.assertTrue(len(tidal_events) > 0)
+        self.assertEqual(tidal_events[0].water_level_datum, surfpy.TideStation.TideDatum.mean_tide_level)
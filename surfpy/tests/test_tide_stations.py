@@ -1,11 +1,55 @@
 from unittest import TestCase
+import datetime
+import json
 import os
+import numpy as np
+import pytz
 
 import surfpy
 
 class TestTideStations(TestCase):
 
+	DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+
 	def test_fetch_stations(self):
 		fetched_stations = surfpy.TideStations(stations=[])
 		self.assertTrue(fetched_stations.fetch_stations())
 		self.assertTrue(len(fetched_stations.stations) > 0)
+
+	def test_parse_tide_predictions(self):
+		with open(os.path.join(TestTideStations.DATA_DIRECTORY, 'tide_snapshot_hilo.json'), 'r') as predictions_file:
+			raw_data = predictions_file.read()
+		raw_predictions = json.loads(raw_data)['predictions']
+
+		station = surfpy.TideStation('fixture', surfpy.Location(41.0, -71.0, name='Fixture'))
+		predictions = station.parse_tide_predictions(raw_data, 'MLLW', surfpy.units.Units.metric)
+		self.assertEqual(len(predictions), len(raw_predictions))
+		self.assertEqual(predictions.times[0], np.datetime64('2021-06-01T00:48'))
+		self.assertAlmostEqual(predictions.water_levels[1], 0.164)
+		np.testing.assert_array_equal(predictions.event_indexes, np.arange(0, len(raw_predictions)))
+		self.assertEqual(predictions.event_types.tolist(), [x['type'] for x in raw_predictions])
+
+		event = predictions.event(1)
+		self.assertEqual(event.date, pytz.utc.localize(datetime.datetime(2021, 6, 1, 7, 18)))
+		self.assertEqual(event.tidal_event, surfpy.TideEvent.TidalEventType.low_tide)
+		self.assertEqual(event.water_level_datum, 'MLLW')
+
+		self.assertIsNone(station.parse_tide_predictions('{"error": {}}', 'MLLW', surfpy.units.Units.metric))
+
+	def test_parse_tide_data(self):
+		with open(os.path.join(TestTideStations.DATA_DIRECTORY, 'tide_snapshot_h.json'), 'r') as predictions_file:
+			raw_data = predictions_file.read()
+		raw_predictions = json.loads(raw_data)['predictions']
+
+		station = surfpy.TideStation('fixture', surfpy.Location(41.0, -71.0, name='Fixture'))
+		tidal_events, tidal_data = station.parse_tide_data(raw_data, 'MLLW', surfpy.units.Units.metric)
+		self.assertEqual(len(tidal_data), len(raw_predictions))
+		for data, raw in zip(tidal_data, raw_predictions):
+			self.assertEqual(data.date, pytz.utc.localize(datetime.datetime.strptime(raw['t'], '%Y-%m-%d %H:%M')))
+			self.assertEqual(data.water_level, float(raw['v']))
+
+		# Hourly data has no markers, the events are interpolated from the levels and shared with tidal_data
+		self.assertTrue(len(tidal_events) > 4)
+		self.assertTrue(all(any(x is y for y in tidal_data) for x in tidal_events))
+		event_types = [x.tidal_event for x in tidal_events]
+		self.assertTrue(all(a != b for a, b in zip(event_types, event_types[1:])))
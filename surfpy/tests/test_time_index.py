@@ -0,0 +1,39 @@
+from unittest import TestCase
+import datetime
+import numpy as np
+import pytz
+
+import surfpy
+
+
+class TestTimeIndex(TestCase):
+
+    def setUp(self):
+        # Readings are stored newest first like the NDBC realtime files
+        start = pytz.utc.localize(datetime.datetime(2021, 4, 28, 18, 0))
+        self.data = [surfpy.BuoyData(surfpy.units.Units.metric, date=start - datetime.timedelta(hours=i)) for i in range(0, 72)]
+        self.index = surfpy.TimeIndex.from_data(self.data)
+
+    def test_nearest(self):
+        target = pytz.utc.localize(datetime.datetime(2021, 4, 26, 10, 20))
+        index = self.index.nearest(target)
+        self.assertTrue(self.data[index].date == pytz.utc.localize(datetime.datetime(2021, 4, 26, 10, 0)))
+
+        # Dates more than a day apart must not collapse onto the same time of day
+        index, offset = surfpy.BuoyStation.data_index_for_date(self.data, target)
+        self.assertTrue(index == 56)
+        self.assertTrue(offset == 20 * 60)
+
+    def test_floor_ceil_between(self):
+        target = pytz.utc.localize(datetime.datetime(2021, 4, 27, 6, 30))
+        self.assertTrue(self.data[self.index.floor(target)].date.hour == 6)
+        self.assertTrue(self.data[self.index.ceil(target)].date.hour == 7)
+        self.assertTrue(self.index.ceil(target + datetime.timedelta(days=3)) is None)
+
+        indexes = self.index.between(target, target + datetime.timedelta(hours=3))
+        self.assertTrue([self.data[i].date.hour for i in indexes] == [7, 8, 9])
+
+    def test_nearest_indexes(self):
+        targets = np.array(['2021-04-28T17:40', '2021-04-25T00:00', '2021-04-28T12:29'], dtype='datetime64[m]')
+        indexes = self.index.nearest_indexes(targets, tolerance=1800)
+        self.assertTrue(list(indexes) == [0, -1, 6])
@@ -0,0 +1,67 @@
+from unittest import TestCase
+import numpy as np
+
+from surfpy import tools
+
+
+class TestTools(TestCase):
+
+    def test_ldis_array(self):
+        periods = np.linspace(2.0, 25.0, 47)[:, np.newaxis]
+        depths = np.array([0.5, 1.0, 3.0, 10.0, 25.0, 100.0, 300.0])[np.newaxis, :]
+        expected = np.array([[tools.ldis(float(t), float(d)) for d in depths[0]] for t in periods[:, 0]])
+
+        wavelengths = tools.ldis(periods, depths)
+        self.assertTrue(wavelengths.shape == expected.shape)
+        self.assertTrue(np.allclose(wavelengths, expected, rtol=1e-9))
+
+        approximate = tools.ldis(periods, depths, approximate=True)
+        self.assertTrue(np.allclose(approximate, expected, rtol=1e-6))
+
+        self.assertTrue(list(tools.ldis([10.0, np.nan], 10.0)[1:]) == [-1.0])
+
+    def test_coefficients_array(self):
+        wavelengths = np.array([20.0, 50.0, 100.0, 200.0])
+        angles = np.array([0.0, 15.0, 30.0, 60.0])
+        refraction, shallow_angles = tools.refraction_coefficient(wavelengths, 5.0, angles)
+        shoaling = tools.shoaling_coefficient(wavelengths, 5.0)
+        for i, wavelength in enumerate(wavelengths):
+            expected_refraction, expected_angle = tools.refraction_coefficient(float(wavelength), 5.0, float(angles[i]))
+            self.assertTrue(abs(refraction[i] - expected_refraction) < 1e-12)
+            self.assertTrue(abs(shallow_angles[i] - expected_angle) < 1e-9)
+            self.assertTrue(abs(shoaling[i] - tools.shoaling_coefficient(float(wavelength), 5.0)) < 1e-12)
+
+    def test_dispersion_cache(self):
+        periods = np.round(np.linspace(4.0, 18.0, 120), 1).reshape(20, 6)
+        expected = tools.ldis(periods, 6.0)
+        cache = tools.enable_dispersion_cache(maxsize=100)
+        try:
+            self.assertTrue(np.array_equal(tools.ldis(periods, 6.0), expected))
+            self.assertTrue(np.array_equal(tools.ldis(periods, 6.0), expected))
+            self.assertTrue(len(cache) == 100)
+            self.assertTrue(cache.hits > 0)
+            self.assertTrue(tools.ldis(12.3, 6.0) == tools.ldis(np.array([12.3]), 6.0)[0])
+
+            # Quantized keys stay within the documented error bound
+            cache = tools.enable_dispersion_cache(period_resolution=0.1, depth_resolution=0.5)
+            wavelength = tools.ldis(12.34, 6.2)
+            bound = 0.1 / 12.34 + 0.5 / (4 * 6.2)
+            self.assertTrue(abs(wavelength - tools.ldis_array(12.34, 6.2)) / wavelength < bound)
+            self.assertTrue(len(cache) == 1)
+        finally:
+            tools.disable_dispersion_cache()
+
+    def test_peakdetect(self):
+        values = [1.0, 3.0, 2.0, 5.0, 5.0, float('nan'), 1.0, 0.0, 0.0, 4.0, 4.0]
+        self.assertTrue(tools.peakdetect(values, 0.5) == ([2, 7], [2.0, 0.0], [1, 3], [3.0, 5.0]))
+        self.assertTrue(tools.peakdetect(values, 0.5, x=list(range(10, 21)))[0] == [12, 17])
+        self.assertTrue(tools.peakdetect(values, 10.0) == ([], [], [], []))
+        self.assertTrue(tools.peakdetect([], 0.5) == ([], [], [], []))
+
+    def test_peakdetect_batch(self):
+        series = np.round(np.cumsum(np.random.RandomState(4).normal(size=(50, 40)), axis=1), 1)
+        series[3, 30:] = np.nan
+        peaks = tools.peakdetect_batch(series, 0.5)
+        self.assertTrue(len(peaks) == 50)
+        self.assertTrue(all([peaks[i] == tools.peakdetect(list(series[i]), 0.5) for i in range(len(series))]))
+        self.assertTrue(peaks[3] == tools.peakdetect(series[3, :30], 0.5))
@@ -0,0 +1,19 @@
+from unittest import TestCase
+import numpy as np
+
+from surfpy import units
+
+
+class TestUnits(TestCase):
+
+    def test_degree_to_direction_array(self):
+        degrees = np.concatenate([np.arange(-370.0, 370.0, 0.37), [np.nan]])
+        directions = units.degree_to_direction(degrees)
+        self.assertTrue(all([directions[i] == units.degree_to_direction(float(x)) for i, x in enumerate(degrees)]))
+        self.assertTrue(list(units.degree_to_direction_index([0.0, 91.0, 359.0, 400.0])) == [0, 4, 0, -1])
+
+    def test_direction_to_degree_array(self):
+        directions = ['N', 'nne', 'South', 'west-northwest', 'bogus']
+        degrees = units.direction_to_degree(directions)
+        self.assertTrue(list(degrees) == [units.direction_to_degree(x) for x in directions])
+        self.assertTrue(list(degrees) == [0.0, 22.5, 180.0, 292.5, -1.0])
@@ -0,0 +1,134 @@
+import copy
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytz
+
+from . import units
+from .tidestation import TideStation
+
+
+class TideDataCache(object):
+
+    # Longest range in days CO-OPS serves in one predictions request for each interval
+    chunk_days = {
+        TideStation.DataInterval.default: 31,
+        TideStation.DataInterval.hourly: 365,
+        TideStation.DataInterval.high_low: 365,
+    }
+
+    def __init__(self, workers=4):
+        # Tide predictions by (station id, datum, interval, unit) and then by UTC day. Requests only
+        # fetch the days that are missing, in chunks the API accepts, and are answered from the days
+        self.workers = workers
+        self.segments = {}
+        self._lock = threading.Lock()
+
+        # Days being fetched right now by key, mapped to the event set once their fetch is done so
+        # concurrent requests for the same days wait instead of fetching them again
+        self._pending = {}
+
+    def clear(self):
+        with self._lock:
+            self.segments = {}
+
+    def cached_days(self, station_id, datum, interval, unit):
+        with self._lock:
+            return sorted(self.segments.get((station_id, datum, interval, unit), {}))
+
+    def fetch_tide_data(self, station, start_date, end_date, datum=TideStation.TideDatum.mean_tide_level,
+                        interval=TideStation.DataInterval.high_low, unit=units.Units.metric):
+        # Same arguments and results as TideStation.fetch_tide_data. The results are copies so callers
+        # can change them freely. Days that failed to fetch are not cached and make the whole request
+        # fail like a failed fetch would
+        start_date = _utc(start_date)
+        end_date = _utc(end_date)
+        if end_date < start_date:
+            return None
+
+        key = (station.station_id, datum, interval, unit)
+        days = _days(start_date.date(), end_date.date())
+        fetched = threading.Event()
+        with self._lock:
+            segment = self.segments.setdefault(key, {})
+            pending = self._pending.setdefault(key, {})
+            missing = [x for x in days if x not in segment]
+            waiting = set(pending[x] for x in missing if x in pending)
+            claimed = [x for x in missing if x not in pending]
+            for day in claimed:
+                pending[day] = fetched
+
+        results = []
+        try:
+            chunks = self._chunks(claimed, self.chunk_days.get(interval, 31))
+            if len(chunks) > 0:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as executor:
+                    results = list(executor.map(lambda x: self._fetch_chunk(station, x, datum, interval, unit), chunks))
+        finally:
+            with self._lock:
+                for day in claimed:
+                    pending.pop(day, None)
+            fetched.set()
+
+        for event in waiting:
+            event.wait()
+        if any(x is None for x in results):
+            return None
+
+        with self._lock:
+            segment = self.segments[key]
+            if any(x not in segment for x in days):
+                return None
+            tidal_data = [copy.copy(x) for day in days for x in segment[day] if start_date <= x.date <= end_date]
+
+        if len(tidal_data) < 1:
+            print('Failed to parse tidal data')
+            return None
+
+        # Like TideStation.fetch_tide_data the events are points of tidal_data marked with their type,
+        # found over the whole requested range when the API does not mark them
+        if interval == TideStation.DataInterval.high_low:
+            return list(tidal_data), tidal_data
+        return TideStation.interpolate_tidal_events(tidal_data), tidal_data
+
+    @staticmethod
+    def _chunks(days, chunk_days):
+        # Runs of consecutive days, each split into chunks of at most chunk_days
+        chunks = []
+        for day in days:
+            if len(chunks) > 0 and day == chunks[-1][-1] + datetime.timedelta(days=1) and len(chunks[-1]) < chunk_days:
+                chunks[-1].append(day)
+            else:
+                chunks.append([day])
+        return [(x[0], x[-1]) for x in chunks]
+
+    def _fetch_chunk(self, station, chunk, datum, interval, unit):
+        first_day, last_day = chunk
+        start_date = datetime.datetime(first_day.year, first_day.month, first_day.day)
+        end_date = datetime.datetime(last_day.year, last_day.month, last_day.day, 23, 59)
+        result = station.fetch_tide_data(start_date, end_date, datum=datum, interval=interval, unit=unit)
+        if not result:
+            return None
+
+        _, tidal_data = result
+        chunk_segment = {x: [] for x in _days(first_day, last_day)}
+        for data in tidal_data:
+            # Events interpolated over a single chunk are cut at its ends, they are found again
+            # over each requested range instead
+            if interval != TideStation.DataInterval.high_low:
+                data.tidal_event = None
+            chunk_segment.setdefault(data.date.astimezone(pytz.utc).date(), []).append(data)
+
+        with self._lock:
+            self.segments[(station.station_id, datum, interval, unit)].update(chunk_segment)
+        return chunk
+
+
+def _utc(date):
+    if date.tzinfo is None:
+        return pytz.utc.localize(date)
+    return date.astimezone(pytz.utc)
+
+
+def _days(first_day, last_day):
+    return [first_day + datetime.timedelta(days=x) for x in range(0, (last_day - first_day).days + 1)]
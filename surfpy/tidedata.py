@@ -4,6 +4,8 @@ from . import units
 
 class TideData(BaseData):
 
+    __slots__ = ('date', 'expiration_date', 'water_level', 'water_level_datum')
+
     def __init__(self, unit, date=None, expiration_date=None, water_level=float('nan'), water_level_datum=''):
         super(TideData, self).__init__(unit)
 
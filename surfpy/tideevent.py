@@ -3,12 +3,14 @@ from . import tidedata
 
 class TideEvent(tidedata.TideData):
 
+    __slots__ = ('tidal_event',)
+
     class TidalEventType:
         high_tide='H'
         low_tide='L'
 
-    def __init__(self, unit, tidal_event=None):
-        super(TideEvent, self).__init__(unit)
+    def __init__(self, unit, tidal_event=None, date=None, expiration_date=None, water_level=float('nan'), water_level_datum=''):
+        super(TideEvent, self).__init__(unit, date, expiration_date, water_level, water_level_datum)
 
         self.tidal_event = tidal_event
 
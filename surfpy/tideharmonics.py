@@ -0,0 +1,440 @@
+import datetime
+import json
+import os
+import numpy as np
+import pytz
+
+from . import units
+from .tideevent import TideEvent
+
+
+# Polynomials in Julian centuries since J2000 for the astronomical arguments, in degrees (Meeus)
+_astronomical_polynomials = {
+    's': (218.3164591, 481267.88134236, -0.0013268, 1.0 / 538841.0, -1.0 / 65194000.0),
+    'h': (280.46645, 36000.7697489, 0.00030322222, 0.000000020, -0.00000000654),
+    'p': (83.3532430, 4069.0137111, -0.0103238, -1.0 / 80053.0, 1.0 / 18999000.0),
+    'N': (125.0445550, -1934.1361849, 0.0020762, 1.0 / 467410.0, -1.0 / 60616000.0),
+    'pp': (282.93734098, 1.71945766667, 0.00045688889, -0.00000001778, -0.00000000334),
+    'omega': (23.4392911, -0.0130125, -0.00000016, 0.000000504, 0.0),
+}
+
+# Inclination of the lunar orbit to the ecliptic
+_lunar_inclination = 5.145
+
+# Order of the extended Doodson numbers below
+_doodson_arguments = ('T+h-s', 's', 'h', 'p', 'N', 'pp', '90')
+
+
+def _polynomial(coefficients, centuries):
+    result = np.zeros_like(centuries)
+    for coefficient in reversed(coefficients):
+        result = result * centuries + coefficient
+    return result
+
+
+def astronomical_arguments(timestamps):
+    # The astronomical arguments and the derived lunar orbit angles of Schureman's Manual of Harmonic
+    # Analysis and Prediction of Tides, in degrees, for timestamps in seconds since the epoch (UTC)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    centuries = (timestamps / 86400.0 + 2440587.5 - 2451545.0) / 36525.0
+    hours = np.mod(timestamps, 86400.0) / 3600.0
+
+    arguments = {name: _polynomial(coefficients, centuries) for name, coefficients in _astronomical_polynomials.items()}
+    arguments['T+h-s'] = 180.0 + 15.0 * hours + arguments['h'] - arguments['s']
+    arguments['90'] = np.full_like(centuries, 90.0)
+
+    N = np.radians(arguments['N'])
+    i = np.radians(_lunar_inclination)
+    omega = np.radians(arguments['omega'])
+
+    I = np.arccos(np.cos(i) * np.cos(omega) - np.sin(i) * np.sin(omega) * np.cos(N))
+    e1 = np.arctan(np.cos(0.5 * (omega - i)) / np.cos(0.5 * (omega + i)) * np.tan(0.5 * N)) - 0.5 * N
+    e2 = np.arctan(np.sin(0.5 * (omega - i)) / np.sin(0.5 * (omega + i)) * np.tan(0.5 * N)) - 0.5 * N
+    nu = e1 - e2
+    xi = -(e1 + e2)
+    nup = np.arctan(np.sin(2 * I) * np.sin(nu) / (np.sin(2 * I) * np.cos(nu) + 0.3347))
+    nupp = 0.5 * np.arctan(np.sin(I) ** 2 * np.sin(2 * nu) / (np.sin(I) ** 2 * np.cos(2 * nu) + 0.0727))
+
+    arguments['I'] = np.degrees(I)
+    arguments['nu'] = np.degrees(nu)
+    arguments['xi'] = np.degrees(xi)
+    arguments['nup'] = np.degrees(nup)
+    arguments['nupp'] = np.degrees(nupp)
+    arguments['P'] = arguments['p'] - arguments['xi']
+    return arguments
+
+
+# Node factors f, Schureman equations 65 to 78 and 195 to 235. Each is the factor at the given
+# arguments over its mean value so the constituent amplitudes stay the published mean amplitudes
+
+def _angles(a):
+    return np.radians(a['omega']), np.radians(_lunar_inclination), np.radians(a['I'])
+
+
+def _f_unity(a):
+    return np.ones_like(a['N'])
+
+
+def _f_Mm(a):
+    omega, i, I = _angles(a)
+    mean = (2 / 3.0 - np.sin(omega) ** 2) * (1 - 3 / 2.0 * np.sin(i) ** 2)
+    return (2 / 3.0 - np.sin(I) ** 2) / mean
+
+
+def _f_Mf(a):
+    omega, i, I = _angles(a)
+    mean = np.sin(omega) ** 2 * np.cos(0.5 * i) ** 4
+    return np.sin(I) ** 2 / mean
+
+
+def _f_O1(a):
+    omega, i, I = _angles(a)
+    mean = np.sin(omega) * np.cos(0.5 * omega) ** 2 * np.cos(0.5 * i) ** 4
+    return (np.sin(I) * np.cos(0.5 * I) ** 2) / mean
+
+
+def _f_J1(a):
+    omega, i, I = _angles(a)
+    mean = np.sin(2 * omega) * (1 - 3 / 2.0 * np.sin(i) ** 2)
+    return np.sin(2 * I) / mean
+
+
+def _f_OO1(a):
+    omega, i, I = _angles(a)
+    mean = np.sin(omega) * np.sin(0.5 * omega) ** 2 * np.cos(0.5 * i) ** 4
+    return np.sin(I) * np.sin(0.5 * I) ** 2 / mean
+
+
+def _f_M2(a):
+    omega, i, I = _angles(a)
+    mean = np.cos(0.5 * omega) ** 4 * np.cos(0.5 * i) ** 4
+    return np.cos(0.5 * I) ** 4 / mean
+
+
+def _f_K1(a):
+    omega, i, I = _angles(a)
+    nu = np.radians(a['nu'])
+    mean = 0.5023 * np.sin(2 * omega) * (1 - 3 / 2.0 * np.sin(i) ** 2) + 0.1681
+    return np.sqrt(0.2523 * np.sin(2 * I) ** 2 + 0.1689 * np.sin(2 * I) * np.cos(nu) + 0.0283) / mean
+
+
+def _f_L2(a):
+    I = np.radians(a['I'])
+    P = np.radians(a['P'])
+    inverse_ra = np.sqrt(1 - 12 * np.tan(0.5 * I) ** 2 * np.cos(2 * P) + 36 * np.tan(0.5 * I) ** 4)
+    return _f_M2(a) * inverse_ra
+
+
+def _f_K2(a):
+    omega, i, I = _angles(a)
+    nu = np.radians(a['nu'])
+    mean = 0.5023 * np.sin(omega) ** 2 * (1 - 3 / 2.0 * np.sin(i) ** 2) + 0.0365
+    return np.sqrt(0.2523 * np.sin(I) ** 4 + 0.0367 * np.sin(I) ** 2 * np.cos(2 * nu) + 0.0013) / mean
+
+
+def _f_M1(a):
+    I = np.radians(a['I'])
+    P = np.radians(a['P'])
+    inverse_qa = np.sqrt(0.25 + 1.5 * np.cos(I) * np.cos(2 * P) * np.cos(0.5 * I) ** -0.5 + 2.25 * np.cos(I) ** 2 * np.cos(0.5 * I) ** -4)
+    return _f_O1(a) * inverse_qa
+
+
+def _f_M3(a):
+    return _f_M2(a) ** 1.5
+
+
+# Nodal phase corrections u in degrees, Schureman table 2
+
+def _u_zero(a):
+    return np.zeros_like(a['N'])
+
+
+def _u_Mf(a):
+    return -2.0 * a['xi']
+
+
+def _u_O1(a):
+    return 2.0 * a['xi'] - a['nu']
+
+
+def _u_J1(a):
+    return -a['nu']
+
+
+def _u_OO1(a):
+    return -2.0 * a['xi'] - a['nu']
+
+
+def _u_M2(a):
+    return 2.0 * a['xi'] - 2.0 * a['nu']
+
+
+def _u_K1(a):
+    return -a['nup']
+
+
+def _u_L2(a):
+    I = np.radians(a['I'])
+    P = np.radians(a['P'])
+    R = np.degrees(np.arctan(np.sin(2 * P) / (1 / 6.0 * np.tan(0.5 * I) ** -2 - np.cos(2 * P))))
+    return _u_M2(a) - R
+
+
+def _u_K2(a):
+    return -2.0 * a['nupp']
+
+
+def _u_M1(a):
+    I = np.radians(a['I'])
+    P = np.radians(a['P'])
+    Q = np.degrees(np.arctan((5 * np.cos(I) - 1) / (7 * np.cos(I) + 1) * np.tan(P)))
+    return a['xi'] - a['nu'] + Q
+
+
+def _u_M3(a):
+    return 1.5 * _u_M2(a)
+
+
+# Name -> (extended Doodson numbers over _doodson_arguments, node factor, phase correction), named
+# as in the CO-OPS harmonic constituent tables
+base_constituents = {
+    'SA': ((0, 0, 1, 0, 0, 0, 0), _f_unity, _u_zero),
+    'SSA': ((0, 0, 2, 0, 0, 0, 0), _f_unity, _u_zero),
+    'MM': ((0, 1, 0, -1, 0, 0, 0), _f_Mm, _u_zero),
+    'MF': ((0, 2, 0, 0, 0, 0, 0), _f_Mf, _u_Mf),
+    'Q1': ((1, -2, 0, 1, 0, 0, 1), _f_O1, _u_O1),
+    'O1': ((1, -1, 0, 0, 0, 0, 1), _f_O1, _u_O1),
+    'M1': ((1, 0, 0, 1, 0, 0, -1), _f_M1, _u_M1),
+    'K1': ((1, 1, 0, 0, 0, 0, -1), _f_K1, _u_K1),
+    'J1': ((1, 2, 0, -1, 0, 0, -1), _f_J1, _u_J1),
+    'P1': ((1, 1, -2, 0, 0, 0, 1), _f_unity, _u_zero),
+    'S1': ((1, 1, -1, 0, 0, 0, 0), _f_unity, _u_zero),
+    'OO1': ((1, 3, 0, 0, 0, 0, -1), _f_OO1, _u_OO1),
+    '2N2': ((2, -2, 0, 2, 0, 0, 0), _f_M2, _u_M2),
+    'N2': ((2, -1, 0, 1, 0, 0, 0), _f_M2, _u_M2),
+    'NU2': ((2, -1, 2, -1, 0, 0, 0), _f_M2, _u_M2),
+    'M2': ((2, 0, 0, 0, 0, 0, 0), _f_M2, _u_M2),
+    'LAM2': ((2, 1, -2, 1, 0, 0, 2), _f_M2, _u_M2),
+    'L2': ((2, 1, 0, -1, 0, 0, 2), _f_L2, _u_L2),
+    'T2': ((2, 2, -3, 0, 0, 1, 0), _f_unity, _u_zero),
+    'S2': ((2, 2, -2, 0, 0, 0, 0), _f_unity, _u_zero),
+    'R2': ((2, 2, -1, 0, 0, -1, 2), _f_unity, _u_zero),
+    'K2': ((2, 2, 0, 0, 0, 0, 0), _f_K2, _u_K2),
+    'M3': ((3, 0, 0, 0, 0, 0, 0), _f_M3, _u_M3),
+}
+
+# Shallow water and compound constituents as (base constituent, multiple) members
+compound_constituents = {
+    'MSF': (('S2', 1), ('M2', -1)),
+    '2Q1': (('N2', 1), ('J1', -1)),
+    'RHO': (('NU2', 1), ('K1', -1)),
+    'MU2': (('M2', 2), ('S2', -1)),
+    '2SM2': (('S2', 2), ('M2', -1)),
+    '2MK3': (('M2', 1), ('O1', 1)),
+    'MK3': (('M2', 1), ('K1', 1)),
+    'MN4': (('M2', 1), ('N2', 1)),
+    'M4': (('M2', 2),),
+    'MS4': (('M2', 1), ('S2', 1)),
+    'S4': (('S2', 2),),
+    'M6': (('M2', 3),),
+    'S6': (('S2', 3),),
+    'M8': (('M2', 4),),
+}
+
+
+def constituent_doodson_numbers(name):
+    if name in base_constituents:
+        return np.array(base_constituents[name][0], dtype=np.float64)
+    return np.sum([multiple * np.array(base_constituents[base][0], dtype=np.float64) for base, multiple in compound_constituents[name]], axis=0)
+
+
+def constituent_speeds(names):
+    # Angular speeds in degrees per hour from the rates of the astronomical arguments
+    rates = np.array([_argument_rate(x) for x in _doodson_arguments])
+    return np.array([constituent_doodson_numbers(x).dot(rates) for x in names])
+
+
+def _argument_rate(name):
+    # Degrees per hour of the linear term, the higher order terms change the rates by far less than
+    # the speeds are ever needed to
+    hours_per_century = 36525.0 * 24.0
+    if name == '90':
+        return 0.0
+    if name == 'T+h-s':
+        return 15.0 + (_astronomical_polynomials['h'][1] - _astronomical_polynomials['s'][1]) / hours_per_century
+    return _astronomical_polynomials[name][1] / hours_per_century
+
+
+def nodal_corrections(names, arguments):
+    # Node factors f and equilibrium arguments V + u in degrees for each constituent (rows) at
+    # each time of the arguments (columns)
+    base_values = {}
+
+    def base_correction(base):
+        if base not in base_values:
+            doodson, node_factor, phase_correction = base_constituents[base]
+            equilibrium = np.sum([x * arguments[y] for x, y in zip(doodson, _doodson_arguments) if x != 0], axis=0)
+            base_values[base] = (node_factor(arguments), equilibrium + phase_correction(arguments))
+        return base_values[base]
+
+    count = len(arguments['N'])
+    factors = np.ones((len(names), count))
+    equilibrium_arguments = np.zeros((len(names), count))
+    for i, name in enumerate(names):
+        members = ((name, 1),) if name in base_constituents else compound_constituents[name]
+        for base, multiple in members:
+            factor, argument = base_correction(base)
+            factors[i] *= factor ** abs(multiple)
+            equilibrium_arguments[i] += multiple * argument
+    return factors, equilibrium_arguments
+
+
+class TideHarmonics(object):
+
+    def __init__(self, station_id, names, amplitudes, phases, datums=None, unit=units.Units.metric):
+        # The harmonic constituents published for a tide station, amplitudes in unit and Greenwich
+        # phase lags in degrees. The harmonic sum is relative to mean sea level and datums holds the
+        # station datums as offsets on any common reference to move it to other datums
+        self.station_id = station_id
+        self.names = list(names)
+        self.amplitudes = np.asarray(amplitudes, dtype=np.float64)
+        self.phases = np.asarray(phases, dtype=np.float64)
+        self.datums = datums
+        if self.datums is None:
+            self.datums = {}
+        self.unit = unit
+
+    @staticmethod
+    def parse_harmonic_constituents(station_id, raw_constituents, raw_datums=None, unit=units.Units.metric):
+        # From the CO-OPS metadata API harcon.json and datums.json responses. Constituents without
+        # an amplitude or that are not in the constituent tables are left out
+        constituents_json = json.loads(raw_constituents)
+        if not 'HarmonicConstituents' in constituents_json:
+            print('Failed to parse harmonic constituents')
+            return None
+
+        names = []
+        amplitudes = []
+        phases = []
+        for constituent in constituents_json['HarmonicConstituents']:
+            name = constituent['name'].upper()
+            if name not in base_constituents and name not in compound_constituents:
+                continue
+            if not constituent.get('amplitude'):
+                continue
+            names.append(name)
+            amplitudes.append(float(constituent['amplitude']))
+            phases.append(float(constituent['phase_GMT']))
+
+        datums = {}
+        if raw_datums is not None and len(raw_datums) > 0:
+            for datum in json.loads(raw_datums).get('datums', []):
+                if datum.get('value') is not None:
+                    datums[datum['name']] = float(datum['value'])
+
+        return TideHarmonics(station_id, names, amplitudes, phases, datums, unit)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'r') as harmonics_file:
+            raw = json.load(harmonics_file)
+        return TideHarmonics(raw['station_id'], raw['names'], raw['amplitudes'], raw['phases'], raw['datums'], raw['unit'])
+
+    def save(self, path):
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as harmonics_file:
+            json.dump({
+                'station_id': self.station_id,
+                'names': self.names,
+                'amplitudes': self.amplitudes.tolist(),
+                'phases': self.phases.tolist(),
+                'datums': self.datums,
+                'unit': self.unit,
+            }, harmonics_file)
+        os.replace(temporary_path, path)
+
+    def datum_offset(self, datum):
+        # The height of mean sea level over datum, None when the station does not publish the datum
+        if datum == 'MSL':
+            return 0.0
+        if 'MSL' not in self.datums or datum not in self.datums:
+            return None
+        return self.datums['MSL'] - self.datums[datum]
+
+    def water_levels(self, timestamps):
+        # Predicted levels over mean sea level in the harmonics unit for timestamps in seconds
+        # since the epoch, as one product of the constituents by times
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        factors, equilibrium_arguments = nodal_corrections(self.names, astronomical_arguments(timestamps))
+        angles = np.radians(equilibrium_arguments - self.phases[:, np.newaxis])
+        return np.einsum('i,ij->j', self.amplitudes, factors * np.cos(angles))
+
+    def water_level_rates(self, timestamps):
+        # Time derivative of water_levels in unit per hour, leaving out the slow change of the
+        # nodal corrections
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        factors, equilibrium_arguments = nodal_corrections(self.names, astronomical_arguments(timestamps))
+        angles = np.radians(equilibrium_arguments - self.phases[:, np.newaxis])
+        speeds = np.radians(constituent_speeds(self.names))
+        return -np.einsum('i,ij->j', self.amplitudes * speeds, factors * np.sin(angles))
+
+    def tidal_extrema(self, start_timestamp, end_timestamp, step=360):
+        # Times and levels of the high and low tides in [start, end]. The rate is sampled every step
+        # seconds and each sign change refined by interpolating the rate to zero
+        timestamps = np.arange(start_timestamp - step, end_timestamp + 2 * step, step, dtype=np.float64)
+        rates = self.water_level_rates(timestamps)
+        crossings = np.flatnonzero(np.sign(rates[:-1]) != np.sign(rates[1:]))
+        crossings = crossings[rates[crossings] != 0.0]
+
+        before = rates[crossings]
+        after = rates[crossings + 1]
+        times = timestamps[crossings] + step * before / (before - after)
+        highs = before > 0
+
+        inside = (times >= start_timestamp) & (times <= end_timestamp)
+        times = times[inside]
+        return times, self.water_levels(times), highs[inside]
+
+    def predict(self, start_date, end_date, datum='MTL', interval='hilo', unit=units.Units.metric):
+        # Same results as TideStation.fetch_tide_data, computed locally: a list of the high and low
+        # tide events and a list of the levels every 6 minutes, every hour or at the events alone
+        offset = self.datum_offset(datum)
+        if offset is None:
+            print('Failed to predict tidal data, the station has no ' + datum + ' datum')
+            return None
+
+        start_timestamp = _timestamp(start_date)
+        end_timestamp = _timestamp(end_date)
+        scale, _ = units.conversion_factors(units.Measurement.length, self.unit, unit)
+
+        event_times, event_levels, highs = self.tidal_extrema(start_timestamp, end_timestamp)
+        # Event times are reported to the minute like the API
+        event_times = np.round(event_times / 60.0) * 60.0
+        event_levels = (event_levels + offset) * scale
+        tidal_events = _tide_events(event_times, event_levels, datum, unit)
+        for event, high in zip(tidal_events, highs.tolist()):
+            event.tidal_event = TideEvent.TidalEventType.high_tide if high else TideEvent.TidalEventType.low_tide
+
+        if interval == 'hilo':
+            return tidal_events, list(tidal_events)
+
+        step = 3600 if interval == 'h' else 360
+        first = np.ceil(start_timestamp / step) * step
+        times = np.arange(first, end_timestamp + 1, step, dtype=np.float64)
+        levels = (self.water_levels(times) + offset) * scale
+        return tidal_events, _tide_events(times, levels, datum, unit)
+
+
+def _timestamp(date):
+    if date.tzinfo is None:
+        date = pytz.utc.localize(date)
+    return date.timestamp()
+
+
+def _tide_events(timestamps, levels, datum, unit):
+    # Levels are rounded to the millimeter like the API responses
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+    events = []
+    for timestamp, level in zip(timestamps.tolist(), np.round(levels, 3).tolist()):
+        events.append(TideEvent(unit, date=epoch + datetime.timedelta(seconds=timestamp), water_level=level, water_level_datum=datum))
+    return events
@@ -0,0 +1,92 @@
+import datetime
+import json
+import numpy as np
+import pytz
+
+from . import tools
+from .tideevent import TideEvent
+
+
+class TidePredictions(object):
+
+    def __init__(self, times, water_levels, event_indexes, event_types, datum='', unit=''):
+        # CO-OPS predictions stored by column: times as datetime64 minutes in UTC, the levels as
+        # floats and the positions and types of the high and low tides. TideEvent objects are only
+        # built when asked for
+        self.times = times
+        self.water_levels = water_levels
+        self.event_indexes = event_indexes
+        self.event_types = event_types
+        self.datum = datum
+        self.unit = unit
+
+    def __len__(self):
+        return len(self.times)
+
+    @staticmethod
+    def parse(raw_data, datum, unit):
+        # None when raw_data is not a predictions response or has no predictions
+        if raw_data is None or raw_data == '':
+            return None
+        raw_json = json.loads(raw_data)
+        if not 'predictions' in raw_json:
+            return None
+        predictions = raw_json['predictions']
+        if len(predictions) < 1:
+            return None
+
+        times = parse_prediction_times([x['t'] for x in predictions])
+        levels = np.array([x['v'] for x in predictions])
+        water_levels = np.where(levels == '', 'nan', levels).astype(np.float64)
+
+        event_indexes = np.array([i for i, x in enumerate(predictions) if 'type' in x], dtype=np.int64)
+        event_types = np.array([predictions[i]['type'] for i in event_indexes.tolist()], dtype='<U1')
+        return TidePredictions(times, water_levels, event_indexes, event_types, datum, unit)
+
+    def find_events(self):
+        # Marks the high and low tides from the levels when the response had none, as
+        # TideStation.interpolate_tidal_events does
+        low_indexes, _, high_indexes, _ = tools.peakdetect(self.water_levels, delta=0.05)
+        event_indexes = np.array(low_indexes + high_indexes, dtype=np.int64)
+        event_types = np.array([TideEvent.TidalEventType.low_tide] * len(low_indexes) + [TideEvent.TidalEventType.high_tide] * len(high_indexes), dtype='<U1')
+        order = np.argsort(event_indexes, kind='stable')
+        self.event_indexes = event_indexes[order]
+        self.event_types = event_types[order]
+
+    def dates(self, indexes=None):
+        times = self.times if indexes is None else self.times[indexes]
+        return [x.replace(tzinfo=pytz.utc) for x in times.astype('datetime64[s]').astype(datetime.datetime).tolist()]
+
+    def event(self, index):
+        tidal_event = None
+        position = np.searchsorted(self.event_indexes, index)
+        if position < len(self.event_indexes) and self.event_indexes[position] == index:
+            tidal_event = str(self.event_types[position])
+        return TideEvent(self.unit, tidal_event=tidal_event, date=self.dates([index])[0], water_level=float(self.water_levels[index]),
+            water_level_datum=self.datum)
+
+    def tidal_data(self):
+        tidal_data = [TideEvent(self.unit, date=x, water_level=y, water_level_datum=self.datum) for x, y in zip(self.dates(), self.water_levels.tolist())]
+        for index, event_type in zip(self.event_indexes.tolist(), self.event_types.tolist()):
+            tidal_data[index].tidal_event = event_type
+        return tidal_data
+
+    def tidal_events(self):
+        dates = self.dates(self.event_indexes)
+        levels = self.water_levels[self.event_indexes].tolist()
+        return [TideEvent(self.unit, tidal_event=x, date=y, water_level=z, water_level_datum=self.datum) for x, y, z in zip(self.event_types.tolist(), dates, levels)]
+
+
+def parse_prediction_times(values):
+    # The API always writes times as 'YYYY-MM-DD HH:MM', so the fields are read straight from the
+    # character codes instead of parsing each string
+    digits = np.array(values, dtype='S16').view(np.uint8).reshape(-1, 16).astype(np.int64) - ord('0')
+    years = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    months = digits[:, 5] * 10 + digits[:, 6]
+    days = digits[:, 8] * 10 + digits[:, 9]
+    hours = digits[:, 11] * 10 + digits[:, 12]
+    minutes = digits[:, 14] * 10 + digits[:, 15]
+
+    times = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (months - 1).astype('timedelta64[M]')
+    times = times.astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+    return times.astype('datetime64[m]') + hours.astype('timedelta64[h]') + minutes.astype('timedelta64[m]')
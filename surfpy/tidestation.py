@@ -2,9 +2,9 @@ from .basestation import BaseStation
 from . import units
 from . import tools
 from .tideevent import TideEvent
-import datetime
-import json
-import pytz
+from .tideharmonics import TideHarmonics
+from .tidepredictions import TidePredictions
+import os
 try:
     import requests
 except:
@@ -14,6 +14,11 @@ except:
 class TideStation(BaseStation):
 
     _base_tide_url = 'https://tidesandcurrents.noaa.gov/api/datagetter?begin_date={0}%20{1}&end_date={2}%20{3}&station={4}&product=predictions&datum={5}&interval={6}&units={7}&time_zone=gmt&application=web_services&format=json'
+    _harmonic_constituents_url = 'https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations/{0}/harcon.json?units=metric'
+    _datums_url = 'https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations/{0}/datums.json?units=metric'
+
+    # Station id -> TideHarmonics, constituents are fetched once per process
+    harmonics_cache = {}
 
     class DataInterval:
         default=''
@@ -42,39 +47,24 @@ class TideStation(BaseStation):
         return url
 
     def parse_tide_data(self, raw_data, datum, unit):
-        if raw_data is None:
-            print('Failed to parse tidal data')
-            return None
-        elif raw_data == '':
-            print('Failed to parse tidal data')
-            return None
-        
-        raw_json = json.loads(raw_data)
-        if not 'predictions' in raw_json:
-            print('Failed to parse tidal data')
+        predictions = self.parse_tide_predictions(raw_data, datum, unit)
+        if predictions is None:
             return None
-        
-        tide_datas = raw_json['predictions']
-        tidal_data = []
-        tidal_events = []
-        for data in tide_datas:
-            event = TideEvent(unit)
-            event.date = pytz.utc.localize(datetime.datetime.strptime(data['t'], '%Y-%m-%d %H:%M'))
-            event.water_level = float(data['v'])
-            event.water_level_datum = datum
-            if 'type' in data:
-                event.tidal_event = data['type']
-                tidal_events.append(event)
-            tidal_data.append(event)
 
-        if len(tidal_data) < 1:
+        # The events are the same objects as in tidal_data, marked with their type
+        tidal_data = predictions.tidal_data()
+        return [tidal_data[i] for i in predictions.event_indexes.tolist()], tidal_data
+
+    def parse_tide_predictions(self, raw_data, datum, unit):
+        # The columnar form of parse_tide_data, the high and low tides are found from the levels
+        # when the response does not mark them
+        predictions = TidePredictions.parse(raw_data, datum, unit)
+        if predictions is None:
             print('Failed to parse tidal data')
             return None
-        
-        if len(tidal_events) < 1:
-            tidal_events = self.interpolate_tidal_events(tidal_data)
-            
-        return tidal_events, tidal_data
+        if len(predictions.event_indexes) < 1:
+            predictions.find_events()
+        return predictions
 
     @staticmethod
     def interpolate_tidal_events(tidal_data):
@@ -105,3 +95,41 @@ class TideStation(BaseStation):
         if len(response.text) < 1:
             return False
         return self.parse_tide_data(response.text, datum, unit)
+
+    def fetch_tide_predictions(self, start_date, end_date, datum=TideDatum.mean_tide_level, interval=DataInterval.high_low, unit=units.Units.metric):
+        # Same request as fetch_tide_data, returned as TidePredictions columns
+        url = self.create_tide_data_url(start_date, end_date, datum=datum, interval=interval, unit=unit)
+        response = requests.get(url)
+        if len(response.text) < 1:
+            return None
+        return self.parse_tide_predictions(response.text, datum, unit)
+
+    def fetch_harmonics(self, cache_path=None):
+        # The harmonic constituents and datums of the station. They only change when NOAA runs a new
+        # analysis, so with a cache_path they are downloaded once and read from the file after that
+        harmonics = TideStation.harmonics_cache.get(self.station_id)
+        if harmonics is not None:
+            return harmonics
+
+        if cache_path is not None and os.path.exists(cache_path):
+            harmonics = TideHarmonics.load(cache_path)
+        else:
+            constituents_response = requests.get(self._harmonic_constituents_url.format(self.station_id))
+            if len(constituents_response.text) < 1:
+                return None
+            datums_response = requests.get(self._datums_url.format(self.station_id))
+            harmonics = TideHarmonics.parse_harmonic_constituents(self.station_id, constituents_response.text, datums_response.text)
+            if harmonics is None:
+                return None
+            if cache_path is not None:
+                harmonics.save(cache_path)
+
+        TideStation.harmonics_cache[self.station_id] = harmonics
+        return harmonics
+
+    def predict_tide_data(self, start_date, end_date, datum=TideDatum.mean_tide_level, interval=DataInterval.high_low, unit=units.Units.metric, cache_path=None):
+        # Same arguments and results as fetch_tide_data, computed from the harmonic constituents
+        harmonics = self.fetch_harmonics(cache_path)
+        if harmonics is None:
+            return None
+        return harmonics.predict(start_date, end_date, datum=datum, interval=interval, unit=unit)
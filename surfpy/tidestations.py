@@ -1,6 +1,7 @@
 from .basestations import BaseStations
 from .tidestation import TideStation
 from .location import Location
+import datetime
 import json
 try:
     import requests
@@ -18,9 +19,18 @@ class TideStations(BaseStations):
             self.stations = stations
         self.fetch_date = fetch_date
 
-    def fetch_stations(self):
+    def fetch_stations(self, cache_path=None, ttl=datetime.timedelta(days=1)):
         all_stations_payload = {"mode": "json", "nelat": "90", "nelng": "180", "swlat": "-90", "swlng": "-180"}
-        return self._fetch_stations(self.tide_stations_url, all_stations_payload)
+        return self._fetch_stations(self.tide_stations_url, all_stations_payload, cache_path, ttl)
+
+    def catalog_columns(self):
+        columns = super(TideStations, self).catalog_columns()
+        columns['state'] = [x.state for x in self.stations]
+        return columns
+
+    @staticmethod
+    def station_from_catalog(columns, index):
+        return TideStation(str(columns['station_id'][index]), BaseStations.catalog_location(columns, index), state=str(columns['state'][index]))
 
     def parse_stations(self, raw_data):
         if raw_data is None:
@@ -30,5 +40,6 @@ class TideStations(BaseStations):
 
         raw_stations = json.loads(raw_data)['locations']
         self.stations = [TideStation(x['stnid'], Location(float(x['lat']), float(x['lng']), name=x['name']), state=x['state']) for x in raw_stations]
+        self.index_stations()
 
         return True
\ No newline at end of file
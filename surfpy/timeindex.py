@@ -0,0 +1,98 @@
+import datetime
+import numpy as np
+import pytz
+
+
+_epoch = datetime.datetime(1970, 1, 1)
+
+
+def to_timestamp(date):
+    # Seconds since the epoch, naive datetimes and datetime64 values are treated as UTC
+    if isinstance(date, datetime.datetime):
+        if date.tzinfo is not None:
+            date = date.astimezone(pytz.utc).replace(tzinfo=None)
+        return (date - _epoch).total_seconds()
+    return float(np.datetime64(date, 's').astype(np.int64))
+
+
+def to_timestamps(dates):
+    dates = np.asarray(dates)
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype('datetime64[s]').astype(np.int64).astype(np.float64)
+    elif np.issubdtype(dates.dtype, np.number):
+        return dates.astype(np.float64)
+    return np.array([to_timestamp(x) for x in dates.ravel()], dtype=np.float64).reshape(dates.shape)
+
+
+class TimeIndex(object):
+
+    def __init__(self, timestamps):
+        # Keeps the times sorted along with the permutation back to the callers ordering, so
+        # descending NDBC series can be indexed without being reordered
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.order = np.argsort(timestamps, kind='stable')
+        self.timestamps = timestamps[self.order]
+
+    @staticmethod
+    def from_data(data):
+        return TimeIndex([to_timestamp(x.date) for x in data])
+
+    @staticmethod
+    def from_dates(dates):
+        return TimeIndex(to_timestamps(dates))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def nearest(self, date):
+        if len(self.timestamps) < 1:
+            return None
+        return int(self.nearest_indexes([date])[0])
+
+    def floor(self, date):
+        # Index of the latest time at or before date
+        position = np.searchsorted(self.timestamps, to_timestamp(date), side='right') - 1
+        if position < 0:
+            return None
+        return int(self.order[position])
+
+    def ceil(self, date):
+        # Index of the earliest time at or after date
+        position = np.searchsorted(self.timestamps, to_timestamp(date), side='left')
+        if position >= len(self.timestamps):
+            return None
+        return int(self.order[position])
+
+    def between(self, start_date, end_date):
+        # Indexes of every time in [start_date, end_date] in ascending time order
+        start = np.searchsorted(self.timestamps, to_timestamp(start_date), side='left')
+        end = np.searchsorted(self.timestamps, to_timestamp(end_date), side='right')
+        return self.order[start:end]
+
+    def nearest_indexes(self, dates, tolerance=None):
+        # Vectorized nearest lookup for many target times at once. When tolerance (in seconds) is
+        # given, targets without a time that close are marked with -1
+        targets = to_timestamps(dates)
+        if len(self.timestamps) < 1:
+            return np.full(targets.shape, -1, dtype=np.int64)
+
+        positions = np.clip(np.searchsorted(self.timestamps, targets), 1, max(len(self.timestamps) - 1, 1))
+        before = self.timestamps[positions - 1]
+        after = self.timestamps[np.minimum(positions, len(self.timestamps) - 1)]
+        positions = np.where(np.abs(targets - before) <= np.abs(after - targets), positions - 1, positions)
+
+        indexes = self.order[positions].astype(np.int64)
+        if tolerance is not None:
+            indexes[np.abs(self.timestamps[positions] - targets) > tolerance] = -1
+        return indexes
+
+    def offsets(self, dates, indexes):
+        # Seconds from the indexed times to the target times, NaN where the index is missing
+        targets = to_timestamps(dates)
+        indexes = np.asarray(indexes)
+        times = np.full(targets.shape, np.nan)
+        valid = indexes >= 0
+        original_timestamps = np.empty(len(self.timestamps))
+        original_timestamps[self.order] = self.timestamps
+        times[valid] = original_timestamps[indexes[valid]]
+        return targets - times
@@ -1,8 +1,11 @@
 import math
 import json
+import numpy as np
 import datetime
 import bisect
 import time
+import threading
+from collections import OrderedDict
 try:
     import requests
     from requests.adapters import HTTPAdapter
@@ -18,9 +21,32 @@ def scalar_from_uv(ucomponent, vcomponent):
     return speed, angle
 
 
-def ldis(period, depth):
+_array_types = (np.ndarray, list, tuple)
+
+
+def _is_array(*values):
+    for value in values:
+        if isinstance(value, _array_types):
+            return True
+    return False
+
+
+# Coefficients of Hunt's (1979) Pade approximation to the dispersion relation
+_hunt_coefficients = [0.6666666667, 0.3555555556, 0.1608465608, 0.0632098765, 0.0217540484, 0.0065407983]
+
+
+def ldis(period, depth, approximate=False):
     # Computes the wavelength for a wave with the given period
-    # and depth. Units are metric, gravity is 9.81.
+    # and depth. Units are metric, gravity is 9.81. Arrays of periods
+    # and depths are solved element wise and return an array.
+    if dispersion_cache is not None and not approximate:
+        return dispersion_cache.wavelength(period, depth)
+    if approximate or _is_array(period, depth):
+        return ldis_array(period, depth, approximate)
+    return _ldis_scalar(period, depth)
+
+
+def _ldis_scalar(period, depth):
     gravity = 9.81
     eps = 0.000001
     max_iteration = 50
@@ -57,6 +83,163 @@ def ldis(period, depth):
     return 2 * math.pi * depth / Xf
 
 
+def ldis_array(period, depth, approximate=False):
+    # Array version of ldis. By default every element runs the same Newton Raphson iteration as the
+    # scalar solver, each one stopping once it converges, and -1.0 marks the ones that did not. With
+    # approximate, Hunt's explicit approximation (0.1% error) is refined by a single Newton step instead
+    # which agrees with the iterative solution to better than the 1e-6 solver tolerance
+    gravity = 9.81
+    eps = 0.000001
+    max_iteration = 50
+
+    period, depth = np.broadcast_arrays(np.asarray(period, dtype=np.float64), np.asarray(depth, dtype=np.float64))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        omega = 2 * math.pi / period
+        D = np.power(omega, 2) * depth / gravity
+
+        if approximate:
+            series = 1.0
+            for i, coefficient in enumerate(_hunt_coefficients):
+                series = series + coefficient * np.power(D, i + 1)
+            X = np.sqrt(D * D + D / series)
+            F = X - (D / np.tanh(X))
+            DF = 1 + (D / np.power(np.sinh(X), 2))
+            X = X - (F / DF)
+            wavelength = 2 * math.pi * depth / X
+            return np.where(np.isfinite(wavelength) & (wavelength > 0), wavelength, -1.0)
+
+        X = np.where(D >= 1, D, np.sqrt(D))
+        iterations = np.zeros(period.shape, dtype=np.int64)
+        active = np.isfinite(X) & (X > 0)
+        for _ in range(0, max_iteration):
+            if not active.any():
+                break
+            F = X - (D / np.tanh(X))
+            DF = 1 + (D / np.power(np.sinh(X), 2))
+            Xf = X - (F / DF)
+            err = np.abs((Xf - X) / X)
+            X = np.where(active, Xf, X)
+            iterations += active
+            active = active & (err > eps)
+
+        wavelength = 2 * math.pi * depth / X
+    return np.where((iterations >= max_iteration) | ~np.isfinite(wavelength), -1.0, wavelength)
+
+
+class DispersionCache(object):
+
+    def __init__(self, period_resolution=0.0, depth_resolution=0.0, maxsize=65536):
+        # Bounded LRU of solved wavelengths keyed by (period, depth). With the default resolutions of 0
+        # the keys are exact and results are identical to solving. Otherwise periods and depths are
+        # rounded to the resolution first, bounding the relative wavelength error by roughly
+        # period_resolution / period + depth_resolution / (4 * depth)
+        self.period_resolution = period_resolution
+        self.depth_resolution = depth_resolution
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self._lock:
+            self.entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def _quantize(self, period, depth):
+        if self.period_resolution > 0:
+            period = np.round(period / self.period_resolution) * self.period_resolution
+        if self.depth_resolution > 0:
+            depth = np.round(depth / self.depth_resolution) * self.depth_resolution
+        return period, depth
+
+    def _lookup(self, key):
+        wavelength = self.entries.get(key)
+        if wavelength is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return wavelength
+
+    def _store(self, key, wavelength):
+        self.entries[key] = wavelength
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def wavelength(self, period, depth):
+        if _is_array(period, depth):
+            return self.wavelengths(period, depth)
+
+        key = (float(period), float(depth))
+        if self.period_resolution > 0:
+            key = (round(key[0] / self.period_resolution) * self.period_resolution, key[1])
+        if self.depth_resolution > 0:
+            key = (key[0], round(key[1] / self.depth_resolution) * self.depth_resolution)
+        if not (math.isfinite(key[0]) and math.isfinite(key[1])):
+            return _ldis_scalar(key[0], key[1])
+
+        with self._lock:
+            wavelength = self._lookup(key)
+        if wavelength is None:
+            wavelength = _ldis_scalar(key[0], key[1])
+            with self._lock:
+                self._store(key, wavelength)
+        return wavelength
+
+    def wavelengths(self, period, depth):
+        # Array lookup, every distinct (period, depth) pair is looked up once and the
+        # ones that are missing are solved together
+        period, depth = np.broadcast_arrays(np.asarray(period, dtype=np.float64), np.asarray(depth, dtype=np.float64))
+        period, depth = self._quantize(period, depth)
+        pairs = np.stack([np.ravel(period), np.ravel(depth)], axis=1)
+        finite = np.all(np.isfinite(pairs), axis=1)
+
+        wavelengths = np.full(len(pairs), -1.0)
+        unique_pairs, inverse = np.unique(pairs[finite], axis=0, return_inverse=True)
+        unique_wavelengths = np.empty(len(unique_pairs))
+        keys = [tuple(x) for x in unique_pairs.tolist()]
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                wavelength = self._lookup(key)
+                if wavelength is None:
+                    missing.append(i)
+                else:
+                    unique_wavelengths[i] = wavelength
+
+        if len(missing) > 0:
+            solved = ldis_array(unique_pairs[missing, 0], unique_pairs[missing, 1])
+            unique_wavelengths[missing] = solved
+            with self._lock:
+                for i, wavelength in zip(missing, solved.tolist()):
+                    self._store(keys[i], wavelength)
+
+        wavelengths[finite] = unique_wavelengths[np.ravel(inverse)]
+        return wavelengths.reshape(period.shape)
+
+
+# Opt in memoization for ldis and the breaking helpers built on it, see enable_dispersion_cache
+dispersion_cache = None
+
+
+def enable_dispersion_cache(period_resolution=0.0, depth_resolution=0.0, maxsize=65536):
+    # Useful when the depth is fixed per spot and periods come from a model at a fixed
+    # resolution, repeated solves then cost a dictionary lookup
+    global dispersion_cache
+    dispersion_cache = DispersionCache(period_resolution, depth_resolution, maxsize)
+    return dispersion_cache
+
+
+def disable_dispersion_cache():
+    global dispersion_cache
+    dispersion_cache = None
+
+
 def breaking_characteristics(period, incident_angle, deep_wave_height, beach_slope, water_depth):
     # Solves for the Breaking Wave Height and Breaking Water Depth given a swell and beach conditions.
     # All units are metric and gravity is 9.81.
@@ -86,9 +269,64 @@ def breaking_characteristics(period, incident_angle, deep_wave_height, beach_slo
     return breaking_wave_height, breaking_water_depth
 
 
+def breaking_wave_heights(wave_height, period, direction, beach_angle, depth, beach_slope):
+    # Batch version of Swell.breaking_wave_estimate over arrays of any shape, typically (time x swell component).
+    # Inputs are metric. Returns the minimum and maximum breaking heights with NaN for missing components
+    gravity = 9.81
+    wave_height = np.asarray(wave_height, dtype=np.float64)
+    period = np.asarray(period, dtype=np.float64)
+    direction = np.asarray(direction, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        valid = ~(np.isnan(wave_height) | np.isnan(period) | np.isnan(direction))
+        incident_angle = np.abs(direction - beach_angle) % 360
+        breaking = valid & (wave_height < 1000) & (incident_angle < 90)
+
+        incident_angle_rad = np.radians(incident_angle)
+        wavelength = ldis(np.asarray(period), depth)
+        deep_wavelength = (gravity * np.power(period, 2)) / (2 * math.pi)
+        initial_celerity = (gravity * period) / (2 * math.pi)
+        celerity = wavelength / period
+        theta = np.arcsin(celerity * (np.sin(incident_angle_rad) / initial_celerity))
+        refraction_coeff = np.sqrt(np.cos(incident_angle_rad) / np.cos(theta))
+        deep_refracted_wave_height = refraction_coeff * wave_height
+        w = 0.56 * np.power(deep_refracted_wave_height / deep_wavelength, -0.2)
+        breaking_wave_height = np.where(breaking, w * deep_refracted_wave_height, 0.0)
+
+    # The same 0.8 scale factor and significant to rms ratio as the single swell estimate
+    maximum_break_height = np.where(valid, 0.8 * breaking_wave_height, np.nan)
+    minimum_break_height = maximum_break_height / 1.4
+    return minimum_break_height, maximum_break_height
+
+
+def dominant_breaking_wave_heights(wave_height, period, direction, beach_angle, depth, beach_slope):
+    # Reduces (time x swell component) arrays to the breaking heights of the component producing the biggest
+    # waves at each time step. Returns the minimum and maximum heights along with the dominant component
+    # index, -1 where no component is valid
+    minimum_break_height, maximum_break_height = breaking_wave_heights(wave_height, period, direction, beach_angle, depth, beach_slope)
+    if maximum_break_height.shape[-1] < 1:
+        missing = np.full(maximum_break_height.shape[:-1], np.nan)
+        return missing, missing.copy(), np.full(missing.shape, -1, dtype=np.int64)
+
+    has_valid = ~np.all(np.isnan(maximum_break_height), axis=-1)
+    dominant = np.argmax(np.where(np.isnan(maximum_break_height), -np.inf, maximum_break_height), axis=-1)
+    minimum = np.take_along_axis(minimum_break_height, dominant[..., None], axis=-1)[..., 0]
+    maximum = np.take_along_axis(maximum_break_height, dominant[..., None], axis=-1)[..., 0]
+    return np.where(has_valid, minimum, np.nan), np.where(has_valid, maximum, np.nan), np.where(has_valid, dominant, -1)
+
+
 def refraction_coefficient(wavelength, depth, incident_angle):
     # Calculate the refraction coefficient Kr with given
-    # inputs on a straight beach with parrellel bottom contours
+    # inputs on a straight beach with parrellel bottom contours.
+    # Accepts arrays as well as single values
+    if _is_array(wavelength, depth, incident_angle):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            incident_angle_rad = np.radians(np.asarray(incident_angle, dtype=np.float64))
+            wavenumber = (2.0 * math.pi) / np.asarray(wavelength, dtype=np.float64)
+            shallow_incident_angle_rad = np.arcsin(np.sin(incident_angle_rad) * np.tanh(wavenumber*np.asarray(depth, dtype=np.float64)))
+            refraction_coeff = np.sqrt(np.cos(incident_angle_rad) / np.cos(shallow_incident_angle_rad))
+        return refraction_coeff, np.degrees(shallow_incident_angle_rad)
+
     incident_angle_rad = math.radians(incident_angle)
     wavenumber = (2.0 * math.pi) / wavelength
     shallow_incident_angle_rad = math.asin(math.sin(incident_angle_rad) * math.tanh(wavenumber*depth))
@@ -98,8 +336,20 @@ def refraction_coefficient(wavelength, depth, incident_angle):
 
 
 def shoaling_coefficient(wavelength, depth):
-    # Calculate the shoaling coeffecient Ks. Units are metric, gravity is 9.81
+    # Calculate the shoaling coeffecient Ks. Units are metric, gravity is 9.81.
+    # Accepts arrays as well as single values
     gravity = 9.81
+    if _is_array(wavelength, depth):
+        wavelength = np.asarray(wavelength, dtype=np.float64)
+        depth = np.asarray(depth, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            wavenumber = (2.0 * math.pi) / wavelength
+            deep_wavelength = wavelength / np.tanh(wavenumber*depth)
+            period = (2.0 * math.pi) / np.sqrt(wavenumber * gravity)
+            initial_celerity = deep_wavelength / period
+            celerity = initial_celerity * np.tanh(wavenumber*depth)
+            group_velocity = 0.5 * celerity * (1 + ((2 * wavenumber * depth) / (np.sinh(2 * wavenumber * depth))))
+            return np.sqrt(initial_celerity / (2 * group_velocity))
 
     # Basic dispersion relationships
     wavenumber = (2.0 * math.pi) / wavelength
@@ -166,44 +416,94 @@ def peakdetect(v, delta, x = None):
     % This function is released to the public domain; Any use is allowed.
     
     """
-    min_indexes = []
-    min_values = []
-    max_indexes = []
-    max_values = []
-       
-    if x is None:
-        x = range(len(v))
-    
-    mn, mx = float('inf'), -float('inf')
-    mnpos, mxpos = float('nan'), float('nan')
-    
-    lookformax = True
-    
-    for i in range(len(v)):
-        this = v[i]
-        if this > mx:
-            mx = this
-            mxpos = x[i]
-        if this < mn:
-            mn = this
-            mnpos = x[i]
-        
-        if lookformax:
-            if this < mx-delta:
-                max_indexes.append(mxpos)
-                max_values.append(mx)
-                mn = this
-                mnpos = x[i]
-                lookformax = False
-        else:
-            if this > mn+delta:
-                min_indexes.append(mnpos)
-                min_values.append(mn)
+    return peakdetect_batch([v], delta, x)[0]
+
+
+def _peak_candidates(values):
+    # The hysteresis loop in peakdetect only changes state at the ends of each series and where it
+    # turns around, so everything else can be skipped. NaNs never compare true so they are dropped
+    # too. Returns the positions of the remaining points for each row, in order
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=1)
+
+    # Move the valid values of each row to the front, keeping their order
+    order = np.argsort(~valid, axis=1, kind='stable')
+    compact = np.take_along_axis(values, order, axis=1)
+    columns = np.arange(values.shape[1])[np.newaxis, :]
+    in_row = columns < counts[:, np.newaxis]
+
+    with np.errstate(invalid='ignore'):
+        rising = np.sign(np.diff(compact, axis=1))
+    into = np.concatenate([np.zeros((len(values), 1)), rising], axis=1)
+    out_of = np.concatenate([rising, np.zeros((len(values), 1))], axis=1)
+
+    # Keep the first of every run of equal values where the direction changes or a flat stretch begins
+    keep = (into != 0) & ((out_of == 0) | (out_of != into))
+    keep |= (columns == 0) | (columns == counts[:, np.newaxis] - 1)
+    keep &= in_row
+
+    rows, positions = np.nonzero(keep)
+    positions = order[rows, positions]
+    splits = np.searchsorted(rows, np.arange(1, len(values)))
+    return np.split(positions, splits)
+
+
+def peakdetect_batch(values, delta, x=None):
+    # Runs peakdetect over every row of a 2D array (many spectra or tide series at once) and
+    # returns a list with the (min_indexes, min_values, max_indexes, max_values) of each row.
+    # Rows of different length can be padded with NaN. Only the candidate selection is vectorized,
+    # the hysteresis itself is sequential along a series and still runs as a Python loop over the
+    # turning points of each row, so the cost grows with rows x turning points rather than rows x
+    # samples. Stepping every row together as arrays was measured slower for both single long
+    # series and batches of spectra
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[np.newaxis, :]
+    if values.size < 1:
+        return [([], [], [], []) for _ in range(len(values))]
+
+    results = []
+    for row, positions in zip(values, _peak_candidates(values)):
+        min_indexes = []
+        min_values = []
+        max_indexes = []
+        max_values = []
+
+        mn, mx = float('inf'), -float('inf')
+        mnpos, mxpos = float('nan'), float('nan')
+
+        lookformax = True
+
+        for i, this in zip(positions.tolist(), row[positions].tolist()):
+            if this > mx:
                 mx = this
-                mxpos = x[i]
-                lookformax = True
-
-    return min_indexes, min_values, max_indexes, max_values
+                mxpos = i
+            if this < mn:
+                mn = this
+                mnpos = i
+
+            if lookformax:
+                if this < mx-delta:
+                    max_indexes.append(mxpos)
+                    max_values.append(mx)
+                    mn = this
+                    mnpos = i
+                    lookformax = False
+            else:
+                if this > mn+delta:
+                    min_indexes.append(mnpos)
+                    min_values.append(mn)
+                    mx = this
+                    mxpos = i
+                    lookformax = True
+
+        if x is not None:
+            min_indexes = [x[i] for i in min_indexes]
+            max_indexes = [x[i] for i in max_indexes]
+        results.append((min_indexes, min_values, max_indexes, max_values))
+
+    return results
 
 
 def parse_float(raw_value):
@@ -215,6 +515,13 @@ def parse_float(raw_value):
     return value
 
 
+def split_lines(raw_data):
+    # Accepts either the raw text of a data file or an already split list of lines
+    if isinstance(raw_data, str):
+        return raw_data.split('\n')
+    return raw_data
+
+
 def parse_int(raw_value):
     value = int('nan')
     try:
@@ -229,7 +536,8 @@ def simple_serialize(obj):
         serial = obj.isoformat()
         return serial
 
-    return obj.__dict__
+    from .serialize import object_fields
+    return object_fields(obj)
 
 
 def dump_json(obj):
@@ -249,6 +557,22 @@ def download_data(url):
     return response.content
 
 
+def read_lines(response, line_limit=0):
+    # Reads a streamed response line by line, closing the connection once line_limit
+    # lines have been read so the rest of the body is never downloaded
+    lines = []
+    try:
+        for line in response.iter_lines():
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            lines.append(line)
+            if line_limit > 0 and len(lines) >= line_limit:
+                break
+    finally:
+        response.close()
+    return lines
+
+
 def retry_session(retries=1):
     session = requests.Session()
     retries = Retry(total=retries,
@@ -1,5 +1,6 @@
 import math
 import datetime
+import numpy as np
 try:
     from netCDF4 import num2date
 except:
@@ -11,7 +12,29 @@ wind_directions = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW',
 epoch_days_since_zero = 719164
 
 
+# Direction names indexed by compass index, the trailing entry is used for invalid degrees (index -1)
+_direction_names = np.array(wind_directions + ['NULL'])
+
+wind_direction_names = ['north', 'north-northeast', 'northeast', 'east-northeast', 'east', 'east-southeast', 'southeast',
+    'south-southeast', 'south', 'south-southwest', 'southwest', 'west-southwest', 'west', 'west-northwest', 'northwest', 'north-northwest']
+
+_direction_degrees = {x.lower(): i * 22.5 for i, x in enumerate(wind_directions)}
+_direction_degrees.update({x: i * 22.5 for i, x in enumerate(wind_direction_names)})
+
+
+def degree_to_direction_index(degree):
+    # Compass index (0 is north, 15 is north-northwest) for a degree or an array of degrees, -1 when invalid
+    degree = np.abs(np.asarray(degree, dtype=np.float64))
+    with np.errstate(invalid='ignore'):
+        index = np.floor((degree + 11.25) / 22.5 - 0.02)
+        index = np.where(np.isnan(degree) | (degree > 361), -1, np.where(index >= len(wind_directions), 0, index))
+    return index.astype(np.int64)
+
+
 def degree_to_direction(degree):
+    if isinstance(degree, (np.ndarray, list, tuple)):
+        return _direction_names[degree_to_direction_index(degree)]
+
     if math.isnan(degree):
         return 'NULL'
 
@@ -29,43 +52,15 @@ def degree_to_direction(degree):
 
 
 def direction_to_degree(direction):
+    if isinstance(direction, (np.ndarray, list, tuple)):
+        # Each distinct label is only looked up once
+        labels, inverse = np.unique(np.char.lower(np.asarray(direction, dtype=str)), return_inverse=True)
+        degrees = np.array([_direction_degrees.get(x, -1.0) for x in labels], dtype=np.float64)
+        return degrees[inverse].reshape(np.shape(direction))
+
     if direction is None:
         return -1.0
-    direction = direction.lower()
-    if direction == 'n' or direction == 'north':
-        return 0.0
-    elif direction == 'nne' or direction == 'north-northeast':
-        return 22.5
-    elif direction == 'ne' or direction == 'northeast':
-        return 45.0
-    elif direction == 'ene' or direction == 'east-northeast':
-        return 67.5
-    elif direction == 'e' or direction == 'east':
-        return 90.0
-    elif direction == 'ese' or direction == 'east-southeast':
-        return 112.5
-    elif direction == 'se' or direction == 'southeast':
-        return 135.0
-    elif direction == 'sse' or direction == 'south-southeast':
-        return 157.5
-    elif direction == 's' or direction == 'south':
-        return 180
-    elif direction == 'ssw' or direction == 'south-southwest':
-        return 202.5
-    elif direction == 'sw' or direction == 'southwest':
-        return 225
-    elif direction == 'wsw' or direction == 'west-southwest':
-        return 247.5
-    elif direction == 'w' or direction == 'west':
-        return 270.0
-    elif direction == 'wnw' or direction == 'west-northwest':
-        return 292.5
-    elif direction == 'nw' or direction == 'northwest':
-        return 315.0
-    elif direction == 'nnw' or direction == 'north-northwest':
-        return 337.5
-    else:
-        return -1.0
+    return _direction_degrees.get(direction.lower(), -1.0)
 
 
 class Units:
@@ -84,53 +79,43 @@ class Measurement:
     direction = 'direction'
 
 
+# (measure, source unit, destination unit) -> (scale, offset) so every conversion is a single
+# multiply and add, which works the same for floats and numpy arrays
+_conversions = {
+    (Measurement.length, Units.metric, Units.english): (3.28, 0.0),
+    (Measurement.length, Units.english, Units.metric): (1.0 / 3.28, 0.0),
+    (Measurement.speed, Units.metric, Units.english): (2.237, 0.0),
+    (Measurement.speed, Units.metric, Units.knots): (1.944, 0.0),
+    (Measurement.speed, Units.english, Units.metric): (1.0 / 2.237, 0.0),
+    (Measurement.speed, Units.english, Units.knots): (1.0 / 1.15, 0.0),
+    (Measurement.speed, Units.knots, Units.metric): (0.514, 0.0),
+    (Measurement.speed, Units.knots, Units.english): (1.15, 0.0),
+    (Measurement.temperature, Units.metric, Units.english): (9.0 / 5.0, 32.0),
+    (Measurement.temperature, Units.english, Units.metric): (5.0 / 9.0, -32.0 * (5.0 / 9.0)),
+    (Measurement.temperature, Units.kelvin, Units.metric): (1.0, -273.15),
+    (Measurement.temperature, Units.kelvin, Units.english): (9.0 / 5.0, -459.67),
+    (Measurement.pressure, Units.metric, Units.english): (1.0 / 33.8638, 0.0),
+    (Measurement.pressure, Units.english, Units.metric): (33.8638, 0.0),
+}
+
+
+def conversion_factors(measure, source_unit, dest_unit):
+    return _conversions.get((measure, source_unit, dest_unit), (1.0, 0.0))
+
+
 def convert(value, measure, source_unit, dest_unit):
-    if math.isnan(value):
+    # Accepts a single value or a numpy array, NaN values pass through unchanged
+    conversion = _conversions.get((measure, source_unit, dest_unit))
+    if conversion is None:
         return value
 
-    if source_unit == Units.metric:
-        if measure == Measurement.length:
-            if dest_unit == Units.english:
-                return value * 3.28
-        elif measure == Measurement.speed:
-            if dest_unit == Units.english:
-                return value * 2.237
-            elif dest_unit == Units.knots:
-                return value * 1.944
-        elif measure == Measurement.temperature:
-            if dest_unit == Units.english:
-                return (value * (9.0 / 5.0)) + 32.0
-        elif measure == Measurement.pressure:
-            if dest_unit == Units.english:
-                return value / 33.8638
-    elif source_unit == Units.english:
-        if measure == Measurement.length:
-            if dest_unit == Units.metric:
-                return value / 3.28
-        elif measure == Measurement.speed:
-            if dest_unit == Units.metric:
-                return value / 2.237
-            elif dest_unit == Units.knots:
-                return value / 1.15
-        elif measure == Measurement.temperature:
-            if dest_unit == Units.metric:
-                return (value - 32.0) * (5.0 / 9.0)
-        elif measure == Measurement.pressure:
-            if dest_unit == Units.metric:
-                return value * 33.8638
-    elif source_unit == Units.knots:
-        if measure == Measurement.speed:
-            if dest_unit == Units.metric:
-                return value * 0.514
-            elif dest_unit == Units.english:
-                return value * 1.15
-    elif source_unit == Units.kelvin:
-        if measure == Measurement.temperature:
-            if dest_unit == Units.metric:
-                return value - 273.15
-            elif dest_unit == Units.english:
-                return value * (9.0/5.0) - 459.67
-    return value
+    if isinstance(value, (list, tuple)):
+        value = np.asarray(value, dtype=np.float64)
+
+    scale, offset = conversion
+    if offset == 0.0:
+        return value * scale
+    return value * scale + offset
 
 
 def earths_radius(unit):
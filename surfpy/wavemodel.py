@@ -194,4 +194,17 @@ def us_west_coast_gfs_wave_model():
         time_resolution=0.125,
         max_index=384,
         hourly_cutoff_index=0
-    )
\ No newline at end of file
+    )
+
+# Every wave model above, for matching locations against all of them at once
+def all_gfs_wave_models():
+    return [
+        global_gfs_wave_model_25km(),
+        global_gfs_wave_model(),
+        arctic_gfs_wave_model(),
+        southern_gfs_wave_model(),
+        alaska_gfs_wave_model(),
+        atlantic_gfs_wave_model(),
+        eastpacific_gfs_wave_model(),
+        us_west_coast_gfs_wave_model(),
+    ]
@@ -56,7 +56,7 @@ class GFSModel(NOAAModel):
             return False
 
         buoy_data_point.wind_speed, buoy_data_point.wind_direction = tools.scalar_from_uv(data['u_3000'][i], data['v_3000'][i])
-        buoy_data_point.compass_direction = units.degree_to_direction(buoy_data_point.wind_direction)
+        buoy_data_point.wind_compass_direction = units.degree_to_direction(buoy_data_point.wind_direction)
         buoy_data_point.air_temperature = units.convert(data['t_3000'][i], units.Measurement.temperature, units.Units.kelvin, units.Units.metric)
         
         return True